@@ -0,0 +1,44 @@
+"""
+Regex path versus the str.find/partition scanner for Apache/Nginx access
+lines, in Combined and Common Log Format.
+
+    python -m benchmarks.bench_access_scan --lines 200000
+"""
+import argparse
+import random
+import time
+from core import parse_failures
+from parsers.apache import ApacheParser
+from parsers.nginx import NginxParser
+from benchmarks.bench_prefilter import make_lines
+
+
+def measure(parse, lines) -> tuple:
+    start = time.perf_counter()
+    records = [parse(line) for line in lines]
+    return records, time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--lines", type=int, default=200_000)
+    args = arg_parser.parse_args()
+
+    combined = make_lines(args.lines, 0.1, random.Random(42))
+    clf = [line[:line.rindex(' "', 0, line.rindex(' "'))] + "\n" for line in combined]
+    cases = [
+        ("nginx, combined", NginxParser, combined),
+        ("apache, combined", ApacheParser, combined),
+        ("apache, CLF", ApacheParser, clf),
+    ]
+    with parse_failures.muted():
+        for label, parser, lines in cases:
+            baseline, regex = measure(parser._parse_regex, lines)
+            records, scanner = measure(parser.parse_line, lines)
+            assert records == baseline
+            print(f"{label}: regex {len(lines) / regex:,.0f} lines/s, "
+                  f"scanner {len(lines) / scanner:,.0f} lines/s ({regex / scanner:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Text-mode reading (decode every line, parse str) versus binary reading (parse
+bytes, decode only the fields the filter and the surviving records use) on a
+generated nginx access log, filtered to ``status > 499``. ``--non-ascii``
+sets the share of lines with a UTF-8 user agent, which the str scanner leaves
+to the regexes.
+
+    python -m benchmarks.bench_bytes_parse --size-mb 2048 --selectivity 0.01 --non-ascii 0.2
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from itertools import islice
+from core.filter import compile_rules
+from core.parser_manager import ParserManager
+from core.record import materialize
+from benchmarks.bench_prefilter import make_lines
+
+RULES = [{"field": "status", "gt": 499}]
+
+
+def write_log(path: str, size: int, selectivity: float, non_ascii: float, rng: random.Random):
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < size:
+            lines = []
+            for line in make_lines(10_000, 0.1, rng):
+                if rng.random() < selectivity:
+                    line = line.replace('" 200 ', '" 503 ', 1)
+                if rng.random() < non_ascii:
+                    line = line.replace("(X11;", "(X11; fr-FR; Gérard’s", 1)
+                lines.append(line)
+            chunk = "".join(lines)
+            f.write(chunk)
+            written += len(chunk.encode("utf-8"))
+
+
+def run(path: str, mode: str, parser_manager: ParserManager, record_filter) -> tuple:
+    kept = 0
+    start = time.perf_counter()
+    with open(path, mode) if mode == "rb" else open(path, mode, encoding="utf-8") as f:
+        while True:
+            batch = list(islice(f, 4096))
+            if not batch:
+                break
+            for record in parser_manager.parse_batch("nginx", batch):
+                if record_filter(record) is not None:
+                    materialize(record)
+                    kept += 1
+    return kept, time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--size-mb", type=int, default=2048)
+    arg_parser.add_argument("--selectivity", type=float, default=0.01)
+    arg_parser.add_argument("--non-ascii", type=float, default=0.0)
+    arg_parser.add_argument("--repeat", type=int, default=3, help="runs per mode; the best one counts")
+    arg_parser.add_argument("--file", help="existing access log to use instead of a generated one")
+    args = arg_parser.parse_args()
+
+    parser_manager = ParserManager()
+    record_filter = compile_rules(RULES)
+    path = args.file
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        write_log(path, args.size_mb << 20, args.selectivity, args.non_ascii, random.Random(42))
+    try:
+        size_mb = os.path.getsize(path) / (1 << 20)
+        text = binary = float("inf")
+        for _ in range(args.repeat):
+            text_kept, seconds = run(path, "r", parser_manager, record_filter)
+            text = min(text, seconds)
+            bytes_kept, seconds = run(path, "rb", parser_manager, record_filter)
+            binary = min(binary, seconds)
+            assert text_kept == bytes_kept
+        print(f"{size_mb:,.0f} MB, {text_kept:,} records kept: text {size_mb / text:,.1f} MB/s, "
+              f"bytes {size_mb / binary:,.1f} MB/s ({text / binary:.2f}x)")
+    finally:
+        if args.file is None:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Ingest time for a directory of nginx logs on the first run versus a rerun
+over the unchanged directory, which only has to check each file against
+its checkpoint.
+
+    python -m benchmarks.bench_checkpoints --size-gb 10 --files 100
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from core import output_manager
+from cli.ingest import LogIngestor
+from benchmarks.bench_prefilter import make_lines
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--size-gb", type=float, default=10.0, help="Total size of the generated logs")
+    arg_parser.add_argument("--files", type=int, default=100)
+    arg_parser.add_argument("--output", default="json")
+    arg_parser.add_argument("--jobs", type=int, default=1)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        logs = os.path.join(tmp, "logs")
+        os.makedirs(logs)
+        per_file = int(args.size_gb * 2**30 / args.files)
+        # Files are copies of one generated block, so setup doesn't dominate
+        block = "".join(make_lines(10_000, 0.1, rng)).encode()
+        for i in range(args.files):
+            with open(os.path.join(logs, f"access{i}.log"), "wb") as f:
+                for _ in range(per_file // len(block)):
+                    f.write(block)
+                f.write(block[:block.rfind(b"\n", 0, per_file % len(block)) + 1])
+        size = sum(os.path.getsize(os.path.join(logs, name)) for name in os.listdir(logs))
+
+        output_manager.OUTPUT_DIR = tmp
+        state = os.path.join(tmp, "checkpoints.json")
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            LogIngestor([logs], "nginx", args.output, jobs=args.jobs, checkpoint_file=state).run()
+            timings.append(time.perf_counter() - start)
+        first, rerun = timings
+        print(f"{size / 2**30:,.2f} GB in {args.files} files: first run {first:,.2f}s "
+              f"({size / 2**20 / first:,.1f} MB/s), unchanged rerun {rerun * 1000:,.1f} ms "
+              f"({first / rerun:,.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Read throughput per codec: decompression alone (open_input in read_chunks
+blocks) and full parsing through shard_parser, for the same nginx log
+stored plain, gzipped, as BGZF gzip (splittable), bzip2 and xz. MB/s are
+of uncompressed data.
+
+    python -m benchmarks.bench_compressed --lines 500000 --jobs 4
+"""
+import argparse
+import bz2
+import gzip
+import lzma
+import os
+import random
+import tempfile
+import time
+from core import shard_parser
+from core.compressed import bgzf_compress, open_input
+from core.pipeline import read_chunks
+from benchmarks.bench_prefilter import make_lines
+
+CODECS = {
+    "plain": ("access.log", bytes),
+    "gzip": ("access.log.gz", gzip.compress),
+    "bgzf": ("access.log.1.gz", bgzf_compress),
+    "bzip2": ("access.log.bz2", bz2.compress),
+    "xz": ("access.log.xz", lzma.compress),
+}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--lines", type=int, default=500_000)
+    arg_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--shard-mb", type=float, default=1.0)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(42)
+    data = "".join(make_lines(args.lines, 0.1, rng)).encode()
+    size_mb = len(data) / 2**20
+    shard_bytes = int(args.shard_mb * 2**20)
+    print(f"{size_mb:,.1f} MB uncompressed, {args.jobs} jobs")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (filename, compress) in CODECS.items():
+            path = os.path.join(tmp, filename)
+            with open(path, "wb") as f:
+                f.write(compress(data))
+
+            start = time.perf_counter()
+            with open_input(path) as f:
+                total = sum(len(line) for lines in read_chunks(f) for line in lines)
+            decompress = time.perf_counter() - start
+            assert total == len(data)
+
+            start = time.perf_counter()
+            records = sum(map(len, shard_parser.parse_files([path], "nginx", jobs=args.jobs,
+                                                             shard_bytes=shard_bytes)))
+            parse = time.perf_counter() - start
+
+            shards = len(shard_parser.plan_shards([path], "nginx", shard_bytes))
+            print(f"{name:>6}: {os.path.getsize(path) / 2**20:8,.1f} MB on disk, "
+                  f"{shards:4} shards, read {size_mb / decompress:8,.1f} MB/s, "
+                  f"parse {size_mb / parse:6,.1f} MB/s ({records:,} records)")
+
+
+if __name__ == "__main__":
+    main()
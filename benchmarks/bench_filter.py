@@ -0,0 +1,75 @@
+"""
+apply_filter() versus compile_rules() over synthetic access-log records.
+
+    python -m benchmarks.bench_filter --records 1000000 --rules 10 50
+"""
+import argparse
+import random
+import time
+from core.filter import apply_filter, compile_rules
+
+FIELDS = ["status", "method", "path", "ip", "size", "user_agent", "level", "message"]
+
+
+def make_records(count: int, rng: random.Random) -> list:
+    methods = ["GET", "POST", "PUT", "DELETE"]
+    levels = ["INFO", "WARN", "ERROR"]
+    return [
+        {
+            "status": rng.choice((200, 200, 200, 301, 404, 500)),
+            "method": rng.choice(methods),
+            "path": f"/api/v1/items/{rng.randrange(10_000)}",
+            "ip": f"10.0.{rng.randrange(256)}.{rng.randrange(256)}",
+            "size": rng.randrange(50_000),
+            "user_agent": "Mozilla/5.0 (X11; Linux x86_64)",
+            "level": rng.choice(levels),
+            "message": rng.choice(("request served", "upstream timeout", "cache miss")),
+        }
+        for _ in range(count)
+    ]
+
+
+def make_rules(count: int, rng: random.Random) -> list:
+    # Mostly permissive rules so every record runs through the whole list
+    templates = [
+        lambda: {"field": "status", "lt": 600},
+        lambda: {"field": "size", "gt": -1},
+        lambda: {"field": "method", "in": ["GET", "POST", "PUT", "DELETE", "PATCH"]},
+        lambda: {"field": "path", "regex": r"^/api/"},
+        lambda: {"field": "user_agent", "regex": "Mozilla|curl"},
+        lambda: {"field": "level", "in": ["INFO", "WARN", "ERROR", "DEBUG"]},
+        lambda: {"field": "ip", "regex": r"^10\."},
+        lambda: {"field": "missing_field", "equals": "x"},
+    ]
+    return [rng.choice(templates)() for _ in range(count)]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--records", type=int, default=1_000_000)
+    arg_parser.add_argument("--rules", type=int, nargs="+", default=[10, 50])
+    args = arg_parser.parse_args()
+
+    rng = random.Random(42)
+    records = make_records(args.records, rng)
+
+    for rule_count in args.rules:
+        rules = make_rules(rule_count, rng)
+
+        start = time.perf_counter()
+        baseline = [r for r in records if apply_filter(r, rules)]
+        interpreted = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compiled_filter = compile_rules(rules)
+        kept = compiled_filter.filter_batch(records)
+        compiled = time.perf_counter() - start
+
+        assert len(kept) == len(baseline)
+        print(f"{args.records} records x {rule_count} rules: "
+              f"apply_filter {args.records / interpreted:,.0f} rec/s, "
+              f"compiled {args.records / compiled:,.0f} rec/s ({interpreted / compiled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
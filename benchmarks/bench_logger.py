@@ -0,0 +1,53 @@
+"""
+Diagnostic logging throughput: the old open/append/close-per-call path versus
+the buffered background writer behind core.logger.log().
+
+    python -m benchmarks.bench_logger --count 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+
+def legacy_log(message: str, log_dir: str):
+    # core.logger.log() before the buffered handler, minus console output
+    formatted = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}][WARNING] {message}"
+    log_file = os.path.join(log_dir, f"{datetime.now().strftime('%Y-%m-%d')}.log")
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write(formatted + "\n")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--count", type=int, default=1_000_000)
+    args = arg_parser.parse_args()
+
+    message = 'Failed to parse line: 10.0.0.1 - - [14/Sep/2025:12:00:00 +0000] "GET / HTTP/1.1" 200'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["UNILOG_LOG_DIR"] = tmp
+        from core import logger
+
+        legacy_dir = os.path.join(tmp, "legacy")
+        os.makedirs(legacy_dir)
+        start = time.perf_counter()
+        for _ in range(args.count):
+            legacy_log(message, legacy_dir)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.count):
+            logger.log(message, level="WARN", console=False)
+        logger.flush()
+        buffered = time.perf_counter() - start
+        logger.shutdown()
+
+    print(f"{args.count} messages")
+    print(f"  open/append per call : {args.count / legacy:12,.0f} lines/sec")
+    print(f"  buffered writer      : {args.count / buffered:12,.0f} lines/sec ({legacy / buffered:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Peak RSS and throughput of reading one large nginx log: readlines() of the
+whole file, buffered read_chunks, and a MappedFile read in chunks, with
+one thread or --threads threads over the same mapping. Each reader runs
+in a fresh process so its peak RSS is its own. The line index is built
+and saved once, and then used for random line lookups.
+
+    python -m benchmarks.bench_mmap --size-gb 10
+
+readlines() needs about three times the file size in memory; pass
+--skip-readlines on smaller machines.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from core.mapped import INDEX_SUFFIX, MappedFile
+from core.pipeline import read_chunks
+from benchmarks.bench_prefilter import make_lines
+
+
+def count_readlines(path: str, threads: int) -> int:
+    with open(path, "rb") as f:
+        return len(f.readlines())
+
+
+def count_read_chunks(path: str, threads: int) -> int:
+    with open(path, "rb") as f:
+        return sum(map(len, read_chunks(f)))
+
+
+def count_mapped(path: str, threads: int) -> int:
+    with MappedFile(path) as mapped:
+        if threads == 1:
+            return sum(map(len, mapped.chunks()))
+        with ThreadPoolExecutor(threads) as pool:
+            return sum(pool.map(lambda span: sum(map(len, mapped.chunks(*span))), mapped.ranges(threads)))
+
+
+def _run(reader, path: str, threads: int, results):
+    start = time.perf_counter()
+    lines = reader(path, threads)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    results.put((lines, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024))
+
+
+def measure(reader, path: str, threads: int = 1):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run, args=(reader, path, threads, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--size-gb", type=float, default=10.0)
+    arg_parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--lookups", type=int, default=10_000)
+    arg_parser.add_argument("--skip-readlines", action="store_true")
+    args = arg_parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "access.log")
+        block = "".join(make_lines(10_000, 0.1, rng)).encode()
+        with open(path, "wb") as f:
+            for _ in range(max(1, int(args.size_gb * 2**30) // len(block))):
+                f.write(block)
+        size_mb = os.path.getsize(path) / 2**20
+        print(f"{size_mb / 1024:,.2f} GB file")
+
+        readers = [("readlines()", count_readlines, 1), ("read_chunks", count_read_chunks, 1),
+                   ("mmap", count_mapped, 1), (f"mmap x{args.threads}", count_mapped, args.threads)]
+        for name, reader, threads in readers:
+            if reader is count_readlines and args.skip_readlines:
+                continue
+            lines, elapsed, rss = measure(reader, path, threads)
+            print(f"{name:>12}: {lines:,} lines in {elapsed:,.2f}s ({size_mb / elapsed:,.0f} MB/s), "
+                  f"peak RSS {rss / 2**20:,.0f} MB")
+
+        with MappedFile(path) as mapped:
+            start = time.perf_counter()
+            index = mapped.load_index()
+            built = time.perf_counter() - start
+            numbers = [rng.randrange(index.lines) for _ in range(args.lookups)]
+            start = time.perf_counter()
+            for number in numbers:
+                mapped.line_offset(number)
+            lookup = (time.perf_counter() - start) / args.lookups
+        print(f"line index: built in {built:,.2f}s ({size_mb / built:,.0f} MB/s), "
+              f"{os.path.getsize(path + INDEX_SUFFIX) / 2**10:,.0f} KB sidecar, "
+              f"{lookup * 1e6:,.1f} us per line lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+JSONParser.parse_batch() over text lines versus parse_buffer() over raw
+NDJSON bytes, with each installed decoder and with a field projection.
+
+    python -m benchmarks.bench_ndjson --records 200000
+"""
+import argparse
+import json
+import random
+import time
+from core import parse_failures
+import parsers.json_parser as json_parser
+from parsers.json_parser import JSONParser
+
+
+def make_buffer(count: int, rng: random.Random) -> bytes:
+    lines = []
+    for i in range(count):
+        lines.append(json.dumps({
+            "timestamp": f"2025-09-14T12:{(i // 6000) % 60:02d}:{(i // 100) % 60:02d}Z",
+            "level": rng.choice(["INFO", "WARN", "ERROR"]),
+            "service": f"svc-{rng.randrange(20)}",
+            "message": rng.choice(["request served", "upstream timeout", "cache miss"]),
+            "latency_ms": rng.random() * 250,
+            "request": {"method": "GET", "path": f"/api/v1/items/{rng.randrange(10_000)}", "status": 200},
+            "tags": ["web", "eu-west-1"],
+        }))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def timed(function) -> tuple:
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--records", type=int, default=200_000)
+    args = arg_parser.parse_args()
+
+    buffer = make_buffer(args.records, random.Random(42))
+    lines = buffer.decode("utf-8").splitlines()
+
+    with parse_failures.muted():
+        baseline, elapsed = timed(lambda: JSONParser.parse_batch(lines))
+        print(f"parse_batch (json, text lines): {args.records / elapsed:,.0f} records/s")
+        for name in json_parser.JSON_DECODERS:
+            json_parser.JSON_DECODER = name
+            try:
+                json_parser.get_decoder()
+            except ValueError:
+                print(f"parse_buffer ({name}): not installed")
+                continue
+            records, elapsed = timed(lambda: JSONParser.parse_buffer(buffer))
+            assert records == baseline
+            print(f"parse_buffer ({name}): {args.records / elapsed:,.0f} records/s")
+            _, elapsed = timed(lambda: JSONParser.parse_buffer(buffer, fields=["timestamp", "level"]))
+            print(f"parse_buffer ({name}, 2 fields): {args.records / elapsed:,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+ParserManager.parse() per line versus parse_batch() on synthetic nginx lines.
+
+    python -m benchmarks.bench_parse_batch --lines 200000
+"""
+import argparse
+import random
+import time
+from core.parser_manager import ParserManager
+from benchmarks.bench_prefilter import make_lines
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--lines", type=int, default=200_000)
+    arg_parser.add_argument("--bad", type=float, default=0.05, help="fraction of unparseable lines")
+    args = arg_parser.parse_args()
+
+    rng = random.Random(42)
+    lines = [line if rng.random() >= args.bad else "garbage\n" for line in make_lines(args.lines, 0.0, rng)]
+    manager = ParserManager()
+
+    start = time.perf_counter()
+    baseline = [r for r in (manager.parse("nginx", line) for line in lines) if r]
+    per_line = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rejects = []
+    batched = manager.parse_batch("nginx", lines, rejects)
+    batch = time.perf_counter() - start
+
+    assert batched == baseline and len(rejects) + len(batched) == len(lines)
+    print(f"{args.lines} lines: parse {args.lines / per_line:,.0f} lines/s, "
+          f"parse_batch {args.lines / batch:,.0f} lines/s ({per_line / batch:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
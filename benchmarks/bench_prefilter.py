@@ -0,0 +1,75 @@
+"""
+Full parse+filter versus the raw-line prefilter on nginx access lines, with a
+``path ~ "timeout|failed"`` rule at several selectivities.
+
+    python -m benchmarks.bench_prefilter --lines 200000 --selectivity 0.01 0.1 0.5
+"""
+import argparse
+import random
+import time
+from core.filter import compile_rules
+from core.prefilter import build_prefilter
+from parsers.nginx import NginxParser
+
+RULES = [{"field": "path", "regex": "timeout|failed"}]
+
+
+def make_lines(count: int, selectivity: float, rng: random.Random) -> list:
+    lines = []
+    for _ in range(count):
+        if rng.random() < selectivity:
+            path = rng.choice(("/jobs/failed", "/upstream/timeout"))
+        else:
+            path = f"/api/v1/items/{rng.randrange(10_000)}"
+        lines.append(
+            f'10.0.{rng.randrange(256)}.{rng.randrange(256)} - - [10/Oct/2000:13:55:36 -0700] '
+            f'"GET {path} HTTP/1.1" 200 {rng.randrange(50_000)} "-" "Mozilla/5.0 (X11; Linux x86_64)"\n'
+        )
+    return lines
+
+
+def full_path(lines, record_filter):
+    kept = []
+    for line in lines:
+        record = NginxParser.parse_line(line)
+        if record and record_filter(record) is not None:
+            kept.append(record)
+    return kept
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--lines", type=int, default=200_000)
+    arg_parser.add_argument("--selectivity", type=float, nargs="+", default=[0.01, 0.1, 0.5])
+    args = arg_parser.parse_args()
+
+    rng = random.Random(42)
+    record_filter = compile_rules(RULES)
+    prefilter = build_prefilter(record_filter, NginxParser.VERBATIM_FIELDS)
+
+    for selectivity in args.selectivity:
+        lines = make_lines(args.lines, selectivity, rng)
+        buffer = "".join(lines).encode("utf-8")
+
+        start = time.perf_counter()
+        baseline = full_path(lines, record_filter)
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        kept = full_path(prefilter.filter_lines(lines), record_filter)
+        per_line = time.perf_counter() - start
+
+        start = time.perf_counter()
+        candidates = [line.decode("utf-8") for line in prefilter.filter_buffer(buffer)]
+        from_buffer = full_path(candidates, record_filter)
+        buffered = time.perf_counter() - start
+
+        assert kept == baseline and from_buffer == baseline
+        print(f"{args.lines} lines at {selectivity:.0%} selectivity: "
+              f"full {args.lines / full:,.0f} lines/s, "
+              f"prefilter {args.lines / per_line:,.0f} lines/s ({full / per_line:.1f}x), "
+              f"buffer scan {args.lines / buffered:,.0f} lines/s ({full / buffered:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Memory held by parsed nginx records kept as dicts versus CompactRecords,
+measured with tracemalloc (values included, since both layouts share them).
+
+    python -m benchmarks.bench_records --records 10000000
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from core.record import compact
+from parsers.nginx import NginxParser
+from benchmarks.bench_prefilter import make_lines
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--records", type=int, default=10_000_000)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(42)
+    tracemalloc.start()
+    records = []
+    while len(records) < args.records:
+        lines = make_lines(min(100_000, args.records - len(records)), 0.1, rng)
+        records.extend(NginxParser.parse_batch(lines))
+    gc.collect()
+    as_dicts = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    compacted = [compact(record) for record in records]
+    seconds = time.perf_counter() - start
+    del records
+    gc.collect()
+    as_compact = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    count = len(compacted)
+    print(f"{count:,} records: dicts {as_dicts / count:,.0f} B/record ({as_dicts / 2**20:,.0f} MB), "
+          f"CompactRecords {as_compact / count:,.0f} B/record ({as_compact / 2**20:,.0f} MB), "
+          f"{as_dicts / as_compact:.2f}x smaller; compact() {count / seconds:,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
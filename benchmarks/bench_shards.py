@@ -0,0 +1,55 @@
+"""
+Parse+filter throughput of core.shard_parser.parse_files over nginx access
+files with 1, 2, 4 and 8 worker processes.
+
+    python -m benchmarks.bench_shards --size-mb 256 --jobs 1 2 4 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from core.shard_parser import SHARD_BYTES, parse_files
+from benchmarks.bench_prefilter import RULES, make_lines
+
+
+def write_file(path: str, size: int, selectivity: float, rng: random.Random):
+    written = 0
+    with open(path, "w") as f:
+        while written < size:
+            lines = make_lines(10_000, selectivity, rng)
+            f.writelines(lines)
+            written += sum(map(len, lines))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--size-mb", type=int, default=256, help="Total size of the generated logs")
+    arg_parser.add_argument("--files", type=int, default=4)
+    arg_parser.add_argument("--selectivity", type=float, default=0.1)
+    arg_parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    arg_parser.add_argument("--shard-mb", type=float, default=SHARD_BYTES / 2**20)
+    arg_parser.add_argument("--unordered", action="store_true")
+    args = arg_parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"access{i}.log") for i in range(args.files)]
+        for path in paths:
+            write_file(path, args.size_mb * 2**20 // args.files, args.selectivity, rng)
+        size = sum(map(os.path.getsize, paths))
+
+        baseline = None
+        for jobs in args.jobs:
+            start = time.perf_counter()
+            kept = sum(len(batch) for batch in parse_files(paths, "nginx", jobs, rules=RULES,
+                                                           ordered=not args.unordered,
+                                                           shard_bytes=int(args.shard_mb * 2**20)))
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            print(f"{jobs} jobs: {size / 2**20 / seconds:,.1f} MB/s, {kept:,} records kept, "
+                  f"{baseline / seconds:.2f}x vs {args.jobs[0]} job(s) (cpus: {os.cpu_count()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Cold-start import cost of the JSON-only tail path, measured with
+``python -X importtime``. Fails (exit code 1) if the median cumulative import
+time exceeds the budget or if any heavy optional SDK gets imported.
+
+    python -m benchmarks.bench_startup --budget-ms 150
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# What `cli/index.py --tail` with JSON output imports before reading any log line
+STARTUP_IMPORTS = ["cli.index", "cli.tail", "core.output_manager", "core.parser_manager"]
+
+HEAVY_MODULES = ["pandas", "numpy", "sklearn", "elasticsearch", "boto3", "botocore",
+                 "google.cloud.storage", "azure.storage.blob", "pyarrow"]
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_once() -> tuple:
+    code = (
+        f"import sys\n"
+        f"import {', '.join(STARTUP_IMPORTS)}\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    for line in result.stderr.splitlines():
+        # "import time:      self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only top-level entries: nested imports are already in their parent's cumulative time
+        if not name.startswith("  "):
+            total_us += int(cumulative)
+    heavy = [m for m in result.stdout.strip().split(",") if m]
+    return total_us / 1000, heavy
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--budget-ms", type=float, default=150.0)
+    arg_parser.add_argument("--runs", type=int, default=7)
+    args = arg_parser.parse_args()
+
+    timings = []
+    heavy = []
+    for _ in range(args.runs):
+        elapsed, heavy_run = measure_once()
+        timings.append(elapsed)
+        heavy = heavy or heavy_run
+
+    median = statistics.median(timings)
+    print(f"JSON-only tail startup imports: median {median:.1f} ms over {args.runs} runs "
+          f"(min {min(timings):.1f}, max {max(timings):.1f}), budget {args.budget_ms:.0f} ms")
+    if heavy:
+        print(f"Heavy modules imported at startup: {', '.join(heavy)}")
+    if heavy or median > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
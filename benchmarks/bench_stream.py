@@ -0,0 +1,45 @@
+"""
+StreamManager throughput at micro-batch sizes of 1, 100 and 10,000 lines,
+writing nginx records to the JSON output, with the batch statistics.
+
+    python -m benchmarks.bench_stream --lines 100000 --output json
+"""
+import argparse
+import random
+import tempfile
+import time
+from core import output_manager
+from core.output_manager import OutputManager
+from core.stream_manager import StreamManager
+from benchmarks.bench_prefilter import make_lines
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--lines", type=int, default=100_000)
+    arg_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 10_000])
+    arg_parser.add_argument("--output", default="json")
+    arg_parser.add_argument("--workers", type=int, default=4)
+    args = arg_parser.parse_args()
+
+    lines = make_lines(args.lines, 0.1, random.Random(42))
+    for batch_size in args.batch_sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            output_manager.OUTPUT_DIR = tmp
+            manager = StreamManager(output_manager=OutputManager([args.output]), num_worker_threads=args.workers,
+                                    batch_records=batch_size)
+            for line in lines:
+                manager.enqueue("nginx", line)
+            start = time.perf_counter()
+            manager.start()
+            manager.wait_for_completion()
+            elapsed = time.perf_counter() - start
+            manager.stop()
+        stats = manager.get_stats()
+        print(f"batch {batch_size:>6}: {args.lines / elapsed:10,.0f} lines/s, {stats['batches']:,} batches "
+              f"(mean {stats['mean_lines']:,.0f} lines), latency p50 {stats['latency_p50_ms']:,.2f} ms "
+              f"p99 {stats['latency_p99_ms']:,.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+The previous RFC 5424 regex (structured data kept as an opaque string)
+versus parsers.rfc5424.scan_rfc5424, with 0, 1 and 3 SD-ELEMENTs per line.
+
+    python -m benchmarks.bench_syslog --lines 200000
+"""
+import argparse
+import random
+import re
+import time
+from core.timestamps import parse_rfc3339
+from parsers.rfc5424 import scan_rfc5424
+
+LEGACY_REGEX = re.compile(
+    r'<(?P<priority>\d+)>(?P<version>\d+) '
+    r'(?P<timestamp>[\d\-T:.Z]+) '
+    r'(?P<host>\S+) '
+    r'(?P<app>\S+) '
+    r'(?P<pid>\S+) '
+    r'(?P<msgid>\S+) '
+    r'(?P<structured_data>-|\[.*?\]) '
+    r'(?P<message>.+)'
+)
+
+ELEMENTS = ['[exampleSDID@32473 iut="3" eventSource="Application" eventID="1011"]',
+            '[origin ip="10.0.0.1" software="unilog"]',
+            '[meta sequenceId="{seq}" path="C:\\\\tmp\\\\logs"]']
+
+
+def legacy(line: str):
+    match = LEGACY_REGEX.match(line)
+    if not match:
+        return None
+    data = match.groupdict()
+    data["timestamp"] = parse_rfc3339(data["timestamp"])
+    return data
+
+
+def make_lines(count: int, elements: int, rng: random.Random) -> list:
+    lines = []
+    for i in range(count):
+        sd = "".join(ELEMENTS[:elements]).format(seq=i) or "-"
+        lines.append(f"<{rng.randrange(192)}>1 2025-09-14T12:04:{i % 60:02d}.003Z host{rng.randrange(50)} "
+                     f"app {rng.randrange(1, 65536)} ID47 {sd} request {i} handled in {rng.randrange(1000)} ms\n")
+    return lines
+
+
+def measure(parse, lines) -> tuple:
+    start = time.perf_counter()
+    records = [parse(line) for line in lines]
+    return records, time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--lines", type=int, default=200_000)
+    args = arg_parser.parse_args()
+
+    for elements in (0, 1, 3):
+        lines = make_lines(args.lines, elements, random.Random(42))
+        baseline, regex = measure(legacy, lines)
+        records, scanner = measure(scan_rfc5424, lines)
+        assert None not in records and [r["message"] for r in records] == [r["message"] for r in baseline]
+        print(f"{elements} SD-ELEMENTs: regex {len(lines) / regex:,.0f} lines/s, "
+              f"scanner {len(lines) / scanner:,.0f} lines/s ({regex / scanner:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+End-to-end latency of TailEngine over many files: a writer thread appends
+timestamped lines to random files at --rate lines/s, and the tail loop
+measures how long each line took to come back from poll(). Runs with
+inotify and with the polling fallback.
+
+    python -m benchmarks.bench_tail --files 2000 --rate 5000 --seconds 10
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from core.tail_engine import TailEngine
+
+
+def writer(paths, rate: float, seconds: float, rng: random.Random):
+    handles = [open(path, "ab", buffering=0) for path in paths]
+    try:
+        interval = 1.0 / rate
+        deadline = time.perf_counter() + seconds
+        next_write = time.perf_counter()
+        while next_write < deadline:
+            handles[rng.randrange(len(handles))].write(f"{time.perf_counter():.6f} GET /item\n".encode())
+            next_write += interval
+            delay = next_write - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    finally:
+        for handle in handles:
+            handle.close()
+
+
+def run(paths, use_inotify: bool, rate: float, seconds: float, interval: float):
+    latencies = []
+    with TailEngine(paths, checkpoint_file=None, poll_interval=interval, use_inotify=use_inotify) as engine:
+        engine.poll(0)
+        thread = threading.Thread(target=writer, args=(paths, rate, seconds, random.Random(42)))
+        thread.start()
+        while thread.is_alive() or engine.dirty:
+            for _, lines in engine.poll(interval):
+                now = time.perf_counter()
+                latencies.extend(now - float(line.split(b" ", 1)[0]) for line in lines)
+        for _, lines in engine.poll(interval * 2):
+            now = time.perf_counter()
+            latencies.extend(now - float(line.split(b" ", 1)[0]) for line in lines)
+        thread.join()
+    return sorted(latencies)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--files", type=int, default=2000)
+    arg_parser.add_argument("--dirs", type=int, default=10)
+    arg_parser.add_argument("--rate", type=float, default=5000, help="Lines written per second")
+    arg_parser.add_argument("--seconds", type=float, default=10)
+    arg_parser.add_argument("--interval", type=float, default=1.0, help="Poll interval of the fallback")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            directory = os.path.join(tmp, f"dir{i % args.dirs}")
+            os.makedirs(directory, exist_ok=True)
+            paths.append(os.path.join(directory, f"app{i}.log"))
+            open(paths[-1], "wb").close()
+        for name, use_inotify in (("inotify", True), ("polling", False)):
+            latencies = run(paths, use_inotify, args.rate, args.seconds, args.interval)
+            if not latencies:
+                print(f"{name:>8}: no lines")
+                continue
+            ms = [latency * 1000 for latency in latencies]
+            print(f"{name:>8}: {len(ms):,} lines from {args.files} files, latency p50 {statistics.median(ms):,.1f} ms, "
+                  f"p99 {ms[int(len(ms) * 0.99)]:,.1f} ms, max {ms[-1]:,.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
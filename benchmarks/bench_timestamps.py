@@ -0,0 +1,44 @@
+"""
+datetime.strptime() versus core.timestamps.parse_clf() on access-log times,
+with many lines per second (memo hits) and with every time distinct.
+
+    python -m benchmarks.bench_timestamps --lines 500000 --lines-per-second 200
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from core import timestamps
+
+
+def make_times(count: int, per_second: int) -> list:
+    start = datetime(2025, 9, 14, 12, 0, 0, tzinfo=timezone(timedelta(hours=-7)))
+    return [(start + timedelta(seconds=i // per_second)).strftime(timestamps.CLF_FORMAT) for i in range(count)]
+
+
+def run(label: str, times: list):
+    start = time.perf_counter()
+    baseline = [datetime.strptime(t, timestamps.CLF_FORMAT).isoformat() for t in times]
+    strptime = time.perf_counter() - start
+
+    timestamps.clear_memos()
+    start = time.perf_counter()
+    decoded = [timestamps.parse_clf(t) for t in times]
+    fast = time.perf_counter() - start
+
+    assert decoded == baseline
+    print(f"{label}: strptime {len(times) / strptime:,.0f}/s, "
+          f"parse_clf {len(times) / fast:,.0f}/s ({strptime / fast:.1f}x)")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--lines", type=int, default=500_000)
+    arg_parser.add_argument("--lines-per-second", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    run(f"{args.lines_per_second} lines/second", make_times(args.lines, args.lines_per_second))
+    run("distinct seconds", make_times(args.lines, 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,4 @@
 import argparse
-from cli.ingest import ingest_logs
-from cli.parse import parse_logs
-from cli.tail import tail_logs
-from cli.utils import helper
 
 def main():
     parser = argparse.ArgumentParser(description="Unilog CLI - Universal log ingestion and parsing")
@@ -10,17 +6,23 @@ def main():
     parser.add_argument("--parse", action="store_true", help="Parse logs")
     parser.add_argument("--tail", action="store_true", help="Tail logs in real time")
     parser.add_argument("--debug", action="store_true", help="Enable debug mode")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="Parse files with N worker processes (ingest and parse)")
 
     args = parser.parse_args()
 
     if args.debug:
         print("Debug mode enabled")
 
+    # Subcommands are imported on demand so e.g. --tail doesn't load the ingest path
     if args.ingest:
-        ingest_logs()
+        from cli.ingest import ingest_logs
+        ingest_logs(jobs=args.jobs)
     if args.parse:
-        parse_logs()
+        from cli.parse import parse_logs
+        parse_logs(jobs=args.jobs)
     if args.tail:
+        from cli.tail import tail_logs
         tail_logs()
 
 if __name__ == "__main__":
@@ -1,20 +1,45 @@
 import os
 import glob
-from typing import List
-from core.parser_manager import get_parser
+import re
+from typing import Dict, List, Optional
+from core.parser_manager import AUTO, ParserManager
 from core.logger import log
-from core.output_manager import send_to_output
-from cloud.s3 import upload as s3_upload
-from cloud.gcp import upload as gcp_upload
-from cloud.azure import upload as azure_upload
+from core.record import compact
+from core import parse_failures
+from core.output_manager import close as close_outputs, send_to_output, CLOUD_PROVIDERS, DEFERRED_OUTPUTS
+from core.pipeline import FLUSH_RECORDS, file_chunks
+from core.checkpoints import CHECKPOINT_FILE, CheckpointStore
+from core.compressed import CODECS, is_compressed
+
+# access.log, rotated access.log.1 and archives such as access.log.2.gz
+LOG_FILE = re.compile(r"^(?P<base>.+\.log)(?:\.(?P<rotation>\d+))?(?:%s)?$"
+                      % "|".join(re.escape(ext) for ext in CODECS))
+
+
+def _rotation_order(path: str) -> tuple:
+    # Oldest first: access.log.3.gz, access.log.2.gz, access.log.1, access.log
+    match = LOG_FILE.match(os.path.basename(path))
+    return os.path.dirname(path), match.group("base"), -int(match.group("rotation") or 0)
 
 
 class LogIngestor:
-    def __init__(self, input_dirs: List[str], parser_type: str, output_type: str, cloud_provider: str = None):
+    def __init__(self, input_dirs: List[str], parser_type: str, output_type: str, cloud_provider: str = None,
+                 jobs: int = 1, flush_size: int = FLUSH_RECORDS, checkpoint_file: Optional[str] = CHECKPOINT_FILE):
         self.input_dirs = input_dirs
         self.parser_type = parser_type
         self.output_type = output_type
         self.cloud_provider = cloud_provider
+        # Worker processes; above 1 files are parsed in shards (see core.shard_parser)
+        self.jobs = jobs
+        # Records are sent to the output whenever this many are pending
+        self.flush_size = flush_size
+        # Only bytes added since the last run are read; "" or None reads everything
+        self.checkpoints = CheckpointStore(checkpoint_file) if checkpoint_file else None
+        # Offsets reached by the records in parsed_data, committed once they are output
+        self.pending_offsets: Dict[str, int] = {}
+        # Decompressed bytes to skip per archive, already ingested before it was compressed
+        self.copied: Dict[str, int] = {}
+        self.output_failed = False
         self.parsed_data = []
 
     def scan_files(self):
@@ -23,29 +48,115 @@ class LogIngestor:
             if not os.path.exists(dir_path):
                 log(f"Directory not found: {dir_path}")
                 continue
-            log_files.extend(glob.glob(os.path.join(dir_path, "*.log")))
+            paths = [path for path in glob.glob(os.path.join(dir_path, "*.log*"))
+                     if LOG_FILE.match(os.path.basename(path)) and os.path.isfile(path)]
+            log_files.extend(sorted(paths, key=_rotation_order))
         log(f"Found {len(log_files)} log files")
         return log_files
 
-    def parse_files(self, log_files: List[str]):
-        parser = get_parser(self.parser_type)
+    def spans(self, log_files: List[str]) -> Dict[str, tuple]:
+        """
+        (start, end) byte range still to ingest per file.
+        """
+        spans = {}
         for file_path in log_files:
-            log(f"Parsing file: {file_path}")
             try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    for line in f:
-                        record = parser(line)
-                        self.parsed_data.append(record)
+                if self.checkpoints is not None:
+                    spans[file_path] = self.checkpoints.span(file_path)
+                    if spans[file_path][0] == 0 and is_compressed(file_path):
+                        self.copied[file_path] = self.checkpoints.copied(file_path)
+                else:
+                    spans[file_path] = (0, os.path.getsize(file_path))
+            except OSError as e:
+                log(f"Cannot read {file_path}: {e}")
+        skipped = sum(1 for start, end in spans.values() if start >= end)
+        if skipped:
+            log(f"Skipping {skipped} files with no new data")
+        return spans
+
+    def parse_files(self, log_files: List[str]):
+        spans = self.spans(log_files)
+        parser_manager = ParserManager()
+        if self.jobs > 1:
+            from core.shard_parser import parse_shards, plan_shards
+
+            # Archives holding lines already ingested are read here, past those lines
+            copied = [path for path in spans if self.copied.get(path)]
+            shards = plan_shards([path for path in spans if path not in copied], self.parser_type,
+                                 parser_manager=parser_manager, spans=spans)
+            # A file with a range that failed to parse isn't checkpointed past it
+            failed = set()
+            for shard, records, ok in parse_shards(shards, self.jobs, parser_manager=parser_manager):
+                failed.update(entry[0] for entry, parsed in zip(shard, ok) if not parsed)
+                self.add_records(records, {path: end for path, _, end, _ in shard if path not in failed})
+            spans = {path: spans[path] for path in copied}
+
+        # Parsers with parse_buffer (NDJSON) decode a whole chunk at once
+        parser = None if self.parser_type == AUTO else parser_manager.get(self.parser_type)
+        for file_path, (start, end) in spans.items():
+            if start >= end:
+                continue
+            log(f"Parsing file: {file_path}" + (f" from byte {start}" if start else ""))
+            try:
+                self.read_file(parser_manager, parser, file_path, start, end)
             except Exception as e:
                 log(f"Error parsing {file_path}: {e}")
 
+    def read_file(self, parser_manager: ParserManager, parser, file_path: str, start: int, end: int):
+        compressed = is_compressed(file_path)
+        position = start
+        skip = self.copied.get(file_path, 0)
+        with parse_failures.source(file_path):
+            for lines in file_chunks(file_path, start, end):
+                position += sum(map(len, lines))
+                if skip > 0:
+                    count = 0
+                    while count < len(lines) and skip > 0:
+                        skip -= len(lines[count])
+                        count += 1
+                    lines = lines[count:]
+                    if not lines:
+                        continue
+                if hasattr(parser, "parse_buffer"):
+                    records = parser.parse_buffer(b"".join(lines))
+                else:
+                    records = parser_manager.parse_batch(self.parser_type, lines)
+                # Positions inside an archive can't be resumed from, only its end
+                self.add_records(list(map(compact, records)), None if compressed else {file_path: position})
+        if compressed:
+            self.add_records([], {file_path: end})
+
+    def add_records(self, records: List, offsets: Optional[Dict[str, int]] = None):
+        self.parsed_data.extend(records)
+        if offsets:
+            self.pending_offsets.update(offsets)
+        if len(self.parsed_data) >= self.flush_size:
+            self.send_output()
+
+    def report_match_rates(self):
+        parse_failures.report()
+        # In auto mode each source reports under the parser detected for it
+        parser = None if self.parser_type == AUTO else self.parser_type
+        for stats in parse_failures.get_stats(parser=parser):
+            log(f"{stats['source']}: {stats['matched']}/{stats['total']} lines matched the {stats['parser']} parser")
+
     def send_output(self):
         if not self.parsed_data:
             log("No data to send to output")
-            return
+        elif send_to_output(self.parsed_data, self.output_type):
+            log(f"Sent {len(self.parsed_data)} records to {self.output_type}")
+        else:
+            # Nothing from here on is checkpointed, so the next run retries it
+            self.output_failed = True
+        self.parsed_data = []
+        # Records of deferred outputs aren't delivered before close_outputs()
+        if self.output_type not in DEFERRED_OUTPUTS:
+            self.commit_checkpoints()
 
-        send_to_output(self.parsed_data, self.output_type)
-        log(f"Sent {len(self.parsed_data)} records to {self.output_type}")
+    def commit_checkpoints(self):
+        if self.checkpoints is not None and self.pending_offsets and not self.output_failed:
+            self.checkpoints.commit_all(self.pending_offsets)
+        self.pending_offsets = {}
 
     def upload_cloud(self):
         if not self.cloud_provider:
@@ -56,27 +167,31 @@ class LogIngestor:
             log(f"Output file {file_path} not found for cloud upload")
             return
 
-        if self.cloud_provider.lower() == "s3":
-            s3_upload(file_path)
-        elif self.cloud_provider.lower() == "gcp":
-            gcp_upload(file_path)
-        elif self.cloud_provider.lower() == "azure":
-            azure_upload(file_path)
+        upload = CLOUD_PROVIDERS.get(self.cloud_provider.lower())
+        if upload:
+            upload(file_path)
         else:
             log(f"Unknown cloud provider: {self.cloud_provider}")
 
     def run(self):
         files = self.scan_files()
         self.parse_files(files)
+        self.report_match_rates()
         self.send_output()
+        if not close_outputs():
+            # Nothing is checkpointed, so the next run retries it
+            self.output_failed = True
+        self.commit_checkpoints()
         self.upload_cloud()
 
 
-def ingest_logs(input_dirs=None, parser_type="generic", output_type="json", cloud_provider=None):
+def ingest_logs(input_dirs=None, parser_type="generic", output_type="json", cloud_provider=None, jobs=1,
+                checkpoint_file=CHECKPOINT_FILE):
     if input_dirs is None:
         input_dirs = ["./logs"]
 
-    log(f"Starting ingestion with parser={parser_type}, output={output_type}, cloud={cloud_provider}")
-    ingestor = LogIngestor(input_dirs, parser_type, output_type, cloud_provider)
+    log(f"Starting ingestion with parser={parser_type}, output={output_type}, cloud={cloud_provider}, jobs={jobs}")
+    ingestor = LogIngestor(input_dirs, parser_type, output_type, cloud_provider, jobs,
+                           checkpoint_file=checkpoint_file)
     ingestor.run()
     log("Ingestion complete")
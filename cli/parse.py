@@ -1,46 +1,104 @@
 from typing import List
-from core.parser_manager import get_parser
-from core.filter import apply_filter
-from core.output_manager import send_to_output
-from ml.anomaly_detection import detect as detect_anomalies
+from core.parser_manager import AUTO, ParserManager
+from core.filter import DEFAULT_FILTER_RULES, compile_rules
+from core.prefilter import build_prefilter
+from core.record import compact
+from core.output_manager import close as close_outputs, send_to_output
+from core.pipeline import FLUSH_RECORDS, file_chunks
+from ml import ML_MODELS
 from core.logger import log
+from core import parse_failures
 
 
 class LogParser:
-    def __init__(self, parser_type: str = "generic", output_type: str = "json", enable_ml: bool = False):
+    def __init__(self, parser_type: str = "generic", output_type: str = "json", enable_ml: bool = False,
+                 columnar_filter: bool = False, jobs: int = 1, flush_size: int = FLUSH_RECORDS):
         self.parser_type = parser_type
         self.output_type = output_type
         self.enable_ml = enable_ml
+        # Filter whole files as NumPy/pandas columns instead of record by record
+        self.columnar_filter = columnar_filter
+        # Worker processes; above 1 files are parsed in shards (see core.shard_parser)
+        self.jobs = jobs
+        # Records are sent to the output (and ML) whenever this many are pending
+        self.flush_size = flush_size
+        self.parser_manager = ParserManager()
         self.parsed_data = []
 
+    def prefilter_lines(self, lines: List[str], record_filter) -> List[str]:
+        """
+        Drop lines the filter cannot accept before they are parsed.
+        """
+        fields = self.parser_manager.verbatim_fields(self.parser_type)
+        prefilter = build_prefilter(record_filter, fields)
+        return prefilter.filter_lines(lines, self.parser_type) if prefilter else lines
+
     def parse_lines(self, lines: List[str]):
-        parser = get_parser(self.parser_type)
-        for line in lines:
+        if self.columnar_filter:
+            self.parse_lines_columnar(lines)
+            return
+
+        record_filter = compile_rules()
+        lines = self.prefilter_lines(lines, record_filter)
+        for record in self.parser_manager.parse_batch(self.parser_type, lines):
             try:
-                record = parser(line)
                 # Apply filters
-                filtered_record = apply_filter(record)
+                filtered_record = record_filter(record)
                 if filtered_record:
-                    self.parsed_data.append(filtered_record)
+                    self.parsed_data.append(compact(filtered_record))
             except Exception as e:
-                log(f"Error parsing line: {line} | Exception: {e}")
+                log(f"Error filtering record: {record} | Exception: {e}")
+
+    def parse_lines_columnar(self, lines: List[str]):
+        from core.columnar_filter import ColumnBatch, filter_columns
+
+        lines = self.prefilter_lines(lines, compile_rules())
+        records = self.parser_manager.parse_batch(self.parser_type, lines)
+        batch = filter_columns(ColumnBatch.from_records(records))
+        self.parsed_data.extend(map(compact, batch.to_records()))
 
     def process_file(self, file_path: str):
         """
-        Parse a log file line by line.
+        Parse a log file (or .gz/.bz2/.xz archive) a chunk of lines at a time,
+        flushing records as they accumulate. Large files are memory-mapped if
+        UNILOG_MMAP_MIN_BYTES is set. Lines are read as bytes; parsers decode
+        only the fields that get used (see core.record).
         """
         log(f"Processing file: {file_path}")
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-            self.parse_lines(lines)
+            with parse_failures.source(file_path):
+                for lines in file_chunks(file_path):
+                    self.parse_lines(lines)
+                    if len(self.parsed_data) >= self.flush_size:
+                        self.flush()
         except Exception as e:
             log(f"Failed to process file {file_path}: {e}")
 
+    def process_files_parallel(self, file_paths: List[str]):
+        from core.shard_parser import parse_files
+
+        # Workers use the row filter; it keeps the same records as the columnar one
+        for records in parse_files(file_paths, self.parser_type, self.jobs, rules=list(DEFAULT_FILTER_RULES),
+                                   parser_manager=self.parser_manager):
+            self.parsed_data.extend(records)
+            if len(self.parsed_data) >= self.flush_size:
+                self.flush()
+
+    def report_match_rates(self):
+        parse_failures.report()
+        # In auto mode each source reports under the parser detected for it
+        parser = None if self.parser_type == AUTO else self.parser_type
+        for stats in parse_failures.get_stats(parser=parser):
+            dropped = f" ({stats['prefiltered']} more dropped by the prefilter)" if stats["prefiltered"] else ""
+            log(f"{stats['source']}: {stats['matched']}/{stats['total']} lines matched the {stats['parser']} parser"
+                + dropped)
+
     def run_ml(self):
         if self.enable_ml and self.parsed_data:
             log("Running anomaly detection on parsed data")
-            anomalies = detect_anomalies(self.parsed_data)
+            detector = ML_MODELS["anomaly"]()
+            detector.fit(self.parsed_data)
+            anomalies = [a for a in detector.predict(self.parsed_data) if a.get("anomaly")]
             log(f"Detected {len(anomalies)} anomalies")
             return anomalies
         return []
@@ -52,19 +110,32 @@ class LogParser:
         send_to_output(self.parsed_data, self.output_type)
         log(f"Sent {len(self.parsed_data)} records to {self.output_type}")
 
-    def run(self, file_paths: List[str]):
-        for path in file_paths:
-            self.process_file(path)
+    def flush(self):
+        """
+        Run ML on and output the pending records, then drop them.
+        """
         self.run_ml()
         self.send_output()
+        self.parsed_data = []
+
+    def run(self, file_paths: List[str]):
+        if self.jobs > 1:
+            self.process_files_parallel(file_paths)
+        else:
+            for path in file_paths:
+                self.process_file(path)
+        self.report_match_rates()
+        self.flush()
+        close_outputs()
 
 
-def parse_logs(file_paths=None, parser_type="generic", output_type="json", enable_ml=False):
+def parse_logs(file_paths=None, parser_type="generic", output_type="json", enable_ml=False, columnar_filter=False,
+               jobs=1):
 
     if file_paths is None:
         file_paths = ["./logs/sample.log"]
 
-    log(f"Starting parsing with parser={parser_type}, output={output_type}, ML={enable_ml}")
-    parser = LogParser(parser_type, output_type, enable_ml)
+    log(f"Starting parsing with parser={parser_type}, output={output_type}, ML={enable_ml}, jobs={jobs}")
+    parser = LogParser(parser_type, output_type, enable_ml, columnar_filter, jobs)
     parser.run(file_paths)
     log("Parsing complete")
@@ -1,82 +1,117 @@
-import time
 from pathlib import Path
 from core.parser_manager import ParserManager
-from core.filter import apply_filter
-from core.output_manager import send_to_output
-from ml.anomaly_detection import AnomalyDetector
+from core.filter import compile_rules
+from core.prefilter import build_prefilter
+from core.record import compact
+from core.output_manager import close as close_outputs, send_to_output, DEFERRED_OUTPUTS
+from ml import ML_MODELS
 from core.logger import log
+from core.tail_engine import TAIL_CHECKPOINT_FILE, TailEngine
+from core import parse_failures
 
 
 class LogTailer:
-    def __init__(self, file_paths, parser_type="generic", output_type="json", enable_ml=False, interval=1.0):
+    def __init__(self, file_paths, parser_type="generic", output_type="json", enable_ml=False, interval=1.0,
+                 checkpoint_file=TAIL_CHECKPOINT_FILE):
         self.file_paths = [Path(f) for f in file_paths]
         self.parser_type = parser_type
         self.output_type = output_type
         self.enable_ml = enable_ml
+        # Longest wait for new lines; without inotify, how often files are polled
         self.interval = interval
+        self.parser_manager = ParserManager()
         self.parsed_data = []
-        self.file_positions = {f: 0 for f in self.file_paths}
+        # Positions are resumed from checkpoint_file; "" or None starts every file from the beginning
+        self.engine = TailEngine(map(str, self.file_paths), checkpoint_file, poll_interval=interval)
+        self.output_failed = False
 
     def tail_file(self, file_path):
+        """
+        Complete lines added to ``file_path`` since the last call.
+        """
         try:
-            with file_path.open("r", encoding="utf-8") as f:
-                f.seek(self.file_positions[file_path])
-                new_lines = f.readlines()
-                self.file_positions[file_path] = f.tell()
-            return new_lines
+            return self.engine.read(str(file_path))
         except Exception as e:
             log(f"Error tailing file {file_path}: {e}")
             return []
 
     def parse_lines(self, lines):
-        parser = ParserManager().parsers.get(self.parser_type, lambda x: x)
-        for line in lines:
+        record_filter = compile_rules()
+        prefilter = build_prefilter(record_filter, self.parser_manager.verbatim_fields(self.parser_type))
+        if prefilter is not None:
+            lines = prefilter.filter_lines(lines, self.parser_type)
+        for record in self.parser_manager.parse_batch(self.parser_type, lines):
             try:
-                record = parser(line)
-                filtered = apply_filter(record)
+                filtered = record_filter(record)
                 if filtered:
-                    self.parsed_data.append(filtered)
+                    self.parsed_data.append(compact(filtered))
             except Exception as e:
-                log(f"Error parsing line: {line.strip()} | Exception: {e}")
+                log(f"Error filtering record: {record} | Exception: {e}")
 
     def run_ml(self):
         if self.enable_ml and self.parsed_data:
             log("Running anomaly detection on tailed data")
-            detector = AnomalyDetector()
+            detector = ML_MODELS["anomaly"]()
             detector.fit(self.parsed_data)
             anomalies = detector.predict(self.parsed_data)
             log(f"Detected {sum(1 for a in anomalies if a.get('anomaly'))} anomalies")
             return anomalies
         return []
 
-    def send_output(self):
+    def send_output(self) -> bool:
         if not self.parsed_data:
-            return
-        send_to_output(self.parsed_data, self.output_type)
-        log(f"Sent {len(self.parsed_data)} records to {self.output_type}")
+            return True
+        sent = send_to_output(self.parsed_data, self.output_type)
+        if sent:
+            log(f"Sent {len(self.parsed_data)} records to {self.output_type}")
         self.parsed_data = []
+        return sent
+
+    def process(self, batches):
+        """
+        Parse, filter and output one poll's worth of new lines, then
+        checkpoint them.
+        """
+        for path, lines in batches:
+            with parse_failures.source(path):
+                self.parse_lines(lines)
+        self.run_ml()
+        if self.send_output() and not self.output_failed:
+            # Deferred outputs deliver on close_outputs(); only checkpointed after it
+            self.engine.commit(save=self.output_type not in DEFERRED_OUTPUTS)
+            return
+        if not self.output_failed:
+            # Nothing from here on is checkpointed, so a restart re-reads it
+            log("Output failed, no longer checkpointing tail positions", level="WARNING")
+            self.output_failed = True
+        self.engine.discard()
 
     def run(self):
         log(f"Starting log tailing on {len(self.file_paths)} files...")
         try:
             while True:
-                for file_path in self.file_paths:
-                    new_lines = self.tail_file(file_path)
-                    if new_lines:
-                        self.parse_lines(new_lines)
-                        self.run_ml()
-                        self.send_output()
-                time.sleep(self.interval)
+                batches = self.engine.poll(self.interval)
+                if batches:
+                    self.process(batches)
         except KeyboardInterrupt:
             log("Log tailing stopped by user")
         except Exception as e:
             log(f"Unexpected error in log tailing: {e}")
+        finally:
+            # Lines of a batch that was cut short were never output
+            self.engine.discard()
+            if not close_outputs():
+                log("Finishing the output failed, not checkpointing tail positions", level="WARNING")
+            elif not self.output_failed:
+                self.engine.commit(force=True)
+            self.engine.close()
 
 
-def tail_logs(file_paths=None, parser_type="generic", output_type="json", enable_ml=False, interval=1.0):
+def tail_logs(file_paths=None, parser_type="generic", output_type="json", enable_ml=False, interval=1.0,
+              checkpoint_file=TAIL_CHECKPOINT_FILE):
     if file_paths is None:
         file_paths = ["./logs/sample.log"]
 
     log(f"Starting tail with parser={parser_type}, output={output_type}, ML={enable_ml}, interval={interval}s")
-    tailer = LogTailer(file_paths, parser_type, output_type, enable_ml, interval)
+    tailer = LogTailer(file_paths, parser_type, output_type, enable_ml, interval, checkpoint_file)
     tailer.run()
@@ -0,0 +1,149 @@
+import os
+import queue
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+# A queue.Queue with a capacity in items and/or bytes, and a choice of what
+# a producer does when it is full:
+#
+#   block        wait for room
+#   timeout      wait for room at most QUEUE_TIMEOUT seconds, then give up
+#   drop_newest  give up right away (the new item is dropped)
+#   drop_oldest  make room by dropping the oldest queued items
+#   sample       like drop_newest, but every SAMPLE_EVERY-th item arriving
+#                while the queue is full is kept, in place of the oldest
+#
+# offer() reports whether the item was queued. Dropped queued items count
+# as done for join().
+
+POLICIES = ("block", "timeout", "drop_newest", "drop_oldest", "sample")
+
+QUEUE_POLICY = os.getenv("UNILOG_QUEUE_POLICY", "block")
+QUEUE_TIMEOUT = float(os.getenv("UNILOG_QUEUE_TIMEOUT", 1.0))
+SAMPLE_EVERY = int(os.getenv("UNILOG_QUEUE_SAMPLE_EVERY", 10))
+
+
+class QueueStats:
+    """
+    Counters for a BoundedQueue. ``rejected`` items were refused to the
+    producer, ``evicted`` ones were dropped from the queue to make room.
+    """
+    __slots__ = ("accepted", "rejected", "evicted", "blocked_seconds", "high_water_items", "high_water_bytes")
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.blocked_seconds = 0.0
+        self.high_water_items = 0
+        self.high_water_bytes = 0
+
+    def to_dict(self) -> Dict:
+        stats = {name: getattr(self, name) for name in self.__slots__}
+        stats["dropped"] = self.rejected + self.evicted
+        return stats
+
+
+class BoundedQueue(queue.Queue):
+    """
+    Holds at most ``max_items`` items and ``max_bytes`` bytes as measured by
+    ``size`` (0 for no limit). An item bigger than ``max_bytes`` is still
+    let into an empty queue.
+    """
+
+    def __init__(self, max_items: int = 0, max_bytes: int = 0, policy: str = QUEUE_POLICY,
+                 timeout: float = QUEUE_TIMEOUT, size: Callable[[Any], int] = len,
+                 sample_every: int = SAMPLE_EVERY):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}', expected one of {', '.join(POLICIES)}")
+        # The limits are enforced here, not through Queue.maxsize
+        super().__init__()
+        self.max_items = max(0, max_items)
+        self.max_bytes = max(0, max_bytes)
+        self.policy = policy
+        self.timeout = timeout
+        self.size = size
+        self.sample_every = max(1, sample_every)
+        self.bytes = 0
+        self.stats = QueueStats()
+        self._overflow = 0
+
+    def _init(self, maxsize):
+        self.queue = deque()
+        # Size of each queued item, in the same order
+        self._sizes = deque()
+
+    def _put(self, item):
+        size = self.size(item)
+        self.queue.append(item)
+        self._sizes.append(size)
+        self.bytes += size
+
+    def _get(self):
+        self.bytes -= self._sizes.popleft()
+        return self.queue.popleft()
+
+    def _full(self, size: int) -> bool:
+        if self.max_items and self._qsize() >= self.max_items:
+            return True
+        return bool(self.max_bytes) and self._qsize() > 0 and self.bytes + size > self.max_bytes
+
+    def _evict(self, size: int):
+        # Drop the oldest items until ``size`` more bytes fit
+        while self._qsize() and self._full(size):
+            self._get()
+            self.stats.evicted += 1
+            self.unfinished_tasks -= 1
+        if not self.unfinished_tasks:
+            self.all_tasks_done.notify_all()
+
+    def offer(self, item, policy: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Queue ``item`` under ``policy`` (default: the queue's own), waiting at
+        most ``timeout`` seconds with "timeout". Returns False if it was dropped.
+        """
+        policy = policy or self.policy
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}', expected one of {', '.join(POLICIES)}")
+        size = self.size(item)
+        with self.not_full:
+            if self._full(size):
+                if policy in ("block", "timeout"):
+                    started = time.monotonic()
+                    deadline = None
+                    if policy == "timeout":
+                        deadline = started + (self.timeout if timeout is None else timeout)
+                    while self._full(size):
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            break
+                        self.not_full.wait(remaining)
+                    self.stats.blocked_seconds += time.monotonic() - started
+                else:
+                    self._overflow += 1
+                    if policy == "drop_oldest" or (policy == "sample" and self._overflow % self.sample_every == 0):
+                        self._evict(size)
+                if self._full(size):
+                    self.stats.rejected += 1
+                    return False
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+            stats = self.stats
+            stats.accepted += 1
+            stats.high_water_items = max(stats.high_water_items, self._qsize())
+            stats.high_water_bytes = max(stats.high_water_bytes, self.bytes)
+            return True
+
+    def put(self, item, block: bool = True, timeout: Optional[float] = None):
+        # Queue.put semantics on top of offer(): raises queue.Full instead of returning False
+        policy = "drop_newest" if not block else ("block" if timeout is None else "timeout")
+        if not self.offer(item, policy, timeout):
+            raise queue.Full
+
+    def get_stats(self) -> Dict:
+        with self.mutex:
+            stats = self.stats.to_dict()
+            stats.update(items=self._qsize(), bytes=self.bytes)
+        return stats
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+from typing import Dict, Optional, Tuple
+from core.logger import log
+from core.compressed import is_compressed, open_input
+
+# Persistent read positions for incremental ingestion. Each file is keyed by
+# device and inode and carries a fingerprint of its first bytes, so a renamed
+# file keeps its position while a rotated (new inode), truncated (shorter than
+# the position) or rewritten (different head) file is read from the start.
+# Offsets always sit on a line boundary (for compressed archives: the end of
+# the archive, or a shard boundary of a split gzip file) and are only
+# committed once the records before them have been written out. An archive
+# compressed from a checkpointed file (rotate, then compress) is recognised
+# by its decompressed head, see copied().
+
+CHECKPOINT_FILE = os.getenv("UNILOG_CHECKPOINT_FILE", "./data/checkpoints.json")
+# Bytes of the file head hashed into the fingerprint
+FINGERPRINT_BYTES = int(os.getenv("UNILOG_FINGERPRINT_BYTES", 1024))
+
+_VERSION = 1
+
+
+def fingerprint(f, length: int) -> str:
+    f.seek(0)
+    return hashlib.sha256(f.read(length)).hexdigest()
+
+
+def complete_end(f, size: int, window: int = 65536) -> int:
+    """
+    Offset just past the last newline before ``size`` (0 if there is none):
+    a trailing line without one may still be being written.
+    """
+    end = size
+    while end > 0:
+        start = max(0, end - window)
+        f.seek(start)
+        newline = f.read(end - start).rfind(b"\n")
+        if newline >= 0:
+            return start + newline + 1
+        end = start
+    return 0
+
+
+class CheckpointStore:
+    """
+    Committed offsets per file, kept in a JSON state file.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_FILE):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self.load()
+
+    @staticmethod
+    def _key(stat: os.stat_result) -> str:
+        return f"{stat.st_dev}:{stat.st_ino}"
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log(f"Ignoring unreadable checkpoint file {self.path}: {e}", level="WARNING")
+            return
+        if state.get("version") == _VERSION:
+            self.entries = state.get("files", {})
+
+    def save(self):
+        """
+        Write the state file atomically, dropping files that no longer exist.
+        """
+        live = {}
+        for key, entry in self.entries.items():
+            try:
+                if self._key(os.stat(entry["path"])) == key:
+                    live[key] = entry
+            except OSError:
+                pass
+        self.entries = live
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump({"version": _VERSION, "files": live}, f, indent=2)
+        os.replace(temp, self.path)
+
+    def span(self, path: str, f=None) -> Tuple[int, int]:
+        """
+        (start, end) of the bytes in ``path`` (or the open binary file ``f``)
+        not ingested yet: from the committed offset (or 0 after
+        rotation/truncation) up to the last complete line.
+        """
+        if f is None:
+            with open(path, "rb") as f:
+                return self.span(path, f)
+        stat = os.fstat(f.fileno())
+        # Archives are written once; their raw bytes say nothing about lines
+        end = stat.st_size if is_compressed(path) else complete_end(f, stat.st_size)
+        entry = self.entries.get(self._key(stat))
+        if entry is None:
+            return 0, end
+        # Renamed (e.g. rotated to access.log.1): keep the entry past save()
+        entry["path"] = os.path.abspath(path)
+        offset = entry["offset"]
+        if stat.st_size < offset or stat.st_size < entry["head"]:
+            log(f"{path} was truncated, reading it from the start", level="WARNING")
+            return 0, end
+        if fingerprint(f, entry["head"]) != entry["fingerprint"]:
+            log(f"{path} was replaced, reading it from the start", level="WARNING")
+            return 0, end
+        return min(offset, end), end
+
+    def copied(self, path: str) -> int:
+        """
+        For an archive with no checkpoint of its own: the offset in its
+        decompressed contents up to which the file it was compressed from
+        had been ingested, found by that file's fingerprint (0 if none).
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        candidates = [entry for entry in self.entries.values()
+                      if entry["head"] and os.path.dirname(entry["path"]) == directory]
+        if not candidates or not is_compressed(path):
+            return 0
+        with open(path, "rb") as f:
+            if self._key(os.fstat(f.fileno())) in self.entries:
+                return 0
+        with open_input(path) as f:
+            head = f.read(max(entry["head"] for entry in candidates))
+        for entry in sorted(candidates, key=lambda entry: -entry["offset"]):
+            if len(head) >= entry["head"] and \
+                    hashlib.sha256(head[:entry["head"]]).hexdigest() == entry["fingerprint"]:
+                log(f"{path} is a compressed copy of {entry['path']}, skipping the {entry['offset']} bytes ingested from it")
+                return entry["offset"]
+        return 0
+
+    def offset(self, path: str) -> int:
+        return self.span(path)[0]
+
+    def commit(self, path: str, offset: int, f=None):
+        """
+        Record that everything before ``offset`` in ``path`` has been output.
+        Given an open binary file ``f``, the checkpoint is for that file even
+        if ``path`` has been rotated to another one since it was opened.
+        """
+        if f is None:
+            with open(path, "rb") as f:
+                return self.commit(path, offset, f)
+        stat = os.fstat(f.fileno())
+        head = min(FINGERPRINT_BYTES, stat.st_size)
+        position = f.tell()
+        try:
+            self.entries[self._key(stat)] = {
+                "path": os.path.abspath(path),
+                "offset": offset,
+                "head": head,
+                "fingerprint": fingerprint(f, head),
+            }
+        finally:
+            f.seek(position)
+
+    def commit_all(self, offsets: Dict[str, int]):
+        for path, offset in offsets.items():
+            try:
+                self.commit(path, offset)
+            except OSError as e:
+                log(f"Could not checkpoint {path}: {e}", level="WARNING")
+        self.save()
+
+    def forget(self, path: Optional[str] = None):
+        """
+        Drop the checkpoint for ``path``, or all of them.
+        """
+        if path is None:
+            self.entries.clear()
+            return
+        path = os.path.abspath(path)
+        self.entries = {key: entry for key, entry in self.entries.items() if entry["path"] != path}
@@ -0,0 +1,200 @@
+from typing import Any, Dict, Iterable, List, Optional
+from core.filter import DEFAULT_FILTER_RULES
+
+# NumPy/pandas are optional dependencies: they are only imported when a
+# columnar batch is actually built or filtered.
+
+
+class ColumnBatch:
+    """
+    Parsed records stored column-wise: one NumPy array per field, plus a
+    boolean mask per field telling which rows actually had that field.
+
+    Batches built with ``from_records`` remember the original records so the
+    surviving rows can be handed back unchanged.
+    """
+
+    def __init__(self, columns: Dict[str, Any], present: Optional[Dict[str, Any]] = None,
+                 records: Optional[List[Dict]] = None, length: Optional[int] = None):
+        import numpy as np
+
+        self.columns = {name: np.asarray(values) for name, values in columns.items()}
+        if length is None:
+            length = len(next(iter(self.columns.values()))) if self.columns else len(records or ())
+        self.length = length
+        self.present = present or {}
+        self.records = records
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "ColumnBatch":
+        import numpy as np
+
+        records = [r for r in records if r]
+        count = len(records)
+        columns: Dict[str, Any] = {}
+        present: Dict[str, Any] = {}
+        for i, record in enumerate(records):
+            for key, value in record.items():
+                column = columns.get(key)
+                if column is None:
+                    column = columns[key] = np.full(count, None, dtype=object)
+                    present[key] = np.zeros(count, dtype=bool)
+                column[i] = value
+                present[key][i] = True
+        # Fields every record had don't need a presence mask
+        present = {key: mask for key, mask in present.items() if not mask.all()}
+        return cls(columns, present, records, count)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def take(self, mask) -> "ColumnBatch":
+        import numpy as np
+
+        columns = {name: values[mask] for name, values in self.columns.items()}
+        present = {name: values[mask] for name, values in self.present.items()}
+        records = None
+        if self.records is not None:
+            records = [self.records[i] for i in np.flatnonzero(mask)]
+        return ColumnBatch(columns, present, records, int(np.count_nonzero(mask)))
+
+    def to_records(self) -> List[Dict]:
+        if self.records is not None:
+            return list(self.records)
+        names = list(self.columns)
+        rows = []
+        for i in range(self.length):
+            rows.append({
+                name: self.columns[name][i] for name in names
+                if name not in self.present or self.present[name][i]
+            })
+        return rows
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _numeric(values):
+    """
+    Return (numbers, convertible) arrays following float() semantics.
+    """
+    import numpy as np
+
+    if values.dtype.kind in "biuf":
+        return values.astype(float), np.ones(len(values), dtype=bool)
+    converted = np.frompyfunc(_to_float, 1, 1)(values)
+    convertible = converted != None  # noqa: E711 - elementwise comparison
+    numbers = np.where(convertible, converted, np.nan).astype(float)
+    return numbers, convertible
+
+
+def _elementwise(func, values):
+    import numpy as np
+
+    return np.frompyfunc(func, 1, 1)(values).astype(bool)
+
+
+def _rule_mask(values, rule):
+    """
+    Boolean array of rows that pass ``rule``, or None if it has no conditions.
+    """
+    import numpy as np
+    import pandas as pd
+
+    keep = None
+
+    def narrow(mask):
+        nonlocal keep
+        keep = mask if keep is None else keep & mask
+
+    if "equals" in rule:
+        expected = rule["equals"]
+        if isinstance(expected, (str, int, float, bool, type(None))):
+            narrow(~np.asarray(values != expected, dtype=bool))
+        else:
+            narrow(_elementwise(lambda v: not v != expected, values))
+
+    if "in" in rule:
+        members = rule["in"]
+        try:
+            if not isinstance(members, (list, tuple, set, frozenset)):
+                raise TypeError(members)
+            narrow(pd.Series(values, dtype=object).isin(list(members)).to_numpy(dtype=bool))
+        except TypeError:
+            # Substring tests ("in": "a b c") and unhashable members
+            narrow(_elementwise(lambda v: v in members, values))
+
+    if "regex" in rule:
+        text = pd.Series(values, dtype=object).map(str)
+        narrow(text.str.contains(rule["regex"], regex=True).to_numpy(dtype=bool))
+
+    for kind, keep_number in (("gt", lambda n, b: ~(n <= b)), ("lt", lambda n, b: ~(n >= b))):
+        if kind not in rule:
+            continue
+        bound = _to_float(rule[kind])
+        if bound is None:
+            narrow(np.zeros(len(values), dtype=bool))
+            continue
+        numbers, convertible = _numeric(values)
+        narrow(convertible & keep_number(numbers, bound))
+
+    return keep
+
+
+def column_mask(batch: ColumnBatch, rules: List[Dict[str, Any]] = None):
+    """
+    Evaluate filter rules over a whole batch at once.
+
+    Gives the same answer as calling ``apply_filter`` on every row: a rule is
+    skipped for rows that don't have its field. The one difference is that
+    values float() cannot take at all (e.g. None) fail gt/lt rules instead of
+    raising TypeError.
+    """
+    import numpy as np
+
+    if rules is None:
+        rules = DEFAULT_FILTER_RULES
+
+    # Row numbers still passing; each rule only looks at these, so an
+    # expensive rule after a selective one runs on a fraction of the batch.
+    alive = np.arange(len(batch))
+    for rule in rules:
+        field = rule.get("field")
+        if field not in batch.columns or not len(alive):
+            continue
+        rows = alive
+        present = batch.present.get(field)
+        if present is not None:
+            # Rows without the field skip this rule
+            rows = alive[present[alive]]
+        passed = _rule_mask(batch.columns[field][rows], rule)
+        if passed is None or passed.all():
+            continue
+        rejected = np.zeros(len(batch), dtype=bool)
+        rejected[rows[~passed]] = True
+        alive = alive[~rejected[alive]]
+
+    mask = np.zeros(len(batch), dtype=bool)
+    mask[alive] = True
+    return mask
+
+
+def filter_columns(batch, rules: List[Dict[str, Any]] = None):
+    """
+    Return the rows of ``batch`` that pass ``rules``.
+
+    ``batch`` may be a ColumnBatch, a pandas DataFrame (every cell counts as
+    present) or a dict of field -> array; the result has the same type.
+    """
+    import pandas as pd
+
+    if isinstance(batch, pd.DataFrame):
+        columns = ColumnBatch({name: batch[name].to_numpy() for name in batch.columns}, length=len(batch))
+        return batch[column_mask(columns, rules)]
+    if isinstance(batch, dict):
+        return filter_columns(ColumnBatch(batch), rules).columns
+    return batch.take(column_mask(batch, rules))
@@ -0,0 +1,178 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import struct
+import zlib
+from typing import BinaryIO, Callable, Dict, List, Optional
+
+# Transparent reading of compressed log archives. Inputs are recognised by
+# extension and decompressed as a stream behind a large read buffer, so
+# archives are never unpacked to disk. Gzip files made of BGZF blocks
+# (bgzip, or bgzf_compress below) record each member's compressed size in
+# its header and can be cut into independently decompressible shards at
+# member boundaries; other archives are read as a whole. Blocks don't follow
+# line boundaries, so a shard of members owns the lines that start in it:
+# it skips the partial line it begins with and finishes its last line from
+# the members after it.
+
+READ_BUFFER_BYTES = int(os.getenv("UNILOG_READ_BUFFER_BYTES", 2**20))
+
+CODECS: Dict[str, Callable[[BinaryIO], BinaryIO]] = {
+    ".gz": lambda raw: gzip.GzipFile(fileobj=raw, mode="rb"),
+    ".bz2": lambda raw: bz2.BZ2File(raw, mode="rb"),
+    ".xz": lambda raw: lzma.LZMAFile(raw, mode="rb"),
+    ".lzma": lambda raw: lzma.LZMAFile(raw, mode="rb"),
+}
+
+# Largest BGZF block payload, as used by bgzip
+BGZF_BLOCK_BYTES = 65280
+
+_GZIP_MAGIC = b"\x1f\x8b\x08"
+_FEXTRA = 4
+
+
+def codec(path: str) -> Optional[str]:
+    """
+    The compression extension of ``path`` (".gz", ".bz2", ...), or None.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    return ext if ext in CODECS else None
+
+
+def is_compressed(path: str) -> bool:
+    return codec(path) is not None
+
+
+def open_input(path: str, start: int = 0, buffer_size: Optional[int] = None) -> BinaryIO:
+    """
+    A binary reader over the (decompressed) contents of ``path``. For
+    compressed files ``start`` is a raw offset where a member/stream begins.
+    """
+    raw = open(path, "rb", buffering=buffer_size or READ_BUFFER_BYTES)
+    if start:
+        raw.seek(start)
+    ext = codec(path)
+    if ext is None:
+        return raw
+    try:
+        return io.BufferedReader(CODECS[ext](raw), buffer_size or READ_BUFFER_BYTES)
+    except Exception:
+        raw.close()
+        raise
+
+
+def _bgzf_block_size(header: bytes) -> Optional[int]:
+    # Total compressed size of the member starting with ``header``, if it is a BGZF block
+    if len(header) < 18 or not header.startswith(_GZIP_MAGIC) or not header[3] & _FEXTRA:
+        return None
+    xlen = struct.unpack_from("<H", header, 10)[0]
+    extra = header[12:12 + xlen]
+    pos = 0
+    while pos + 4 <= len(extra):
+        si1, si2, slen = extra[pos], extra[pos + 1], struct.unpack_from("<H", extra, pos + 2)[0]
+        if (si1, si2, slen) == (66, 67, 2) and pos + 6 <= len(extra):
+            return struct.unpack_from("<H", extra, pos + 4)[0] + 1
+        pos += 4 + slen
+    return None
+
+
+def gzip_members(f: BinaryIO, size: int) -> Optional[List[int]]:
+    """
+    Start offsets of the members of a BGZF gzip file (read from the headers
+    only), or None if it isn't one and can't be split without decompressing.
+    """
+    starts = []
+    pos = 0
+    while pos < size:
+        f.seek(pos)
+        block = _bgzf_block_size(f.read(64))
+        if block is None:
+            return None
+        starts.append(pos)
+        pos += block
+    return starts if pos == size else None
+
+
+def _ends_line(f: BinaryIO, start: int, end: int) -> bool:
+    # Whether the member at [start, end) decompresses to data ending in a newline
+    f.seek(start)
+    data = zlib.decompressobj(31).decompress(f.read(end - start))
+    return data.endswith(b"\n")
+
+
+def gzip_shards(path: str, shard_bytes: int) -> Optional[List[tuple]]:
+    """
+    Raw (start, end) ranges of about ``shard_bytes`` covering a BGZF file,
+    or None if the file can't be split. Cuts are only made after members
+    that end mid-line, so every range but the first starts with a partial
+    line to skip (see read_range).
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        members = gzip_members(f, size)
+        if members is None:
+            return None
+        members.append(size)
+        ranges = []
+        start = 0
+        target = shard_bytes
+        for index in range(1, len(members) - 1):
+            cut = members[index]
+            if cut < target:
+                continue
+            if not _ends_line(f, members[index - 1], cut):
+                ranges.append((start, cut))
+                start = cut
+                target = cut + shard_bytes
+    ranges.append((start, size))
+    return ranges
+
+
+def read_range(path: str, start: int, end: int) -> bytes:
+    """
+    Decompressed lines of raw bytes [start, end) of ``path``: a whole file,
+    a line-aligned range of a plain file or a range from gzip_shards.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+        ext = codec(path)
+        if ext is None:
+            return data
+        if ext == ".gz":
+            data = gzip.decompress(data)
+            if start:
+                # The first line started in the previous range
+                newline = data.find(b"\n")
+                if newline < 0:
+                    return b""
+                data = data[newline + 1:]
+            if not data.endswith(b"\n") and f.tell() < os.fstat(f.fileno()).st_size:
+                # ...and the last one ends in a following range
+                with gzip.GzipFile(fileobj=f, mode="rb") as rest:
+                    data += rest.readline()
+            return data
+    if ext == ".bz2":
+        return bz2.decompress(data)
+    return lzma.decompress(data)
+
+
+def _bgzf_block(payload: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = compressor.compress(payload) + compressor.flush()
+    # BSIZE is the whole block's size minus one
+    header = struct.pack("<4BIBBHBBHH", 0x1f, 0x8b, 8, _FEXTRA, 0, 0, 255, 6, 66, 67, 2, 18 + len(deflated) + 7)
+    return header + deflated + struct.pack("<II", zlib.crc32(payload), len(payload))
+
+
+def bgzf_compress(data: bytes, level: int = 6) -> bytes:
+    """
+    Gzip ``data`` as BGZF blocks (the layout bgzip writes): a valid
+    multi-member gzip file that gzip_shards can split.
+    """
+    blocks = [_bgzf_block(data[pos:pos + BGZF_BLOCK_BYTES], level) for pos in range(0, len(data), BGZF_BLOCK_BYTES)]
+    # The conventional empty end-of-file block
+    blocks.append(_bgzf_block(b"", level))
+    return b"".join(blocks)
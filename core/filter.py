@@ -1,5 +1,5 @@
 import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Iterable, Optional, Tuple, Union
 from core.logger import log
 
 # Each rule can include field, regex, value conditions, etc.
@@ -48,6 +48,145 @@ def apply_filter(record: Dict[str, Any], rules: List[Dict[str, Any]] = None) ->
     return record
 
 
+class CompiledFilter:
+    """
+    A rule list compiled once into (field, test) pairs.
+
+    Calling it is equivalent to ``apply_filter(record, rules)``, but regexes
+    are pre-compiled, thresholds pre-converted, ``in`` lists turned into
+    frozensets and rule kinds that are not used are never looked at.
+    """
+    __slots__ = ("rules", "checks")
+
+    def __init__(self, rules: List[Dict[str, Any]], checks: List[Tuple[Any, Callable[[Any], bool]]]):
+        self.rules = rules
+        self.checks = checks
+
+    def __call__(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        for field, test in self.checks:
+            if field in record and not test(record[field]):
+                return None
+        return record
+
+    def filter_batch(self, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Return the records that pass, skipping empty (unparsed) entries.
+        """
+        checks = self.checks
+        kept = []
+        append = kept.append
+        for record in records:
+            if not record:
+                continue
+            for field, test in checks:
+                if field in record and not test(record[field]):
+                    break
+            else:
+                append(record)
+        return kept
+
+
+def _never_numeric(value) -> bool:
+    # The rule's own bound is not a number: apply_filter rejects every record
+    # (but still raises for values float() cannot take at all, e.g. None)
+    try:
+        float(value)
+    except ValueError:
+        pass
+    return False
+
+
+def _compile_tests(rule: Dict[str, Any]) -> List[Callable[[Any], bool]]:
+    tests = []
+
+    if "equals" in rule:
+        expected = rule["equals"]
+        tests.append(lambda value: not value != expected)
+
+    if "in" in rule:
+        members = rule["in"]
+        allowed = None
+        if isinstance(members, (list, tuple, set, frozenset)):
+            try:
+                allowed = frozenset(members)
+            except TypeError:
+                pass  # unhashable members, keep list membership
+        if allowed is None:
+            tests.append(lambda value: value in members)
+        else:
+            def test_in(value):
+                try:
+                    return value in allowed
+                except TypeError:
+                    return value in members
+            tests.append(test_in)
+
+    if "regex" in rule:
+        search = re.compile(rule["regex"]).search
+        tests.append(lambda value: search(str(value)) is not None)
+
+    if "gt" in rule:
+        try:
+            lower = float(rule["gt"])
+        except ValueError:
+            tests.append(_never_numeric)
+        else:
+            def test_gt(value):
+                try:
+                    return not float(value) <= lower
+                except ValueError:
+                    return False
+            tests.append(test_gt)
+
+    if "lt" in rule:
+        try:
+            upper = float(rule["lt"])
+        except ValueError:
+            tests.append(_never_numeric)
+        else:
+            def test_lt(value):
+                try:
+                    return not float(value) >= upper
+                except ValueError:
+                    return False
+            tests.append(test_lt)
+
+    return tests
+
+
+def compile_rules(rules: Union[List[Dict[str, Any]], str] = None, adaptive: bool = False):
+    """
+    Compile filter rules into a predicate. Rules are read once, so later changes
+    to the list (e.g. through add_rule) need a new compile.
+
+    ``rules`` may also be a filter expression string (see core.filter_expr);
+    expressions, and rule lists with ``adaptive=True``, get an evaluator that
+    reorders clauses by measured cost and selectivity.
+    """
+    if rules is None:
+        rules = DEFAULT_FILTER_RULES
+    if isinstance(rules, str) or adaptive:
+        from core.filter_expr import compile_expression
+        return compile_expression(rules)
+
+    checks = []
+    for rule in rules:
+        tests = _compile_tests(rule)
+        if not tests:
+            continue
+        if len(tests) == 1:
+            test = tests[0]
+        else:
+            def test(value, tests=tuple(tests)):
+                for t in tests:
+                    if not t(value):
+                        return False
+                return True
+        checks.append((rule.get("field"), test))
+
+    return CompiledFilter(list(rules), checks)
+
+
 def add_rule(field: str, equals=None, regex=None, in_list=None, gt=None, lt=None, rules: List[Dict] = None):
     """
     Helper to add a new filter rule dynamically.
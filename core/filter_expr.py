@@ -0,0 +1,394 @@
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional
+from core.filter import _compile_tests, _never_numeric
+
+# Filter expressions combine the same checks as rule dicts with and/or/not:
+#
+#   status >= 500 and (message ~ "timeout|failed" or not level in ["DEBUG", "INFO"])
+#
+# Operators: == != > < >= <= in ~ (regex search). As with rule lists, a
+# comparison on a field the record doesn't have is true.
+
+# One in SAMPLE_EVERY records is evaluated with timing and without
+# short-circuiting; clause order is revisited every REORDER_EVERY samples.
+SAMPLE_EVERY = 64
+REORDER_EVERY = 256
+
+_TOKEN_REGEX = re.compile(r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)(?![\w.])
+      | (?P<op>==|!=|>=|<=|>|<|~|\(|\)|\[|\]|,)
+      | (?P<word>[A-Za-z_@][\w.\-@]*)
+    )""", re.VERBOSE)
+
+_KEYWORDS = {"and", "or", "not", "in"}
+_CONSTANTS = {"true": True, "false": False, "null": None, "none": None}
+_COMPARISONS = {"==", "!=", ">", "<", ">=", "<=", "~", "in"}
+
+
+class Node:
+    """
+    Base for expression nodes. ``evaluate`` is the fast path; ``measure`` also
+    records pass counts and time spent. It still runs the children evaluate()
+    would skip, so every clause gets statistics, but ignores their errors.
+    """
+    __slots__ = ("evaluations", "passes", "elapsed")
+
+    def __init__(self):
+        self.evaluations = 0
+        self.passes = 0
+        self.elapsed = 0.0
+
+    @property
+    def pass_rate(self) -> Optional[float]:
+        return self.passes / self.evaluations if self.evaluations else None
+
+    @property
+    def cost(self) -> float:
+        return self.elapsed / self.evaluations if self.evaluations else 0.0
+
+    def measure(self, record) -> bool:
+        start = time.perf_counter()
+        result = self._measure(record)
+        self.elapsed += time.perf_counter() - start
+        self.evaluations += 1
+        self.passes += result
+        return result
+
+
+class Clause(Node):
+    __slots__ = ("field", "op", "value", "text", "test")
+
+    def __init__(self, field: str, op: str, value: Any):
+        super().__init__()
+        self.field = field
+        self.op = op
+        self.value = value
+        self.text = f"{field} {op} {value!r}"
+        self.test = _clause_test(op, value)
+
+    def evaluate(self, record) -> bool:
+        return self.field not in record or self.test(record[self.field])
+
+    _measure = evaluate
+
+    def __repr__(self):
+        return self.text
+
+
+class Not(Node):
+    __slots__ = ("child",)
+
+    def __init__(self, child: Node):
+        super().__init__()
+        self.child = child
+
+    def evaluate(self, record) -> bool:
+        return not self.child.evaluate(record)
+
+    def _measure(self, record) -> bool:
+        return not self.child.measure(record)
+
+    def __repr__(self):
+        return f"not {self.child!r}"
+
+
+class And(Node):
+    __slots__ = ("children",)
+
+    def __init__(self, children: List[Node]):
+        super().__init__()
+        self.children = tuple(children)
+
+    def evaluate(self, record) -> bool:
+        for child in self.children:
+            if not child.evaluate(record):
+                return False
+        return True
+
+    def _measure(self, record) -> bool:
+        result = True
+        for child in self.children:
+            if result:
+                result = child.measure(record)
+            else:
+                _measure_unreached(child, record)
+        return result
+
+    def rank(self, child: Node) -> float:
+        # Cheap clauses that usually reject go first
+        rejection = 1.0 - (child.pass_rate if child.pass_rate is not None else 0.5)
+        return child.cost / max(rejection, 1e-6)
+
+    def __repr__(self):
+        return "(" + " and ".join(map(repr, self.children)) + ")"
+
+
+class Or(And):
+    __slots__ = ()
+
+    def evaluate(self, record) -> bool:
+        for child in self.children:
+            if child.evaluate(record):
+                return True
+        return False
+
+    def _measure(self, record) -> bool:
+        result = False
+        for child in self.children:
+            if not result:
+                result = child.measure(record)
+            else:
+                _measure_unreached(child, record)
+        return result
+
+    def rank(self, child: Node) -> float:
+        # Cheap clauses that usually accept go first
+        acceptance = child.pass_rate if child.pass_rate is not None else 0.5
+        return child.cost / max(acceptance, 1e-6)
+
+    def __repr__(self):
+        return "(" + " or ".join(map(repr, self.children)) + ")"
+
+
+def _measure_unreached(child: Node, record):
+    # Measured for its statistics only: evaluate() stops before this child,
+    # so an error it raises (e.g. comparing None) must not reach the caller
+    try:
+        child.measure(record)
+    except Exception:
+        pass
+
+
+def _clause_test(op: str, value: Any):
+    kinds = {"==": "equals", "in": "in", "~": "regex", ">": "gt", "<": "lt"}
+    if op in kinds:
+        return _compile_tests({kinds[op]: value})[0]
+    if op == "!=":
+        return lambda v: v != value
+
+    try:
+        bound = float(value)
+    except ValueError:
+        return _never_numeric
+    if op == ">=":
+        def test(v):
+            try:
+                return float(v) >= bound
+            except ValueError:
+                return False
+    else:
+        def test(v):
+            try:
+                return float(v) <= bound
+            except ValueError:
+                return False
+    return test
+
+
+def _unquote(token: str) -> str:
+    # Only the quote character and backslash are escapes; anything else
+    # (e.g. regex classes like \d) is kept verbatim.
+    return re.sub(r"\\([\\\"'])", r"\1", token[1:-1])
+
+
+def _tokenize(text: str) -> List[tuple]:
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN_REGEX.match(text, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Invalid filter expression at position {pos}: {text[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        token = match.group(kind)
+        if kind == "string":
+            tokens.append(("value", _unquote(token)))
+        elif kind == "number":
+            tokens.append(("value", float(token) if any(c in token for c in ".eE") else int(token)))
+        elif kind == "word" and token.lower() in _KEYWORDS:
+            tokens.append(("op", token.lower()))
+        elif kind == "word" and token.lower() in _CONSTANTS:
+            tokens.append(("value", _CONSTANTS[token.lower()]))
+        else:
+            tokens.append((kind, token))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, expected: Optional[str] = None):
+        kind, token = self.peek()
+        if kind is None or (expected is not None and token != expected):
+            raise ValueError(f"Invalid filter expression {self.text!r}: expected {expected or 'more input'}")
+        self.pos += 1
+        return kind, token
+
+    def parse(self) -> Node:
+        node = self.or_expr()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Invalid filter expression {self.text!r}: unexpected {self.peek()[1]!r}")
+        return node
+
+    def or_expr(self) -> Node:
+        children = [self.and_expr()]
+        while self.peek() == ("op", "or"):
+            self.take()
+            children.append(self.and_expr())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def and_expr(self) -> Node:
+        children = [self.not_expr()]
+        while self.peek() == ("op", "and"):
+            self.take()
+            children.append(self.not_expr())
+        return children[0] if len(children) == 1 else And(children)
+
+    def not_expr(self) -> Node:
+        if self.peek() == ("op", "not"):
+            self.take()
+            return Not(self.not_expr())
+        if self.peek() == ("op", "("):
+            self.take()
+            node = self.or_expr()
+            self.take(")")
+            return node
+        return self.clause()
+
+    def clause(self) -> Node:
+        kind, field = self.take()
+        if kind not in ("word", "value") or (kind == "value" and not isinstance(field, str)):
+            raise ValueError(f"Invalid filter expression {self.text!r}: expected a field name, got {field!r}")
+        _, op = self.take()
+        if op not in _COMPARISONS:
+            raise ValueError(f"Invalid filter expression {self.text!r}: unknown operator {op!r}")
+        return Clause(field, op, self.list_value() if op == "in" else self.value())
+
+    def value(self):
+        kind, token = self.take()
+        if kind not in ("value", "word"):
+            raise ValueError(f"Invalid filter expression {self.text!r}: expected a value, got {token!r}")
+        return token
+
+    def list_value(self) -> list:
+        self.take("[")
+        items = []
+        while self.peek() != ("op", "]"):
+            items.append(self.value())
+            if self.peek() == ("op", ","):
+                self.take()
+        self.take("]")
+        return items
+
+
+def parse_expression(text: str) -> Node:
+    """
+    Parse a filter expression into a tree of Clause/And/Or/Not nodes.
+    """
+    return _Parser(text).parse()
+
+
+def rules_to_node(rules: List[Dict[str, Any]]) -> Node:
+    """
+    Express a rule list as an AND of single-check clauses.
+    """
+    ops = {"equals": "==", "in": "in", "regex": "~", "gt": ">", "lt": "<"}
+    clauses = [
+        Clause(rule.get("field"), op, rule[kind])
+        for rule in rules for kind, op in ops.items() if kind in rule
+    ]
+    return And(clauses)
+
+
+class CompiledExpression:
+    """
+    Short-circuiting evaluator for a filter expression.
+
+    Every ``sample_every``-th record is evaluated in measuring mode to keep
+    per-clause pass rates and costs; every ``reorder_every`` samples the
+    children of each and/or node are re-sorted so cheap, selective clauses
+    run first. Same interface as core.filter.CompiledFilter.
+    """
+
+    def __init__(self, root: Node, text: str = "", sample_every: int = SAMPLE_EVERY,
+                 reorder_every: int = REORDER_EVERY, adaptive: bool = True):
+        self.root = root
+        self.text = text or repr(root)
+        self.sample_every = sample_every
+        self.reorder_every = reorder_every
+        self.adaptive = adaptive
+        self._countdown = sample_every
+        self._samples = 0
+
+    def __call__(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not self.adaptive:
+            return record if self.root.evaluate(record) else None
+        # Not atomic across threads: a race can take the countdown past 0,
+        # which must still end in a sample rather than never again
+        self._countdown -= 1
+        if self._countdown > 0:
+            return record if self.root.evaluate(record) else None
+        self._countdown = self.sample_every
+        result = self.root.measure(record)
+        self._samples += 1
+        if self._samples % self.reorder_every == 0:
+            self.reorder()
+        return record if result else None
+
+    def filter_batch(self, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [record for record in records if record and self(record) is not None]
+
+    def reorder(self):
+        """
+        Sort the operands of every and/or node by their measured rank.
+        """
+        def visit(node):
+            if isinstance(node, And):
+                for child in node.children:
+                    visit(child)
+                node.children = tuple(sorted(node.children, key=node.rank))
+            elif isinstance(node, Not):
+                visit(node.child)
+        visit(self.root)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Per-clause statistics from sampled records, most expensive first.
+        """
+        total = self.root.elapsed or 1.0
+        rows = []
+
+        def visit(node):
+            rows.append({
+                "clause": repr(node),
+                "evaluations": node.evaluations,
+                "pass_rate": node.pass_rate,
+                "avg_cost_us": node.cost * 1e6,
+                "time_share": node.elapsed / total,
+            })
+            if isinstance(node, And):
+                for child in node.children:
+                    visit(child)
+            elif isinstance(node, Not):
+                visit(node.child)
+        visit(self.root)
+        return sorted(rows, key=lambda row: row["time_share"], reverse=True)
+
+
+def compile_expression(expression, **options) -> CompiledExpression:
+    """
+    Compile an expression string (or a rule list) into an adaptive evaluator.
+    """
+    if isinstance(expression, str):
+        return CompiledExpression(parse_expression(expression), expression, **options)
+    return CompiledExpression(rules_to_node(expression), **options)
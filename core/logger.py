@@ -1,13 +1,22 @@
+import atexit
 import os
 import sys
+import threading
+import time
+from collections import deque
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 # Default log directory
 LOG_DIR = os.getenv("UNILOG_LOG_DIR", "./logs")
 os.makedirs(LOG_DIR, exist_ok=True)
 
+# Background writer tuning: a batch is written as soon as this many lines are
+# pending, and at least every FLUSH_INTERVAL seconds otherwise.
+FLUSH_BATCH_SIZE = int(os.getenv("UNILOG_LOG_FLUSH_BATCH", 1024))
+FLUSH_INTERVAL = float(os.getenv("UNILOG_LOG_FLUSH_INTERVAL", 0.5))
+
 # Log levels
 class LogLevel(Enum):
     DEBUG = 10
@@ -20,20 +29,203 @@ class LogLevel(Enum):
 # Global log level
 GLOBAL_LOG_LEVEL = LogLevel.DEBUG
 
+# Callers across the codebase pass level names as plain strings ("WARN", "ERROR")
+_LEVEL_ALIASES = {"WARN": LogLevel.WARNING, "FATAL": LogLevel.CRITICAL}
+
+
+def _resolve_level(level) -> LogLevel:
+    if isinstance(level, LogLevel):
+        return level
+    name = str(level).upper()
+    if name in _LEVEL_ALIASES:
+        return _LEVEL_ALIASES[name]
+    try:
+        return LogLevel[name]
+    except KeyError:
+        return LogLevel.INFO
+
+
+# (second, "YYYY-MM-DD HH:MM:SS", "YYYY-MM-DD"), recomputed once per second
+_clock: Tuple[int, str, str] = (-1, "", "")
+
+
+def _now() -> Tuple[str, str]:
+    """
+    Return the current timestamp and day strings, formatting at most once per second.
+    """
+    global _clock
+    second = int(time.time())
+    cached = _clock
+    if cached[0] != second:
+        stamp = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+        cached = _clock = (second, stamp, stamp[:10])
+    return cached[1], cached[2]
+
 
 def format_message(message: str, level: LogLevel = LogLevel.INFO, timestamp: bool = True) -> str:
     """
     Format the log message with optional timestamp and level.
     """
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S") if timestamp else ""
+    level = _resolve_level(level)
+    ts = _now()[0] if timestamp else ""
     return f"[{ts}][{level.name}] {message}" if ts else f"[{level.name}] {message}"
 
 
+class BufferedFileHandler:
+    """
+    Append-only log file kept open for the life of the process.
+
+    ``emit`` only appends to a deque; a background thread drains it in batches,
+    either every ``flush_interval`` seconds or as soon as ``batch_size`` lines
+    are pending. With ``path=None`` lines go to the daily file in ``directory``
+    (``LOG_DIR`` by default) and the handle rolls over when the day changes.
+    """
+
+    def __init__(self, path: Optional[str] = None, directory: Optional[str] = None,
+                 batch_size: int = FLUSH_BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = deque()
+        self._wakeup = threading.Event()
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stream = None
+        self._stream_path = None
+        self._thread = None
+        self._closed = False
+
+    def emit(self, line: str, day: str):
+        self._pending.append((day, line))
+        if self._closed:
+            # Late messages (e.g. from other atexit hooks) are written synchronously
+            self.flush()
+        elif self._thread is None:
+            self._start()
+        elif len(self._pending) >= self.batch_size and not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="unilog-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _target(self, day: str) -> str:
+        if self.path:
+            return self.path
+        return os.path.join(self.directory or LOG_DIR, f"{day}.log")
+
+    def _write(self, day: str, lines: list):
+        target = self._target(day)
+        if target != self._stream_path:
+            if self._stream:
+                self._stream.close()
+            directory = os.path.dirname(target)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._stream = open(target, "a", encoding="utf-8")
+            self._stream_path = target
+        self._stream.write("\n".join(lines) + "\n")
+
+    def flush(self):
+        """
+        Write out everything queued so far.
+        """
+        with self._write_lock:
+            pending = self._pending
+            batch = []
+            while pending:
+                batch.append(pending.popleft())
+            if not batch:
+                return
+
+            try:
+                # Group consecutive lines by day so a batch spanning midnight is split
+                current_day, lines = batch[0][0], []
+                for day, line in batch:
+                    if day != current_day:
+                        self._write(current_day, lines)
+                        current_day, lines = day, []
+                    lines.append(line)
+                self._write(current_day, lines)
+                self._stream.flush()
+            except OSError as e:
+                print(f"[unilog] Failed to write log batch to {self._stream_path}: {e}", file=sys.stderr)
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self.flush()
+        with self._write_lock:
+            if self._stream:
+                self._stream.close()
+                self._stream = None
+                self._stream_path = None
+
+
+# One handler per destination; the key None is the daily file in LOG_DIR
+_handlers: Dict[Optional[str], BufferedFileHandler] = {}
+_handlers_lock = threading.Lock()
+
+
+def get_handler(file: Optional[str] = None) -> BufferedFileHandler:
+    handler = _handlers.get(file)
+    if handler is None:
+        with _handlers_lock:
+            handler = _handlers.get(file)
+            if handler is None:
+                handler = _handlers[file] = BufferedFileHandler(file)
+    return handler
+
+
+def flush():
+    """
+    Block until all queued log lines have been written to disk.
+    """
+    for handler in list(_handlers.values()):
+        handler.flush()
+
+
+def shutdown():
+    """
+    Drain and close every log file handle. Registered with atexit.
+    """
+    for handler in list(_handlers.values()):
+        handler.close()
+
+
+atexit.register(shutdown)
+
+
+def _after_fork():
+    # A forked child inherits handlers whose writer thread doesn't exist in
+    # it (and lines the parent will write itself); it starts with its own
+    global _handlers_lock
+    _handlers.clear()
+    _handlers_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
 def log(message: str, level: LogLevel = LogLevel.INFO, file: Optional[str] = None, console: bool = True):
+    level = _resolve_level(level)
     if level.value < GLOBAL_LOG_LEVEL.value:
         return
 
-    formatted = format_message(message, level)
+    stamp, day = _now()
+    formatted = f"[{stamp}][{level.name}] {message}"
 
     if console:
         if level in (LogLevel.ERROR, LogLevel.CRITICAL):
@@ -41,16 +233,8 @@ def log(message: str, level: LogLevel = LogLevel.INFO, file: Optional[str] = Non
         else:
             print(formatted)
 
-    if file:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(file), exist_ok=True)
-        with open(file, "a", encoding="utf-8") as f:
-            f.write(formatted + "\n")
-    else:
-        # Default: write to daily log file
-        log_file = os.path.join(LOG_DIR, f"{datetime.now().strftime('%Y-%m-%d')}.log")
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(formatted + "\n")
+    # Default (file=None): the daily log file in LOG_DIR
+    get_handler(file).emit(formatted, day)
 
 
 # Convenience functions for each log level
@@ -0,0 +1,258 @@
+import hashlib
+import io
+import mmap
+import os
+import struct
+from array import array
+from typing import Iterator, List, Optional, Tuple
+
+# Memory-mapped reading of large plain log files. Lines are sliced out of the
+# mapping a chunk at a time, so the file is never copied into the heap as a
+# whole, and pages already consumed are dropped from the process again
+# (they stay in the page cache). A MappedFile keeps no read position, so
+# several threads can read different ranges of one mapping at once.
+#
+# An optional sidecar (<file>.idx) stores the byte offset of every
+# INDEX_STRIDE-th line, for jumping to a line number without scanning the
+# file. It is extended when the file has grown and rebuilt when its head
+# no longer matches.
+
+# Plain files at least this big are mapped by file_chunks (core.pipeline).
+# 0, the default, maps none: a mapped file truncated while it is being read
+# (e.g. by copytruncate rotation) kills the process with SIGBUS, so only
+# enable it for inputs nothing writes to any more, such as rotated logs.
+MMAP_MIN_BYTES = int(os.getenv("UNILOG_MMAP_MIN_BYTES", 0))
+INDEX_STRIDE = int(os.getenv("UNILOG_INDEX_STRIDE", 256))
+INDEX_SUFFIX = ".idx"
+
+_INDEX_MAGIC = b"UNILOGIX"
+_INDEX_VERSION = 1
+# magic, version, stride, indexed end, line count, head length, head sha256
+_INDEX_HEADER = struct.Struct("<8sIIQQI32s")
+_HEAD_BYTES = 1024
+_SCAN_BYTES = 2**20
+
+
+class LineIndex:
+    """
+    Byte offsets of lines 0, stride, 2 * stride, ... of the first ``end``
+    bytes of a file, which hold ``lines`` complete lines.
+    """
+    __slots__ = ("stride", "offsets", "end", "lines")
+
+    def __init__(self, stride: int = INDEX_STRIDE):
+        self.stride = max(1, stride)
+        self.offsets = array("Q")
+        self.end = 0
+        self.lines = 0
+
+
+class MappedFile:
+    """
+    A read-only mapping of a plain file with line-oriented access.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            # An empty file can't be mapped
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        if self.size and hasattr(mmap, "MADV_SEQUENTIAL"):
+            self.map.madvise(mmap.MADV_SEQUENTIAL)
+        self.index: Optional[LineIndex] = None
+
+    def close(self):
+        if self.size:
+            self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def line_start(self, offset: int) -> int:
+        """
+        Start of the line containing byte ``offset``.
+        """
+        offset = min(max(offset, 0), self.size)
+        return self.map.rfind(b"\n", 0, offset) + 1
+
+    def next_line(self, offset: int) -> int:
+        """
+        First line start at or after byte ``offset`` (the file size if there is none).
+        """
+        if offset <= 0:
+            return 0
+        newline = self.map.find(b"\n", offset - 1, self.size)
+        return self.size if newline < 0 else newline + 1
+
+    def line_at(self, offset: int) -> bytes:
+        """
+        The line containing byte ``offset``, with its newline.
+        """
+        start = self.line_start(offset)
+        return self.map[start:self.next_line(start + 1)]
+
+    def chunks(self, start: int = 0, end: Optional[int] = None,
+               chunk_bytes: Optional[int] = None) -> Iterator[List[bytes]]:
+        """
+        Whole lines of bytes [start, end), about ``chunk_bytes`` (default
+        core.pipeline.READ_CHUNK_BYTES) at a time. ``start`` and ``end``
+        should be line starts; a last line without a newline is included.
+        """
+        from core import pipeline
+
+        chunk_bytes = max(1, chunk_bytes or pipeline.READ_CHUNK_BYTES)
+        end = self.size if end is None else min(end, self.size)
+        release = start - start % mmap.PAGESIZE
+        while start < end:
+            stop = end
+            if start + chunk_bytes < end:
+                newline = self.map.rfind(b"\n", start, start + chunk_bytes)
+                if newline < 0:
+                    # A line longer than a chunk
+                    newline = self.map.find(b"\n", start + chunk_bytes, end)
+                stop = end if newline < 0 else newline + 1
+            # BytesIO shares the slice instead of copying it again
+            yield io.BytesIO(self.map[start:stop]).readlines()
+            start = stop
+            done = start - start % mmap.PAGESIZE
+            if done > release and hasattr(mmap, "MADV_DONTNEED"):
+                self.map.madvise(mmap.MADV_DONTNEED, release, done - release)
+                release = done
+
+    def lines(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        for lines in self.chunks(start, end):
+            yield from lines
+
+    def ranges(self, count: int, start: int = 0, end: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Up to ``count`` line-aligned (start, end) ranges of about equal size
+        covering [start, end), for parallel readers of this mapping.
+        """
+        end = self.size if end is None else min(end, self.size)
+        step = max(1, (end - start) // max(1, count))
+        ranges = []
+        while start < end:
+            stop = end if len(ranges) == count - 1 else min(end, self.next_line(start + step))
+            ranges.append((start, stop))
+            start = stop
+        return ranges
+
+    def _head(self) -> Tuple[int, bytes]:
+        length = min(_HEAD_BYTES, self.size)
+        return length, hashlib.sha256(self.map[:length]).digest()
+
+    def load_index(self, stride: int = INDEX_STRIDE, sidecar: bool = True) -> LineIndex:
+        """
+        The line index of this file, read from its sidecar when there is a
+        valid one, brought up to date with the file and saved back.
+        """
+        index = self._read_index() if sidecar else None
+        if index is None or index.stride != max(1, stride):
+            index = LineIndex(stride)
+        end = index.end
+        self._extend_index(index)
+        if sidecar and index.end != end:
+            self._write_index(index)
+        self.index = index
+        return index
+
+    def _read_index(self) -> Optional[LineIndex]:
+        try:
+            with open(self.path + INDEX_SUFFIX, "rb") as f:
+                header = f.read(_INDEX_HEADER.size)
+                offsets = array("Q")
+                offsets.frombytes(f.read())
+        except (OSError, ValueError):
+            return None
+        if len(header) != _INDEX_HEADER.size:
+            return None
+        magic, version, stride, end, lines, head, digest = _INDEX_HEADER.unpack(header)
+        if magic != _INDEX_MAGIC or version != _INDEX_VERSION or end > self.size:
+            return None
+        if head > self.size or hashlib.sha256(self.map[:head]).digest() != digest:
+            # The file was replaced or rewritten
+            return None
+        index = LineIndex(stride)
+        index.offsets, index.end, index.lines = offsets, end, lines
+        return index
+
+    def _write_index(self, index: LineIndex):
+        head, digest = self._head()
+        temp = f"{self.path}{INDEX_SUFFIX}.{os.getpid()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, _INDEX_VERSION, index.stride, index.end,
+                                       index.lines, head, digest))
+            f.write(index.offsets.tobytes())
+        os.replace(temp, self.path + INDEX_SUFFIX)
+
+    def _extend_index(self, index: LineIndex):
+        # Index the complete lines after index.end; pos is where line ``lines`` starts
+        stride, offsets = index.stride, index.offsets
+        pos, lines = index.end, index.lines
+        block_start = pos
+        while block_start < self.size:
+            block = self.map[block_start:block_start + _SCAN_BYTES]
+            start = pos - block_start
+            while True:
+                if lines % stride == 0 and len(offsets) == lines // stride and pos < self.size:
+                    offsets.append(pos)
+                wanted = stride - lines % stride
+                newline = _nth_newline(block, start, wanted)
+                if newline < 0:
+                    break
+                start = newline + 1
+                pos, lines = block_start + start, lines + wanted
+            # Lines left in the block, short of the next indexed one
+            rest = block.count(b"\n", start)
+            if rest:
+                pos, lines = block_start + block.rindex(b"\n") + 1, lines + rest
+            block_start += len(block)
+        index.end, index.lines = pos, lines
+
+    def line_offset(self, number: int) -> int:
+        """
+        Byte offset where line ``number`` (0-based) starts, found through the
+        line index (loaded on first use); the file size if there is no such line.
+        """
+        index = self.index or self.load_index()
+        if number >= index.lines:
+            return self.size if number > index.lines else index.end
+        entry, rest = divmod(number, index.stride)
+        start = index.offsets[entry]
+        if not rest:
+            return start
+        stop = index.offsets[entry + 1] if entry + 1 < len(index.offsets) else index.end
+        return start + _nth_newline(self.map[start:stop], 0, rest) + 1
+
+
+def _nth_newline(data: bytes, start: int, n: int) -> int:
+    """
+    Position of the ``n``-th newline in ``data`` from ``start``, or -1.
+    Newlines are counted in growing windows, then the window holding the
+    one wanted is halved down, so no Python-level loop runs per line.
+    """
+    end = len(data)
+    hi, width = start, 4096
+    while True:
+        lo, hi = hi, min(end, hi + width)
+        found = data.count(b"\n", lo, hi)
+        if found >= n:
+            break
+        if hi == end:
+            return -1
+        n -= found
+        width *= 2
+    while hi - lo > 256:
+        mid = (lo + hi) // 2
+        found = data.count(b"\n", lo, mid)
+        if found >= n:
+            hi = mid
+        else:
+            lo, n = mid, n - found
+    for _ in range(n):
+        lo = data.index(b"\n", lo) + 1
+    return lo - 1
@@ -1,14 +1,10 @@
 # Compatibility function for cli/tail.py
-def send_to_output(records, output_type):
-    OutputManager([output_type]).write(records)
+def send_to_output(records, output_type) -> bool:
+    return OutputManager([output_type]).write(records)
 import os
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set, Tuple
 from core.logger import log
-from outputs import json_output
-from outputs import csv_output
-from outputs import parquet_output
-from outputs import elastic_output
-from cloud import s3, gcp, azure
+from core.registry import LazyRegistry
 
 # Default output directory
 OUTPUT_DIR = os.getenv("UNILOG_OUTPUT_DIR", "./output")
@@ -17,60 +13,111 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 # Supported output types
 SUPPORTED_OUTPUTS = ["json", "csv", "parquet", "elastic", "s3", "gcp", "azure"]
 
+# Writers and uploaders are imported on first use so that, e.g., a JSON-only
+# run never loads pandas, elasticsearch or the cloud SDKs.
+OUTPUT_WRITERS = LazyRegistry({
+    "json": "outputs.json_output:write",
+    "csv": "outputs.csv_output:write",
+    "parquet": "outputs.parquet_output:write",
+    "elastic": "outputs.elastic_output:write",
+})
+
+CLOUD_PROVIDERS = LazyRegistry({
+    "s3": "cloud.s3:upload",
+    "gcp": "cloud.gcp:upload",
+    "azure": "cloud.azure:upload",
+})
+
+# Cloud outputs append to a local JSON file on every write and upload it once,
+# from close(), instead of shipping the whole growing file each time.
+# Records written to these outputs are only delivered once close() succeeds.
+DEFERRED_OUTPUTS = {"parquet", "s3", "gcp", "azure"}
+_uploads: Set[Tuple[str, str]] = set()
+
+
+def close() -> bool:
+    """
+    Finish what the writes so far left open: upload the files of cloud
+    outputs and write the footer of Parquet files. Called at the end of a
+    run; returns False if anything failed.
+    """
+    ok = True
+    for provider, path in sorted(_uploads):
+        try:
+            CLOUD_PROVIDERS[provider](path)
+            log(f"Uploaded {path} to {provider}")
+        except Exception as e:
+            log(f"Failed to upload {path} to {provider}: {e}", level="ERROR")
+            ok = False
+    _uploads.clear()
+    if OUTPUT_WRITERS.is_loaded("parquet"):
+        from outputs import parquet_output
+
+        try:
+            parquet_output.close()
+        except Exception as e:
+            log(f"Failed to finish Parquet output: {e}", level="ERROR")
+            ok = False
+    return ok
+
 
 class OutputManager:
     def __init__(self, outputs: Optional[List[str]] = None):
         # If no outputs specified, default to all local outputs
         self.outputs = outputs or ["json", "csv", "parquet"]
 
-    def write(self, records: List[Dict], file_name: Optional[str] = None):
+    def write(self, records: List[Dict], file_name: Optional[str] = None) -> bool:
+        """
+        Write ``records`` to every output. Returns False if any of them failed.
+        """
         if not records:
             log("No records to write.", level="WARNING")
-            return
+            return True
 
         file_name = file_name or "unilog_export"
+        ok = True
 
         for output_type in self.outputs:
             try:
                 if output_type == "json":
                     path = os.path.join(OUTPUT_DIR, f"{file_name}.json")
-                    json_output.write(records, path)
+                    OUTPUT_WRITERS["json"](records, path)
                     log(f"Wrote JSON output to {path}")
 
                 elif output_type == "csv":
                     path = os.path.join(OUTPUT_DIR, f"{file_name}.csv")
-                    csv_output.write(records, path)
+                    OUTPUT_WRITERS["csv"](records, path)
                     log(f"Wrote CSV output to {path}")
 
                 elif output_type == "parquet":
                     path = os.path.join(OUTPUT_DIR, f"{file_name}.parquet")
-                    parquet_output.write(records, path)
+                    OUTPUT_WRITERS["parquet"](records, path)
                     log(f"Wrote Parquet output to {path}")
 
                 elif output_type == "elastic":
-                    elastic_output.write(records)
+                    OUTPUT_WRITERS["elastic"](records)
                     log(f"Wrote output to ElasticSearch")
 
                 elif output_type == "s3":
                     path = os.path.join(OUTPUT_DIR, f"{file_name}.json")
-                    json_output.write(records, path)
-                    s3.upload(path)
-                    log(f"Uploaded {path} to AWS S3")
+                    OUTPUT_WRITERS["json"](records, path)
+                    _uploads.add(("s3", path))
 
                 elif output_type == "gcp":
                     path = os.path.join(OUTPUT_DIR, f"{file_name}.json")
-                    json_output.write(records, path)
-                    gcp.upload(path)
-                    log(f"Uploaded {path} to GCP")
+                    OUTPUT_WRITERS["json"](records, path)
+                    _uploads.add(("gcp", path))
 
                 elif output_type == "azure":
                     path = os.path.join(OUTPUT_DIR, f"{file_name}.json")
-                    json_output.write(records, path)
-                    azure.upload(path)
-                    log(f"Uploaded {path} to Azure")
+                    OUTPUT_WRITERS["json"](records, path)
+                    _uploads.add(("azure", path))
 
                 else:
                     log(f"Unsupported output type: {output_type}", level="WARNING")
+                    ok = False
 
             except Exception as e:
                 log(f"Failed to write {output_type} output: {e}", level="ERROR")
+                ok = False
+        return ok
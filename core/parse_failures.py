@@ -0,0 +1,209 @@
+import atexit
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from core.logger import log, LogLevel
+
+# Emit at most one summary line per parser/source every REPORT_INTERVAL seconds
+REPORT_INTERVAL = float(os.getenv("UNILOG_PARSE_REPORT_INTERVAL", 60))
+# Number of bad lines kept per parser/source (reservoir sample)
+SAMPLE_SIZE = int(os.getenv("UNILOG_PARSE_SAMPLE_SIZE", 5))
+SAMPLE_MAX_CHARS = 512
+DEFAULT_SOURCE = "-"
+
+
+class ParseStats:
+    """
+    Match/failure counters and a bounded sample of bad lines for one parser on one source.
+    ``prefiltered`` lines were dropped by a prefilter (core.prefilter) before
+    being parsed, so they are not in ``total`` or the match rate.
+    """
+    __slots__ = ("parser", "source", "matched", "failed", "prefiltered", "samples", "reported")
+
+    def __init__(self, parser: str, source: str):
+        self.parser = parser
+        self.source = source
+        self.matched = 0
+        self.failed = 0
+        self.prefiltered = 0
+        self.samples: List[str] = []
+        self.reported = 0
+
+    @property
+    def total(self) -> int:
+        return self.matched + self.failed
+
+    @property
+    def match_rate(self) -> Optional[float]:
+        return self.matched / self.total if self.total else None
+
+    def to_dict(self) -> Dict:
+        return {
+            "parser": self.parser,
+            "source": self.source,
+            "matched": self.matched,
+            "failed": self.failed,
+            "total": self.total,
+            "prefiltered": self.prefiltered,
+            "match_rate": self.match_rate,
+            "samples": list(self.samples),
+        }
+
+
+_stats: Dict[Tuple[str, str], ParseStats] = {}
+_lock = threading.Lock()
+_local = threading.local()
+_last_report = float("-inf")
+
+
+def current_source() -> str:
+    return getattr(_local, "source", DEFAULT_SOURCE)
+
+
+@contextmanager
+def source(name: str):
+    """
+    Attribute parse results recorded by this thread to ``name`` (usually a file path).
+    """
+    previous = current_source()
+    _local.source = str(name)
+    try:
+        yield
+    finally:
+        _local.source = previous
+
+
+@contextmanager
+def muted():
+    """
+    Don't record anything from this thread, e.g. while trying parsers on sample lines.
+    """
+    previous = getattr(_local, "muted", False)
+    _local.muted = True
+    try:
+        yield
+    finally:
+        _local.muted = previous
+
+
+def _get(parser: str) -> ParseStats:
+    key = (parser, current_source())
+    stats = _stats.get(key)
+    if stats is None:
+        stats = _stats[key] = ParseStats(*key)
+    return stats
+
+
+def record_match(parser: str, count: int = 1):
+    if getattr(_local, "muted", False):
+        return
+    with _lock:
+        _get(parser).matched += count
+
+
+def record_prefiltered(parser: str, count: int = 1):
+    if getattr(_local, "muted", False) or not count:
+        return
+    with _lock:
+        _get(parser).prefiltered += count
+
+
+def record_failure(parser: str, line):
+    """
+    Count a line ``parser`` could not handle. Replaces a log call per bad line:
+    the line may end up in the sample and is summarized by report().
+    """
+    if getattr(_local, "muted", False):
+        return
+    with _lock:
+        stats = _get(parser)
+        stats.failed += 1
+        # Reservoir sampling keeps a uniform sample of all failures seen so far
+        if len(stats.samples) < SAMPLE_SIZE:
+            stats.samples.append(_sample(line))
+        else:
+            slot = random.randrange(stats.failed)
+            if slot < SAMPLE_SIZE:
+                stats.samples[slot] = _sample(line)
+    if time.monotonic() - _last_report >= REPORT_INTERVAL:
+        report()
+
+
+def _sample(line) -> str:
+    if isinstance(line, (bytes, bytearray, memoryview)):
+        line = bytes(line).decode("utf-8", errors="backslashreplace")
+    return str(line).rstrip("\r\n")[:SAMPLE_MAX_CHARS]
+
+
+def report():
+    """
+    Log one summary line per parser/source that has new failures since the last report.
+    """
+    global _last_report
+    lines = []
+    with _lock:
+        _last_report = time.monotonic()
+        for stats in _stats.values():
+            new = stats.failed - stats.reported
+            if not new:
+                continue
+            stats.reported = stats.failed
+            example = f"; e.g. {stats.samples[-1]!r}" if stats.samples else ""
+            lines.append(
+                f"{stats.parser} parser failed on {new} new lines from {stats.source} "
+                f"({stats.failed}/{stats.total} total, match rate {stats.match_rate:.1%}){example}"
+            )
+    for line in lines:
+        log(line, level=LogLevel.WARNING)
+
+
+def get_stats(parser: Optional[str] = None, source: Optional[str] = None) -> List[Dict]:
+    """
+    Snapshot of the counters, optionally restricted to one parser and/or source.
+    """
+    with _lock:
+        return [
+            stats.to_dict() for stats in _stats.values()
+            if (parser is None or stats.parser == parser) and (source is None or stats.source == source)
+        ]
+
+
+def match_rate(parser: Optional[str] = None, source: Optional[str] = None) -> Optional[float]:
+    """
+    Fraction of lines successfully parsed, aggregated over the matching
+    counters. Lines dropped by a prefilter weren't parsed and don't count.
+    """
+    stats = get_stats(parser, source)
+    total = sum(s["total"] for s in stats)
+    return sum(s["matched"] for s in stats) / total if total else None
+
+
+def merge(snapshots: List[Dict]):
+    """
+    Add counters from get_stats() snapshots taken elsewhere (e.g. in a worker process).
+    """
+    with _lock:
+        for snapshot in snapshots:
+            key = (snapshot["parser"], snapshot["source"])
+            stats = _stats.get(key)
+            if stats is None:
+                stats = _stats[key] = ParseStats(*key)
+            stats.matched += snapshot["matched"]
+            stats.failed += snapshot["failed"]
+            stats.prefiltered += snapshot.get("prefiltered", 0)
+            room = SAMPLE_SIZE - len(stats.samples)
+            stats.samples.extend(snapshot["samples"][:max(room, 0)])
+
+
+def reset():
+    global _last_report
+    with _lock:
+        _stats.clear()
+        _last_report = float("-inf")
+
+
+# Make sure failures from the last interval are not lost
+atexit.register(report)
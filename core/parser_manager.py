@@ -1,33 +1,215 @@
-from typing import Dict, Any, Callable
-from parsers.json_parser import JSONParser
-from parsers.nginx import NginxParser
-from parsers.apache import ApacheParser
-# from parsers.postgres import PostgresParser  # Uncomment if exists
-from parsers.syslog import SyslogParser
-from parsers.generic import GenericParser
+import os
+import threading
+from itertools import islice
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
 from core.logger import log
+from core.registry import LazyRegistry
+from core import parse_failures
 
-# Registry of available parsers
-PARSER_REGISTRY: Dict[str, Callable[[str], Dict[str, Any]]] = {
-    "json": JSONParser().parse_line,
-    "nginx": NginxParser().parse_line,
-    "apache": ApacheParser().parse_line,
-    # "postgres": PostgresParser().parse_line,  # Uncomment if exists
-    "syslog": SyslogParser().parse_line,
-    "generic": GenericParser().parse_line,
-}
+# Registry of available parsers. Each entry is imported and instantiated the
+# first time it is looked up.
+PARSER_REGISTRY = LazyRegistry({
+    "json": "parsers.json_parser:JSONParser",
+    "nginx": "parsers.nginx:NginxParser",
+    "apache": "parsers.apache:ApacheParser",
+    # "postgres": "parsers.postgres:PostgresParser",  # Uncomment if exists
+    "syslog": "parsers.syslog:SyslogParser",
+    "generic": "parsers.generic:GenericParser",
+}, wrap=lambda parser_cls: parser_cls())
+
+# Lines handed to a parser's parse_batch at a time by parse_iter
+BATCH_SIZE = 1024
+
+# Log type that picks a parser per source. The first DETECT_SAMPLE_LINES lines
+# of a source are tried against every registered parser and the winner sticks
+# to that source (path + inode); it is checked again every DETECT_SAMPLE_LINES
+# lines and dropped if its match rate falls below REDETECT_MATCH_RATE.
+AUTO = "auto"
+DETECT_SAMPLE_LINES = int(os.getenv("UNILOG_DETECT_SAMPLE_LINES", 100))
+REDETECT_MATCH_RATE = float(os.getenv("UNILOG_REDETECT_MATCH_RATE", 0.5))
+
+_EMPTY_VALUES = (None, "", "-")
+
+
+class FunctionParser:
+    """
+    Adapts a bare ``line -> record`` callable to the parser interface.
+    """
+    def __init__(self, parse_line: Callable[[str], Dict[str, Any]]):
+        self.parse_line = parse_line
+
+
+def _completeness(record: Dict[str, Any]) -> float:
+    # Share of fields that actually got a value
+    if not record:
+        return 0.0
+    return sum(1 for value in record.values() if value not in _EMPTY_VALUES) / len(record)
+
+
+def source_key(source: str) -> Tuple[str, Optional[int], Optional[int]]:
+    """
+    (path, device, inode) of a source, so a rotated file gets a fresh verdict.
+    """
+    if source != parse_failures.DEFAULT_SOURCE:
+        try:
+            stat = os.stat(source)
+            return source, stat.st_dev, stat.st_ino
+        except (OSError, ValueError):
+            pass
+    return source, None, None
+
+
+class FormatVerdict:
+    """
+    The parser chosen for one source, with the match counts seen since the last check.
+    """
+    __slots__ = ("log_type", "score", "matched", "total")
+
+    def __init__(self, log_type: str, score: float):
+        self.log_type = log_type
+        self.score = score
+        self.matched = 0
+        self.total = 0
+
+
+class FormatDetector:
+    """
+    Picks the registered parser that best fits a sample of lines: the one
+    with the highest match rate, weighted by how many fields it fills in.
+    """
+
+    def __init__(self, parser_manager: "ParserManager", sample_lines: int = DETECT_SAMPLE_LINES,
+                 min_match_rate: float = REDETECT_MATCH_RATE):
+        self.parser_manager = parser_manager
+        self.sample_lines = sample_lines
+        self.min_match_rate = min_match_rate
+        self.verdicts: Dict[Tuple, FormatVerdict] = {}
+        self._lock = threading.Lock()
+
+    def score(self, lines: Iterable[str]) -> List[Tuple[str, float]]:
+        """
+        (log_type, score) for every parser that matched any of the first
+        ``sample_lines`` lines, best first. Ties keep registry order.
+        """
+        sample = [line for line in islice(lines, self.sample_lines) if line.strip()]
+        if not sample:
+            return []
+        scores = []
+        with parse_failures.muted():
+            for log_type in self.parser_manager.list_parsers():
+                parse_line = self.parser_manager.parsers[log_type].parse_line
+                records = []
+                for line in sample:
+                    try:
+                        record = parse_line(line)
+                    except Exception:
+                        continue
+                    if isinstance(record, Mapping) and record:
+                        records.append(record)
+                if not records:
+                    continue
+                match_rate = len(records) / len(sample)
+                completeness = sum(map(_completeness, records)) / len(records)
+                fields = sum(map(len, records)) / len(records)
+                scores.append((log_type, match_rate * (0.5 + 0.5 * completeness), fields))
+        scores.sort(key=lambda s: (s[1], s[2]), reverse=True)
+        return [(log_type, score) for log_type, score, _ in scores]
+
+    def detect(self, lines: Iterable[str]) -> Optional[str]:
+        scores = self.score(lines)
+        return scores[0][0] if scores else None
+
+    def resolve(self, lines: Iterable[str], source: Optional[str] = None) -> str:
+        """
+        The log type for ``source`` (the current parse_failures source by
+        default), detecting it from ``lines`` if there is no verdict yet.
+        """
+        key = source_key(source or parse_failures.current_source())
+        verdict = self.verdicts.get(key)
+        if verdict is None:
+            scores = self.score(lines)
+            log_type, score = scores[0] if scores else ("generic", 0.0)
+            with self._lock:
+                verdict = self.verdicts.setdefault(key, FormatVerdict(log_type, score))
+            if verdict.log_type == log_type:
+                log(f"Detected {log_type} format for {key[0]} (score {score:.2f})")
+        return verdict.log_type
+
+    def resolve_file(self, path: str) -> str:
+        """
+        The log type for a file, sampling its first lines if there is no verdict yet.
+        """
+        from core.compressed import open_input
+
+        with open_input(path) as f:
+            lines = [line.decode("utf-8", errors="replace") for line in islice(f, self.sample_lines)]
+        return self.resolve(lines, path)
+
+    def observe(self, matched: int, total: int, source: Optional[str] = None):
+        """
+        Feed back parse results; a verdict whose match rate drops below
+        ``min_match_rate`` is forgotten so the next batch is re-detected.
+        """
+        key = source_key(source or parse_failures.current_source())
+        with self._lock:
+            verdict = self.verdicts.get(key)
+            if verdict is None:
+                return
+            verdict.matched += matched
+            verdict.total += total
+            if verdict.total < self.sample_lines:
+                return
+            rate = verdict.matched / verdict.total
+            verdict.matched = verdict.total = 0
+            if rate >= self.min_match_rate:
+                return
+            del self.verdicts[key]
+        log(f"{verdict.log_type} parser matched {rate:.0%} of recent lines from {key[0]}, re-detecting format",
+            level="WARNING")
+
+    def forget(self, source: Optional[str] = None):
+        with self._lock:
+            if source is None:
+                self.verdicts.clear()
+            else:
+                self.verdicts.pop(source_key(source), None)
 
 
 class ParserManager:
     def __init__(self):
         self.parsers = PARSER_REGISTRY.copy()
+        self.detector = FormatDetector(self)
+        self._fallback = None
+        self._unknown_types = set()
 
-    def register_parser(self, name: str, parser_func: Callable[[str], Dict[str, Any]]):
+    def register_parser(self, name: str, parser: Union[Any, str, Callable[[str], Dict[str, Any]]]):
+        """
+        Register a parser object (anything with ``parse_line``), a plain parse
+        function or a regex/grok pattern for a GenericParser.
+        """
+        if isinstance(parser, str):
+            from parsers.generic import GenericParser
+            parser = GenericParser(parser)
+        elif not hasattr(parser, "parse_line"):
+            parser = FunctionParser(parser)
         if name in self.parsers:
             log(f"Parser {name} already exists. Overwriting.", level="WARNING")
-        self.parsers[name] = parser_func
+        self.parsers[name] = parser
         log(f"Registered parser: {name}")
 
+    def register_log_format(self, name: Optional[str], fmt: str, style: Optional[str] = None):
+        """
+        Compile an nginx ``log_format`` / Apache ``LogFormat`` string (or the
+        whole config directive) and register the generated parser. ``name``
+        defaults to the directive's format name.
+        """
+        from parsers.log_format import compile_log_format
+        parser = compile_log_format(fmt, style, name)
+        if not parser.name:
+            raise ValueError("A name is needed for a log format without one")
+        self.register_parser(parser.name, parser)
+        return parser
+
     def unregister_parser(self, name: str):
         if name in self.parsers:
             del self.parsers[name]
@@ -35,19 +217,109 @@ class ParserManager:
         else:
             log(f"Parser {name} not found.", level="WARNING")
 
-    def parse(self, log_type: str, line: str) -> Dict[str, Any]:
+    def get(self, log_type: str):
+        """
+        The parser registered for ``log_type``, or a shared generic parser
+        (with one warning per unknown type).
+        """
         parser = self.parsers.get(log_type)
-        if not parser:
+        if parser:
+            return parser
+        if log_type not in self._unknown_types:
+            self._unknown_types.add(log_type)
             log(f"No parser found for type '{log_type}', using generic parser.", level="WARNING")
+        if self._fallback is None:
             from parsers.generic import GenericParser
-            parser = GenericParser().parse_line
+            self._fallback = GenericParser()
+        return self._fallback
 
+    def parse(self, log_type: str, line: str) -> Dict[str, Any]:
+        if log_type == AUTO:
+            records = self.parse_batch(AUTO, [line])
+            return records[0] if records else {}
+        parser = self.get(log_type)
         try:
-            parsed = parser(line)
+            parsed = parser.parse_line(line)
             return parsed
         except Exception as e:
             log(f"Parsing failed for line '{line}': {e}", level="ERROR")
             return {}
 
+    def parse_batch(self, log_type: str, lines: Iterable[str], rejects: Optional[list] = None) -> List[Dict[str, Any]]:
+        """
+        Parse ``lines`` and return the records, in order, for the lines that parsed.
+
+        Lines that fail are appended to ``rejects`` when it is given (they are
+        always counted in core.parse_failures) instead of being logged one by one.
+        Parsers may implement ``parse_batch(lines, rejects)`` natively; others
+        are called line by line.
+
+        With ``log_type="auto"`` the parser is chosen by the FormatDetector
+        verdict for the current parse_failures source.
+        """
+        if log_type == AUTO:
+            lines = lines if isinstance(lines, list) else list(lines)
+            parsed = self.parse_batch(self.detector.resolve(lines), lines, rejects)
+            self.detector.observe(len(parsed), len(lines))
+            return parsed
+
+        parser = self.get(log_type)
+        native = getattr(parser, "parse_batch", None)
+        if native is not None:
+            return native(lines, rejects)
+
+        parse_line = parser.parse_line
+        parsed = []
+        for line in lines:
+            try:
+                record = parse_line(line)
+            except Exception:
+                record = None
+            if record:
+                parsed.append(record)
+            elif rejects is not None:
+                rejects.append(line)
+        return parsed
+
+    def parse_iter(self, log_type: str, lines: Iterable[str], rejects: Optional[list] = None,
+                   batch_size: int = BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming parse_batch: consume ``lines`` lazily, ``batch_size`` at a time.
+        """
+        lines = iter(lines)
+        while True:
+            batch = list(islice(lines, batch_size))
+            if not batch:
+                return
+            yield from self.parse_batch(log_type, batch, rejects)
+
+    def verbatim_fields(self, log_type: str) -> tuple:
+        """
+        Fields the parser for ``log_type`` copies unchanged from the raw line.
+        """
+        if log_type == AUTO:
+            return ()
+        return getattr(self.get(log_type), "VERBATIM_FIELDS", ())
+
     def list_parsers(self) -> list:
         return list(self.parsers.keys())
+
+
+_default_manager: Optional[ParserManager] = None
+
+
+def get_parser(parser_type: str = "generic", source: Optional[str] = None) -> Callable[[str], Optional[Dict[str, Any]]]:
+    """
+    A ``line -> record`` function for ``parser_type``. With "auto" and a
+    ``source`` file the format is detected once up front and lines go straight
+    to the chosen parser; without a source each call goes through detection.
+    """
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = ParserManager()
+    manager = _default_manager
+    if parser_type == AUTO:
+        if source is None:
+            return lambda line: manager.parse(AUTO, line)
+        parser_type = manager.detector.resolve_file(source)
+    return manager.get(parser_type).parse_line
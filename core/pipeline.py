@@ -0,0 +1,77 @@
+import io
+import os
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator, List, Optional, TypeVar
+
+# Helpers for the read -> parse -> filter -> output loops of the CLI. Input is
+# read READ_CHUNK_BYTES of whole lines at a time and records are handed to the
+# outputs every FLUSH_RECORDS, so memory use doesn't grow with the input.
+# With UNILOG_MMAP_MIN_BYTES set, plain files at least that big are read
+# through a memory mapping (core.mapped); everything else, by default all
+# input, through open_input (core.compressed).
+
+READ_CHUNK_BYTES = int(os.getenv("UNILOG_READ_CHUNK_BYTES", 2**20))
+FLUSH_RECORDS = int(os.getenv("UNILOG_FLUSH_RECORDS", 10_000))
+
+T = TypeVar("T")
+
+
+def read_chunks(f: BinaryIO, chunk_bytes: Optional[int] = None) -> Iterator[List[bytes]]:
+    """
+    Whole lines from ``f``, about ``chunk_bytes`` (default READ_CHUNK_BYTES) at a time.
+    """
+    chunk_bytes = chunk_bytes or READ_CHUNK_BYTES
+    while True:
+        lines = f.readlines(chunk_bytes)
+        if not lines:
+            return
+        yield lines
+
+
+def file_chunks(path: str, start: int = 0, end: Optional[int] = None,
+                chunk_bytes: Optional[int] = None) -> Iterator[List[bytes]]:
+    """
+    Whole lines of ``path`` from byte ``start`` up to ``end`` (a line
+    boundary; the end of the file by default), in chunks as read_chunks.
+    For an archive the offsets are raw ones: ``start`` is a gzip member
+    whose first line belongs to the range before it, and ``end`` is ignored.
+    """
+    from core.compressed import is_compressed, open_input
+    from core.mapped import MMAP_MIN_BYTES, MappedFile
+
+    compressed = is_compressed(path)
+    if not compressed and MMAP_MIN_BYTES and os.path.getsize(path) >= MMAP_MIN_BYTES:
+        with MappedFile(path) as mapped:
+            yield from mapped.chunks(start, end, chunk_bytes)
+        return
+    with open_input(path, start) as f:
+        if compressed or end is None:
+            if compressed and start:
+                f.readline()
+            yield from read_chunks(f, chunk_bytes)
+            return
+        position = start
+        for lines in read_chunks(f, chunk_bytes):
+            size = sum(map(len, lines))
+            if position + size > end:
+                # Stop at the last complete line seen when planning
+                lines = io.BytesIO(b"".join(lines)[:end - position]).readlines()
+                if lines:
+                    yield lines
+                return
+            yield lines
+            position += size
+            if position >= end:
+                return
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    ``items`` in lists of ``size`` (the last one may be shorter).
+    """
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,266 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+from core.filter import CompiledFilter
+from core.parse_failures import record_prefiltered
+
+# A raw-line prefilter drops lines that cannot pass the filter before they are
+# parsed. It is derived from the compiled rules: every rule on a "verbatim"
+# field (one whose str() value is a substring of the raw line, or "None") that
+# needs a literal - an equals/in constant, or a substring every regex match
+# must contain - becomes a clause "one of these literals occurs in the line".
+# A line is only dropped when some clause has no literal in it, so the full
+# parse+filter path would have rejected it too.
+
+_NULL_TEXT = "None"
+
+_REPEATS = tuple(op for op in (
+    sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, "POSSESSIVE_REPEAT", None),
+) if op is not None)
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+
+
+def _literal_run_candidates(items) -> List[Tuple[str, ...]]:
+    """
+    Required alternatives found in a parsed regex sequence.
+    """
+    candidates = []
+    run = []
+
+    def close_run():
+        if run:
+            candidates.append(("".join(run),))
+            run.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        close_run()
+        if op is sre_constants.SUBPATTERN:
+            group, add_flags, del_flags, pattern = av
+            if add_flags & sre_constants.SRE_FLAG_IGNORECASE:
+                continue
+            required = _required(pattern)
+            if required:
+                candidates.append(required)
+        elif op is sre_constants.BRANCH:
+            alternatives = []
+            for branch in av[1]:
+                required = _required(branch)
+                if not required:
+                    alternatives = None
+                    break
+                alternatives.extend(required)
+            if alternatives:
+                candidates.append(tuple(dict.fromkeys(alternatives)))
+        elif op is _ATOMIC_GROUP:
+            required = _required(av)
+            if required:
+                candidates.append(required)
+        elif op in _REPEATS:
+            low, high, pattern = av
+            if low >= 1:
+                required = _required(pattern)
+                if required:
+                    candidates.append(required)
+    close_run()
+    return candidates
+
+
+def _best(candidates: Iterable[Tuple[str, ...]]) -> Optional[Tuple[str, ...]]:
+    # Longest shortest-alternative first, then fewest alternatives
+    best = None
+    for candidate in candidates:
+        if not candidate or not all(candidate):
+            continue
+        key = (min(map(len, candidate)), -len(candidate))
+        if best is None or key > best[0]:
+            best = (key, candidate)
+    return best[1] if best else None
+
+
+def _required(pattern) -> Optional[Tuple[str, ...]]:
+    return _best(_literal_run_candidates(list(pattern)))
+
+
+def regex_literals(pattern) -> Optional[Tuple[str, ...]]:
+    """
+    Literals of which at least one occurs in every string ``pattern`` matches
+    (searched, not anchored), or None if no such set can be derived.
+    """
+    flags = 0
+    if isinstance(pattern, re.Pattern):
+        flags = pattern.flags
+        pattern = pattern.pattern
+    if isinstance(pattern, bytes):
+        return None
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return None
+    if (flags | parsed.state.flags) & re.IGNORECASE:
+        return None
+    return _required(parsed)
+
+
+def _constant_literals(values: Sequence[Any]) -> Optional[Tuple[str, ...]]:
+    literals = []
+    for value in values:
+        # Only str and int constants have a single textual form
+        if isinstance(value, bool) or not isinstance(value, (str, int)):
+            return None
+        literals.append(str(value))
+    return tuple(dict.fromkeys(literals)) if literals and all(literals) else None
+
+
+def _rule_clause(rule: Dict[str, Any]) -> Optional[Tuple[str, ...]]:
+    candidates = []
+    if "equals" in rule:
+        candidates.append(_constant_literals([rule["equals"]]))
+    if "in" in rule and isinstance(rule["in"], (list, tuple, set, frozenset)):
+        candidates.append(_constant_literals(list(rule["in"])))
+    if "regex" in rule:
+        candidates.append(regex_literals(rule["regex"]))
+    return _best(c for c in candidates if c)
+
+
+def _usable(clause: Optional[Tuple[str, ...]]) -> Optional[Tuple[str, ...]]:
+    # A None field value is compared as "None", which is not in the line
+    if clause is None or any(literal in _NULL_TEXT for literal in clause):
+        return None
+    return clause
+
+
+def _expression_clauses(node, fields) -> List[Tuple[str, ...]]:
+    from core.filter_expr import And, Clause, Or
+
+    if isinstance(node, Clause):
+        if node.field not in fields:
+            return []
+        rule = {{"==": "equals", "in": "in", "~": "regex"}.get(node.op, "_"): node.value}
+        clause = _usable(_rule_clause(rule))
+        return [clause] if clause else []
+    if isinstance(node, Or):
+        alternatives = []
+        for child in node.children:
+            best = _best(_expression_clauses(child, fields))
+            if best is None:
+                return []
+            alternatives.extend(best)
+        return [tuple(dict.fromkeys(alternatives))]
+    if isinstance(node, And):
+        clauses = []
+        for child in node.children:
+            clauses.extend(_expression_clauses(child, fields))
+        return clauses
+    # NOT (and anything else) can't require a literal
+    return []
+
+
+def required_literals(record_filter, fields: Iterable[str]) -> List[Tuple[str, ...]]:
+    """
+    Clauses (tuples of alternative literals) every line passing ``record_filter`` satisfies.
+    """
+    fields = set(fields)
+    if isinstance(record_filter, CompiledFilter):
+        clauses = []
+        for rule in record_filter.rules:
+            if rule.get("field") in fields:
+                clause = _usable(_rule_clause(rule))
+                if clause:
+                    clauses.append(clause)
+        return clauses
+    root = getattr(record_filter, "root", None)
+    return _expression_clauses(root, fields) if root is not None else []
+
+
+class LinePrefilter:
+    """
+    Multi-literal matcher over raw lines (str or bytes) or whole byte buffers.
+    """
+
+    def __init__(self, clauses: List[Tuple[str, ...]]):
+        # Most selective (longest shortest literal) clause first
+        self.clauses = sorted(clauses, key=lambda c: (min(map(len, c)), -len(c)), reverse=True)
+        self._text_tests = [self._matcher(clause) for clause in self.clauses]
+        self._bytes_tests = [self._matcher(tuple(l.encode("utf-8") for l in clause)) for clause in self.clauses]
+        first = self.clauses[0]
+        self._bytes_scanner = re.compile(b"|".join(re.escape(l.encode("utf-8")) for l in first))
+
+    @staticmethod
+    def _matcher(literals):
+        if len(literals) == 1:
+            literal = literals[0]
+            return lambda line: literal in line
+        separator = b"|" if isinstance(literals[0], bytes) else "|"
+        return re.compile(separator.join(re.escape(l) for l in literals)).search
+
+    def __call__(self, line) -> bool:
+        """
+        False if ``line`` cannot pass the filter.
+        """
+        if isinstance(line, str):
+            tests = self._text_tests
+        else:
+            tests = self._bytes_tests
+            if isinstance(line, memoryview):
+                line = line.tobytes()
+        for test in tests:
+            if not test(line):
+                return False
+        return True
+
+    def filter_lines(self, lines: Iterable, parser: Optional[str] = None) -> List:
+        """
+        The lines that may pass the filter. Given the ``parser`` they were
+        meant for, the others are counted as prefiltered in core.parse_failures.
+        """
+        lines = lines if isinstance(lines, list) else list(lines)
+        kept = [line for line in lines if self(line)]
+        if parser is not None:
+            record_prefiltered(parser, len(lines) - len(kept))
+        return kept
+
+    def filter_buffer(self, buffer: bytes) -> List[bytes]:
+        """
+        Lines (newline included) of a raw buffer that may pass the filter.
+
+        Only occurrences of the first clause's literals are visited, so lines
+        without any of them are never looked at individually.
+        """
+        rest = self._bytes_tests[1:]
+        kept = []
+        search = self._bytes_scanner.search
+        pos = 0
+        while True:
+            match = search(buffer, pos)
+            if match is None:
+                break
+            start = buffer.rfind(b"\n", 0, match.start()) + 1
+            end = buffer.find(b"\n", match.end())
+            end = len(buffer) if end < 0 else end + 1
+            line = buffer[start:end]
+            for test in rest:
+                if not test(line):
+                    break
+            else:
+                kept.append(line)
+            pos = end
+        return kept
+
+
+def build_prefilter(record_filter, fields: Iterable[str]) -> Optional[LinePrefilter]:
+    """
+    LinePrefilter for ``record_filter`` applied to records from a parser whose
+    verbatim fields are ``fields``, or None if nothing can be dropped early.
+    """
+    clauses = required_literals(record_filter, fields)
+    return LinePrefilter(clauses) if clauses else None
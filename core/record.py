@@ -0,0 +1,232 @@
+import os
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, Tuple
+
+# Records parsed from bytes lines keep the regex groups as raw bytes and only
+# decode (and convert) a field when it is first read. Filters read a few
+# fields; records that survive are turned into plain dicts with materialize()
+# before they reach outputs.
+
+# Invalid UTF-8 in a field becomes "\xNN" escapes instead of failing the line
+DECODE_ERRORS = "backslashreplace"
+
+
+def decode(value) -> Optional[str]:
+    """
+    UTF-8 decode a raw field (bytes, bytearray or memoryview); None stays None.
+    """
+    if value is None:
+        return None
+    return str(value, "utf-8", DECODE_ERRORS)
+
+
+def text_field(name: str) -> Callable[[Dict[str, Any]], Optional[str]]:
+    return lambda raw: decode(raw[name])
+
+
+class LazyRecord(MutableMapping):
+    """
+    Mapping over raw regex groups. ``schema`` maps each output field, in
+    order, to a function computing its value from the raw groups.
+    """
+    __slots__ = ("raw", "schema", "values", "_keys")
+
+    def __init__(self, raw: Dict[str, Any], schema: Dict[str, Callable[[Dict[str, Any]], Any]]):
+        self.raw = raw
+        self.schema = schema
+        self.values: Dict[str, Any] = {}
+        # Shared with the schema until a field is added or removed
+        self._keys = schema
+
+    def __getitem__(self, key: str) -> Any:
+        values = self.values
+        if key in values:
+            return values[key]
+        if key not in self._keys:
+            raise KeyError(key)
+        value = values[key] = self.schema[key](self.raw)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return key in self._keys
+
+    def _own_keys(self) -> dict:
+        if self._keys is self.schema:
+            self._keys = dict.fromkeys(self._keys)
+        return self._keys
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self._keys:
+            self._own_keys()[key] = None
+        self.values[key] = value
+
+    def __delitem__(self, key: str):
+        if key not in self._keys:
+            raise KeyError(key)
+        del self._own_keys()[key]
+        self.values.pop(key, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self[key] for key in self._keys}
+
+    def __repr__(self):
+        return f"LazyRecord({self.to_dict()!r})"
+
+
+# Records kept in memory (parsed_data, the dashboard buffer) are stored as
+# CompactRecords: one slotted class per field layout, so the field names are
+# shared by every record with that layout instead of living in a hash table
+# per record. Distinct layouts get a class each up to MAX_RECORD_TYPES; past
+# that, records stay dicts.
+MAX_RECORD_TYPES = int(os.getenv("UNILOG_MAX_RECORD_TYPES", 1024))
+
+_MISSING = object()
+_record_types: Dict[Tuple[str, ...], type] = {}
+
+
+class CompactRecord(MutableMapping):
+    """
+    Base class of the per-layout record classes made by record_type(). Keys
+    outside the layout (e.g. "anomaly" added by ml/) go to a small overflow dict.
+    """
+    __slots__ = ("_extra",)
+    _fields: Tuple[str, ...] = ()
+    _slots: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        slot = self._slots.get(key)
+        if slot is not None:
+            value = slot.__get__(self)
+            if value is not _MISSING:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        slot = self._slots.get(key)
+        if slot is not None:
+            value = slot.__get__(self)
+            return default if value is _MISSING else value
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __contains__(self, key) -> bool:
+        slot = self._slots.get(key)
+        if slot is not None:
+            return slot.__get__(self) is not _MISSING
+        return self._extra is not None and key in self._extra
+
+    def __setitem__(self, key: str, value: Any):
+        slot = self._slots.get(key)
+        if slot is not None:
+            slot.__set__(self, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str):
+        slot = self._slots.get(key)
+        if slot is not None and slot.__get__(self) is not _MISSING:
+            slot.__set__(self, _MISSING)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for key, slot in self._slots.items():
+            if slot.__get__(self) is not _MISSING:
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {key: value for key, slot in self._slots.items()
+                if (value := slot.__get__(self)) is not _MISSING}
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def copy(self) -> "CompactRecord":
+        return _rebuild(self._fields, self._values(), self._extra)
+
+    def _values(self) -> tuple:
+        return tuple(slot.__get__(self) for slot in self._slots.values())
+
+    def __reduce__(self):
+        # Classes are made at runtime; pickle the layout and rebuild the class
+        return _rebuild, (self._fields, self._values(), self._extra)
+
+    def __repr__(self):
+        return f"CompactRecord({self.to_dict()!r})"
+
+
+def record_type(fields: Tuple[str, ...]) -> Optional[type]:
+    """
+    The CompactRecord class for records with exactly these fields, in this
+    order, or None once MAX_RECORD_TYPES layouts are in use.
+    """
+    cls = _record_types.get(fields)
+    if cls is None:
+        if len(_record_types) >= MAX_RECORD_TYPES:
+            return None
+        # Slots are positional, so field names need not be identifiers. The
+        # generated __init__ assigns them directly, like namedtuple's __new__.
+        slots = tuple(f"_{i}" for i in range(len(fields)))
+        source = (f"def __init__(self, {', '.join(slots)}):\n"
+                  + "".join(f"    self.{slot} = {slot}\n" for slot in slots)
+                  + "    self._extra = None\n")
+        namespace: Dict[str, Any] = {}
+        exec(source, namespace)
+        cls = type("CompactRecord", (CompactRecord,), {"__slots__": slots, "__init__": namespace["__init__"]})
+        cls._fields = fields
+        cls._slots = {field: getattr(cls, f"_{i}") for i, field in enumerate(fields)}
+        cls = _record_types.setdefault(fields, cls)
+    return cls
+
+
+def _rebuild(fields: Tuple[str, ...], values: tuple, extra: Optional[dict] = None):
+    cls = record_type(fields)
+    if cls is None:
+        record = {key: value for key, value in zip(fields, values) if value is not _MISSING}
+        record.update(extra or {})
+        return record
+    record = cls(*values)
+    if extra:
+        record._extra = dict(extra)
+    return record
+
+
+def compact(record: Optional[Mapping[str, Any]]) -> Optional[Mapping[str, Any]]:
+    """
+    ``record`` as a CompactRecord (a LazyRecord is decoded first); empty
+    records and records with an unseen layout past MAX_RECORD_TYPES are
+    returned as they are.
+    """
+    if not record or isinstance(record, CompactRecord):
+        return record
+    if isinstance(record, LazyRecord):
+        record = record.to_dict()
+    cls = record_type(tuple(record))
+    return record if cls is None else cls(*record.values())
+
+
+def materialize(record: Optional[Mapping[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    A plain dict for ``record`` (decoding every remaining field of a LazyRecord).
+    """
+    if isinstance(record, (LazyRecord, CompactRecord)):
+        return record.to_dict()
+    return record
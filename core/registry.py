@@ -0,0 +1,67 @@
+import importlib
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+def resolve(target: str) -> Any:
+    """
+    Import a "package.module:attr" path (or a bare module path) and return the object.
+    """
+    module_name, _, attr = target.partition(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, attr) if attr else module
+
+
+class LazyRegistry(MutableMapping):
+    """
+    Name -> plugin mapping whose entries can be "package.module:attr" import paths.
+
+    A path is only imported the first time its name is looked up, so listing a
+    plugin with heavy dependencies (pandas, boto3, scikit-learn...) costs nothing
+    until it is actually used. ``wrap`` is applied once to every object loaded
+    from a path (e.g. to instantiate a class); objects assigned directly are
+    stored as-is.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Any]] = None, wrap: Optional[Callable[[Any], Any]] = None):
+        self._entries: Dict[str, Any] = dict(entries or {})
+        self._loaded: Dict[str, Any] = {}
+        self._wrap = wrap
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return self._loaded[name]
+        except KeyError:
+            pass
+        entry = self._entries[name]
+        if isinstance(entry, str):
+            entry = resolve(entry)
+            if self._wrap is not None:
+                entry = self._wrap(entry)
+        self._loaded[name] = entry
+        return entry
+
+    def __setitem__(self, name: str, value: Any):
+        self._entries[name] = value
+        self._loaded.pop(name, None)
+
+    def __delitem__(self, name: str):
+        del self._entries[name]
+        self._loaded.pop(name, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, name) -> bool:
+        return name in self._entries
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._loaded
+
+    def copy(self) -> "LazyRegistry":
+        clone = LazyRegistry(self._entries, self._wrap)
+        clone._loaded = dict(self._loaded)
+        return clone
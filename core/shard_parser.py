@@ -0,0 +1,189 @@
+import io
+import multiprocessing
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from core import logger
+from core.logger import log
+from core.parser_manager import AUTO, ParserManager
+from core.filter import compile_rules
+from core.prefilter import build_prefilter
+from core.record import compact
+from core.compressed import gzip_shards, is_compressed, read_range
+from core import parse_failures
+
+# Process-pool parsing. Files are cut into shards of about SHARD_BYTES: large
+# files into byte ranges that start and end on line boundaries, small files
+# grouped together, compressed archives one per shard (BGZF gzip files split
+# at member boundaries, see core.compressed). Each worker reads, parses and
+# filters whole shards and sends back compact records plus its
+# parse_failures counters, which are merged into this process.
+
+SHARD_BYTES = int(os.getenv("UNILOG_SHARD_BYTES", 16 * 2**20))
+
+# (path, start, end, log_type); end is exclusive
+Range = Tuple[str, int, int, str]
+
+_worker: Dict[str, Any] = {}
+
+
+def _aligned(f, offset: int, size: int) -> int:
+    # First line start at or after ``offset``
+    if offset <= 0:
+        return 0
+    f.seek(offset - 1)
+    f.readline()
+    return min(f.tell(), size)
+
+
+def plan_shards(paths: Iterable[str], log_type: str = AUTO, shard_bytes: int = SHARD_BYTES,
+                parser_manager: Optional[ParserManager] = None,
+                spans: Optional[Dict[str, Tuple[int, int]]] = None) -> List[List[Range]]:
+    """
+    Split ``paths`` into shards of roughly ``shard_bytes``, in file order.
+    With ``log_type="auto"`` each file's type is detected here, once, so
+    every shard of a file uses the same parser. ``spans`` limits files to a
+    (start, end) byte range, both on line boundaries.
+    """
+    shard_bytes = max(1, shard_bytes)
+    shards: List[List[Range]] = []
+    group: List[Range] = []
+    group_bytes = 0
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+            first, size = spans[path] if spans and path in spans else (0, size)
+            if first >= size:
+                continue
+            file_type = parser_manager.detector.resolve_file(path) if log_type == AUTO else log_type
+        except OSError as e:
+            log(f"Cannot read {path}: {e}", level="ERROR")
+            continue
+        if is_compressed(path):
+            if group:
+                shards.append(group)
+                group, group_bytes = [], 0
+            ranges = gzip_shards(path, shard_bytes) if path.lower().endswith(".gz") else None
+            for start, end in ranges or [(first, size)]:
+                if start >= first:
+                    shards.append([(path, start, end, file_type)])
+            continue
+        if size - first <= shard_bytes:
+            group.append((path, first, size, file_type))
+            group_bytes += size - first
+            if group_bytes >= shard_bytes:
+                shards.append(group)
+                group, group_bytes = [], 0
+            continue
+        if group:
+            # Keep shards in file order
+            shards.append(group)
+            group, group_bytes = [], 0
+        with open(path, "rb") as f:
+            start = first
+            while start < size:
+                end = _aligned(f, start + shard_bytes, size)
+                shards.append([(path, start, end, file_type)])
+                start = end
+    if group:
+        shards.append(group)
+    return shards
+
+
+def _init_worker(parsers: Dict[str, Any], rules):
+    manager = ParserManager()
+    for name, parser in parsers.items():
+        manager.parsers[name] = parser
+    record_filter = None if rules is None else compile_rules(rules)
+    _worker.update(manager=manager, record_filter=record_filter, prefilters={})
+    # The parent reports merged counters; workers only collect them
+    parse_failures.REPORT_INTERVAL = float("inf")
+
+
+def _parse_range(manager: ParserManager, record_filter, prefilters: dict, entry: Range) -> List:
+    path, start, end, log_type = entry
+    data = read_range(path, start, end)
+    parser = manager.get(log_type)
+    with parse_failures.source(path):
+        if record_filter is None and hasattr(parser, "parse_buffer"):
+            # NDJSON: decode the whole range in one go
+            return list(map(compact, parser.parse_buffer(data, offset=start)))
+        lines = io.BytesIO(data).readlines()
+        if record_filter is None:
+            return list(map(compact, manager.parse_batch(log_type, lines)))
+        if log_type not in prefilters:
+            prefilters[log_type] = build_prefilter(record_filter, manager.verbatim_fields(log_type))
+        prefilter = prefilters[log_type]
+        if prefilter is not None:
+            lines = prefilter.filter_lines(lines, log_type)
+        return [compact(record) for record in record_filter.filter_batch(manager.parse_batch(log_type, lines))]
+
+
+def _parse_entries(manager: ParserManager, record_filter, prefilters: dict,
+                   shard: List[Range]) -> Tuple[List, List[bool]]:
+    # Records of a shard, and whether each of its ranges parsed without an error
+    records, ok = [], []
+    for entry in shard:
+        try:
+            records.extend(_parse_range(manager, record_filter, prefilters, entry))
+            ok.append(True)
+        except Exception as e:
+            log(f"Error parsing {entry[0]} [{entry[1]}:{entry[2]}]: {e}", level="ERROR")
+            ok.append(False)
+    return records, ok
+
+
+def _parse_shard(task: Tuple[int, List[Range]]) -> Tuple[int, List, List[bool], List[Dict]]:
+    index, shard = task
+    parse_failures.reset()
+    records, ok = _parse_entries(_worker["manager"], _worker["record_filter"], _worker["prefilters"], shard)
+    # Pool workers are terminated rather than exited, so atexit never drains the log
+    logger.flush()
+    return index, records, ok, parse_failures.get_stats()
+
+
+def parse_files(paths: Iterable[str], log_type: str, jobs: int = 1,
+                rules: Optional[Union[List[Dict], str]] = None, ordered: bool = True,
+                parser_manager: Optional[ParserManager] = None,
+                shard_bytes: int = SHARD_BYTES) -> Iterator[List]:
+    """
+    Parse (and, given ``rules``, filter) ``paths`` with ``jobs`` processes,
+    yielding one list of compact records per shard. With ``ordered`` the
+    lists come in file/line order, otherwise as soon as each shard is done.
+    Parsers registered on ``parser_manager`` are sent to the workers, so
+    they have to be picklable.
+    """
+    parser_manager = parser_manager or ParserManager()
+    shards = plan_shards(paths, log_type, shard_bytes, parser_manager)
+    for _, records, _ in parse_shards(shards, jobs, rules, ordered, parser_manager):
+        yield records
+
+
+def parse_shards(shards: List[List[Range]], jobs: int = 1, rules: Optional[Union[List[Dict], str]] = None,
+                 ordered: bool = True, parser_manager: Optional[ParserManager] = None
+                 ) -> Iterator[Tuple[List[Range], List, List[bool]]]:
+    """
+    parse_files over shards from plan_shards, yielding (shard, records, ok)
+    where ``ok[i]`` says whether ``shard[i]`` parsed without an error (a
+    failed range may have contributed no records, or only some).
+    """
+    if not shards:
+        return
+    parser_manager = parser_manager or ParserManager()
+    types = {entry[3] for shard in shards for entry in shard}
+    parsers = {name: parser_manager.get(name) for name in types}
+    jobs = max(1, min(jobs, len(shards)))
+
+    if jobs == 1:
+        record_filter = None if rules is None else compile_rules(rules)
+        prefilters = {}
+        for shard in shards:
+            records, ok = _parse_entries(parser_manager, record_filter, prefilters, shard)
+            yield shard, records, ok
+        return
+
+    log(f"Parsing {len(shards)} shards with {jobs} processes")
+    with multiprocessing.Pool(jobs, _init_worker, (parsers, rules)) as pool:
+        results = (pool.imap if ordered else pool.imap_unordered)(_parse_shard, enumerate(shards))
+        for index, records, ok, stats in results:
+            parse_failures.merge(stats)
+            yield shards[index], records, ok
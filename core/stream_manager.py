@@ -1,54 +1,209 @@
+import os
 import threading
 import queue
-from typing import Callable, List, Dict, Optional
+import time
+from collections import deque
+from typing import Callable, List, Dict, Optional, Tuple, Union
 from core.logger import log
 from core.parser_manager import ParserManager
-from core.filter import apply_filter
-from core.output_manager import OutputManager
+from core.filter import compile_rules
+from core.prefilter import build_prefilter
+from core.record import materialize
+from core.output_manager import OutputManager, close as close_outputs
+from core.bounded_queue import QUEUE_POLICY, QUEUE_TIMEOUT, BoundedQueue
+
+# Workers take lines off the queue in micro-batches, which are parsed,
+# filtered and written out together. A batch is closed at BATCH_RECORDS
+# lines, BATCH_BYTES of line data or BATCH_LINGER_SECONDS after its first
+# line, whichever comes first.
+BATCH_RECORDS = int(os.getenv("UNILOG_STREAM_BATCH_RECORDS", 1000))
+BATCH_BYTES = int(os.getenv("UNILOG_STREAM_BATCH_BYTES", 2**20))
+BATCH_LINGER_SECONDS = float(os.getenv("UNILOG_STREAM_LINGER_SECONDS", 0.05))
+# Capacity of the line queue, in lines and in bytes of line data (0 for no
+# limit). What enqueue() does when it is full is the queue policy (see
+# core.bounded_queue, UNILOG_QUEUE_POLICY).
+QUEUE_RECORDS = int(os.getenv("UNILOG_STREAM_QUEUE_RECORDS", 100_000))
+QUEUE_BYTES = int(os.getenv("UNILOG_STREAM_QUEUE_BYTES", 64 * 2**20))
+# Latest batch latencies kept for the percentiles in BatchStats.to_dict
+LATENCY_SAMPLES = 1024
+
+
+class BatchStats:
+    """
+    Counters for the batches a StreamManager has processed. Latency runs
+    from the first line of a batch being dequeued to its output returning.
+    """
+
+    def __init__(self):
+        self.batches = 0
+        self.lines = 0
+        self.bytes = 0
+        self.records = 0
+        self.max_lines = 0
+        # Why batches were closed: "records", "bytes" or "linger"
+        self.closed_by: Dict[str, int] = {}
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    def add(self, lines: int, size: int, records: int, reason: str, latency: float):
+        with self._lock:
+            self.batches += 1
+            self.lines += lines
+            self.bytes += size
+            self.records += records
+            self.max_lines = max(self.max_lines, lines)
+            self.closed_by[reason] = self.closed_by.get(reason, 0) + 1
+            self.latencies.append(latency)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            stats = {
+                "batches": self.batches,
+                "lines": self.lines,
+                "bytes": self.bytes,
+                "records": self.records,
+                "mean_lines": self.lines / self.batches if self.batches else 0.0,
+                "max_lines": self.max_lines,
+                "closed_by": dict(self.closed_by),
+            }
+        for name, quantile in (("p50", 0.5), ("p99", 0.99), ("max", 1.0)):
+            stats[f"latency_{name}_ms"] = (
+                latencies[min(len(latencies) - 1, int(len(latencies) * quantile))] * 1000 if latencies else None)
+        return stats
+
 
 class StreamManager:
     def __init__(
         self,
         parser_manager: Optional[ParserManager] = None,
         output_manager: Optional[OutputManager] = None,
-        filters: Optional[List[Dict]] = None,
+        filters: Optional[Union[List[Dict], str]] = None,
         num_worker_threads: int = 4,
+        batch_records: int = BATCH_RECORDS,
+        batch_bytes: int = BATCH_BYTES,
+        linger: float = BATCH_LINGER_SECONDS,
+        queue_records: int = QUEUE_RECORDS,
+        queue_bytes: int = QUEUE_BYTES,
+        queue_policy: str = QUEUE_POLICY,
+        queue_timeout: float = QUEUE_TIMEOUT,
     ):
         self.parser_manager = parser_manager or ParserManager()
         self.output_manager = output_manager or OutputManager()
         self.filters = filters or []
-        self.queue = queue.Queue()
+        self.record_filter = compile_rules(self.filters)
+        # Raw-line prefilter per log type, built on first use
+        self._prefilters = {}
+        # Items are (log_type, line); only the line counts towards queue_bytes
+        self.queue = BoundedQueue(queue_records, queue_bytes, queue_policy, queue_timeout,
+                                  size=lambda item: len(item[1]))
         self.num_worker_threads = num_worker_threads
+        self.batch_records = max(1, batch_records)
+        self.batch_bytes = max(1, batch_bytes)
+        self.linger = linger
+        self.stats = BatchStats()
         self.workers = []
         self.running = False
 
-    def enqueue(self, log_type: str, line: str):
-        self.queue.put((log_type, line))
+    def enqueue(self, log_type: str, line: str, policy: Optional[str] = None,
+                timeout: Optional[float] = None) -> bool:
+        """
+        Queue a line for the workers. Returns False if it was dropped because
+        the queue was full (see core.bounded_queue for the policies).
+        """
+        return self.queue.offer((log_type, line), policy, timeout)
 
-    def _worker(self):
-        while self.running:
+    def _prefilter(self, log_type: str):
+        if log_type not in self._prefilters:
+            fields = self.parser_manager.verbatim_fields(log_type)
+            self._prefilters[log_type] = build_prefilter(self.record_filter, fields)
+        return self._prefilters[log_type]
+
+    def _next_batch(self) -> Tuple[List[Tuple[str, str]], int, str, float]:
+        """
+        (items, line bytes, reason closed, time started) for the next
+        micro-batch; no items if nothing arrived within a second.
+        """
+        try:
+            items = [self.queue.get(timeout=1)]
+        except queue.Empty:
+            return [], 0, "idle", 0.0
+        started = time.perf_counter()
+        deadline = started + self.linger
+        size = len(items[0][1])
+        while True:
+            if len(items) >= self.batch_records:
+                return items, size, "records", started
+            if size >= self.batch_bytes:
+                return items, size, "bytes", started
             try:
-                log_type, line = self.queue.get(timeout=1)
+                item = self.queue.get_nowait()
             except queue.Empty:
-                continue
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not self.running:
+                    return items, size, "linger", started
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    return items, size, "linger", started
+            items.append(item)
+            size += len(item[1])
 
-            # Parse
-            parsed = self.parser_manager.parse(log_type, line)
-            if not parsed:
-                self.queue.task_done()
-                continue
+    def process_batch(self, items: List[Tuple[str, str]]) -> int:
+        """
+        Parse, filter and write out a batch of (log_type, line) items in one
+        output call. Returns the number of records written.
+        """
+        by_type: Dict[str, List] = {}
+        for log_type, line in items:
+            by_type.setdefault(log_type, []).append(line)
+        records = []
+        for log_type, lines in by_type.items():
+            # Skip lines the filter would reject without parsing them
+            prefilter = self._prefilter(log_type)
+            if prefilter is not None:
+                lines = prefilter.filter_lines(lines, log_type)
+            for record in self.parser_manager.parse_batch(log_type, lines):
+                # A record the filter chokes on is dropped on its own, not with its batch
+                try:
+                    filtered = self.record_filter(record)
+                except Exception as e:
+                    log(f"Error filtering record: {record} | Exception: {e}")
+                    continue
+                if filtered:
+                    records.append(materialize(filtered))
+        if records:
+            self.output_manager.write(records)
+        return len(records)
 
-            # Filter
-            filtered = apply_filter(parsed, self.filters)
-            if not filtered:
-                self.queue.task_done()
+    def _worker(self):
+        while self.running:
+            items, size, reason, started = self._next_batch()
+            if not items:
                 continue
+            records = 0
+            try:
+                records = self.process_batch(items)
+            except Exception as e:
+                log(f"Failed to process a batch of {len(items)} lines: {e}", level="ERROR")
+            finally:
+                self.stats.add(len(items), size, records, reason, time.perf_counter() - started)
+                for _ in items:
+                    self.queue.task_done()
 
-            # Output
-            self.output_manager.write([filtered])
-            self.queue.task_done()
+    def get_stats(self) -> Dict:
+        """
+        Batch size and latency statistics (see BatchStats), with the queue's
+        counters under "queue".
+        """
+        stats = self.stats.to_dict()
+        stats["queue"] = self.queue.get_stats()
+        return stats
 
     def start(self):
+        # Pick up any filter changes made since construction
+        self.record_filter = compile_rules(self.filters)
+        self._prefilters = {}
         self.running = True
         for _ in range(self.num_worker_threads):
             t = threading.Thread(target=self._worker, daemon=True)
@@ -60,6 +215,7 @@ class StreamManager:
         self.running = False
         for t in self.workers:
             t.join(timeout=2)
+        close_outputs()
         log("Stopped all worker threads for streaming.")
 
     def wait_for_completion(self):
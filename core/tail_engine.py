@@ -0,0 +1,307 @@
+import io
+import os
+import select
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from core.logger import log
+from core.checkpoints import CheckpointStore
+from core.inotify import (Inotify, IN_DELETE_SELF, IN_IGNORED, IN_MOVE_SELF, IN_Q_OVERFLOW)
+
+# Follows many growing log files on a single loop. Each file stays open and
+# is read only when inotify reports a change in its directory (or, without
+# inotify, every poll interval). Only complete lines are returned; a
+# trailing partial line is kept until its newline arrives. A file replaced
+# at its path (rename + create rotation) is detected by inode: the old one
+# is read for ROTATE_GRACE_SECONDS more, for lines its writer hadn't flushed
+# yet, while the new one is read from the start. A file that shrinks
+# (copytruncate) is read again from the start.
+#
+# Positions are saved in a checkpoint file (core.checkpoints) once the lines
+# before them have been handled, so a restart resumes where the last run left off.
+
+TAIL_CHECKPOINT_FILE = os.getenv("UNILOG_TAIL_CHECKPOINT_FILE", "./data/tail_checkpoints.json")
+# Most bytes read from one file per step, so a backlog doesn't hold up the other files
+TAIL_READ_BYTES = int(os.getenv("UNILOG_TAIL_READ_BYTES", 2**20))
+ROTATE_GRACE_SECONDS = float(os.getenv("UNILOG_ROTATE_GRACE_SECONDS", 5.0))
+# With inotify every file is still checked this often, for changes it can't see (e.g. NFS)
+RESCAN_SECONDS = float(os.getenv("UNILOG_TAIL_RESCAN_SECONDS", 10.0))
+# Least time between checkpoint file writes
+CHECKPOINT_SECONDS = float(os.getenv("UNILOG_TAIL_CHECKPOINT_SECONDS", 1.0))
+
+# (path, complete lines)
+Batch = Tuple[str, List[bytes]]
+
+
+class TailedFile:
+    """
+    An open file being followed. ``position`` is just past the last line
+    handed out; ``partial`` holds the bytes read after it.
+    """
+    __slots__ = ("path", "f", "key", "position", "partial", "rotated_at")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.f = None
+        self.key: Optional[Tuple[int, int]] = None
+        self.position = 0
+        self.partial = b""
+        self.rotated_at = 0.0
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+
+def _raise_open_files(wanted: int):
+    # Every tailed file holds a descriptor; the common soft limit is 1024
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY and soft < wanted:
+            limit = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+    except (ImportError, ValueError, OSError) as e:
+        log(f"Could not raise the open file limit to {wanted}: {e}", level="WARNING")
+
+
+class TailEngine:
+    """
+    Tails ``paths``: each poll() waits for changes and returns the new
+    complete lines per file. Call commit() once those lines have been
+    output, to checkpoint them.
+    """
+
+    def __init__(self, paths: Iterable[str], checkpoint_file: Optional[str] = TAIL_CHECKPOINT_FILE,
+                 poll_interval: float = 1.0, use_inotify: bool = True):
+        self.poll_interval = poll_interval
+        self.checkpoints = CheckpointStore(checkpoint_file) if checkpoint_file else None
+        self.files: Dict[str, TailedFile] = {}
+        # Files rotated away from their path, still read for a while
+        self.rotated: List[TailedFile] = []
+        self.dirty: Set[str] = set()
+        # Offsets reached by the lines handed out since the last commit, and
+        # those confirmed as output but not saved yet
+        self.pending: Dict[TailedFile, int] = {}
+        self.confirmed: Dict[TailedFile, int] = {}
+        self.inotify = Inotify.create() if use_inotify else None
+        if use_inotify and self.inotify is None:
+            log(f"inotify is not available, polling files every {poll_interval}s", level="WARNING")
+        # Watched directory per watch descriptor, and the tailed paths per directory by name
+        self.watches: Dict[int, str] = {}
+        self.directories: Dict[str, Dict[str, str]] = {}
+        self.next_scan = 0.0
+        self.last_save = 0.0
+        paths = list(paths)
+        _raise_open_files(len(paths) + 256)
+        for path in paths:
+            self.add(path)
+
+    def add(self, path: str):
+        path = str(path)
+        if path in self.files:
+            return
+        directory, name = os.path.split(os.path.abspath(path))
+        self.files[path] = TailedFile(path)
+        self.directories.setdefault(directory, {})[name] = path
+        self._watch(directory)
+        self._open(self.files[path])
+        self.dirty.add(path)
+
+    def _watch(self, directory: str):
+        if self.inotify is None or directory in self.watches.values():
+            return
+        try:
+            self.watches[self.inotify.add_watch(directory)] = directory
+        except OSError as e:
+            # Tried again on the next rescan
+            log(f"Cannot watch {directory}: {e}", level="WARNING")
+
+    def _open(self, tailed: TailedFile) -> bool:
+        try:
+            f = open(tailed.path, "rb")
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            log(f"Cannot open {tailed.path}: {e}", level="ERROR")
+            return False
+        start = self.checkpoints.span(tailed.path, f)[0] if self.checkpoints is not None else 0
+        f.seek(start)
+        stat = os.fstat(f.fileno())
+        tailed.f, tailed.key = f, (stat.st_dev, stat.st_ino)
+        tailed.position, tailed.partial = start, b""
+        return True
+
+    def _read(self, tailed: TailedFile) -> List[bytes]:
+        if tailed.f is None and not self._open(tailed):
+            return []
+        f = tailed.f
+        if os.fstat(f.fileno()).st_size < tailed.position + len(tailed.partial):
+            log(f"{tailed.path} was truncated, reading it from the start", level="WARNING")
+            f.seek(0)
+            tailed.position, tailed.partial = 0, b""
+        data = f.read(TAIL_READ_BYTES)
+        if len(data) == TAIL_READ_BYTES:
+            self.dirty.add(tailed.path)
+        if not data:
+            return []
+        data = tailed.partial + data
+        cut = data.rfind(b"\n") + 1
+        tailed.partial = data[cut:]
+        if not cut:
+            return []
+        tailed.position += cut
+        self.pending[tailed] = tailed.position
+        return io.BytesIO(data[:cut]).readlines()
+
+    def _follow(self, tailed: TailedFile) -> List[bytes]:
+        # New lines of the file at tailed.path, switching to a new file after rotation
+        if tailed.f is None:
+            return self._read(tailed)
+        try:
+            stat = os.stat(tailed.path)
+        except FileNotFoundError:
+            # Moved or deleted; what is left can still be read through the open file
+            return self._read(tailed)
+        if (stat.st_dev, stat.st_ino) == tailed.key:
+            return self._read(tailed)
+        lines = self._read(tailed)
+        log(f"{tailed.path} was rotated, following the new file")
+        tailed.rotated_at = time.monotonic()
+        self.rotated.append(tailed)
+        current = self.files[tailed.path] = TailedFile(tailed.path)
+        self._open(current)
+        return lines + self._read(current)
+
+    def _drain_rotated(self, now: float) -> List[Batch]:
+        batches = []
+        for tailed in list(self.rotated):
+            lines = self._read(tailed)
+            if now - tailed.rotated_at >= ROTATE_GRACE_SECONDS and not lines:
+                if tailed.partial:
+                    # Nothing more is coming; hand out the unterminated last line
+                    lines.append(tailed.partial)
+                    tailed.position += len(tailed.partial)
+                    tailed.partial = b""
+                    self.pending[tailed] = tailed.position
+                self.rotated.remove(tailed)
+                if tailed not in self.pending and tailed not in self.confirmed:
+                    tailed.close()
+            if lines:
+                batches.append((tailed.path, lines))
+        return batches
+
+    def _wait(self, timeout: float):
+        # Block until inotify reports a change to a tailed file, or ``timeout``
+        if self.inotify is None:
+            time.sleep(max(0.0, min(timeout, self.next_scan - time.monotonic())))
+            return
+        readable, _, _ = select.select([self.inotify.fd], [], [], timeout)
+        if not readable:
+            return
+        for wd, mask, name in self.inotify.read():
+            if mask & IN_Q_OVERFLOW:
+                self.dirty.update(self.files)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                # The directory itself went away; watched again on the next rescan
+                self.watches.pop(wd, None)
+                self.dirty.update(self.directories[directory].values())
+                continue
+            path = self.directories[directory].get(name)
+            if path is not None:
+                self.dirty.add(path)
+
+    def poll(self, timeout: Optional[float] = None) -> List[Batch]:
+        """
+        Wait up to ``timeout`` (default poll_interval) seconds for changes
+        and return the new complete lines of every file that changed.
+        """
+        timeout = self.poll_interval if timeout is None else timeout
+        if self.rotated:
+            timeout = min(timeout, 0.25)
+        if not self.dirty:
+            self._wait(timeout)
+        now = time.monotonic()
+        if now >= self.next_scan:
+            self.next_scan = now + (self.poll_interval if self.inotify is None else RESCAN_SECONDS)
+            self.dirty.update(self.files)
+            for directory in self.directories:
+                self._watch(directory)
+        dirty, self.dirty = self.dirty, set()
+        batches = []
+        for path in dirty:
+            lines = self._follow(self.files[path])
+            if lines:
+                batches.append((path, lines))
+        if self.rotated:
+            batches.extend(self._drain_rotated(now))
+        return batches
+
+    def read(self, path: str) -> List[bytes]:
+        """
+        New complete lines of one file, read right away.
+        """
+        self.add(path)
+        self.dirty.discard(str(path))
+        return self._follow(self.files[str(path)])
+
+    def commit(self, force: bool = False, save: bool = True):
+        """
+        Confirm that the lines handed out so far have been output, and
+        checkpoint them (written at most every CHECKPOINT_SECONDS unless
+        ``force``). With ``save=False`` they are only confirmed, for a later
+        commit() to checkpoint.
+        """
+        self.confirmed.update(self.pending)
+        self.pending = {}
+        if not save:
+            return
+        if self.checkpoints is None:
+            self._release()
+            return
+        now = time.monotonic()
+        if not self.confirmed or (not force and now - self.last_save < CHECKPOINT_SECONDS):
+            return
+        for tailed, offset in self.confirmed.items():
+            try:
+                if tailed.f is not None:
+                    self.checkpoints.commit(tailed.path, offset, tailed.f)
+            except OSError as e:
+                log(f"Could not checkpoint {tailed.path}: {e}", level="WARNING")
+        self.checkpoints.save()
+        self.last_save = now
+        self._release()
+
+    def discard(self):
+        """
+        Forget the positions of lines handed out but not confirmed with
+        commit(), e.g. because they failed to be output.
+        """
+        pending, self.pending = self.pending, {}
+        self._close_untracked(tailed for tailed in pending if tailed not in self.confirmed)
+
+    def _release(self):
+        confirmed, self.confirmed = self.confirmed, {}
+        self._close_untracked(tailed for tailed in confirmed if tailed not in self.pending)
+
+    def _close_untracked(self, files: Iterable[TailedFile]):
+        # Close rotated files that were only kept open for their checkpoint
+        for tailed in files:
+            if tailed not in self.rotated and self.files.get(tailed.path) is not tailed:
+                tailed.close()
+
+    def close(self):
+        for tailed in list(self.files.values()) + self.rotated:
+            tailed.close()
+        if self.inotify is not None:
+            self.inotify.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
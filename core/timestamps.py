@@ -0,0 +1,219 @@
+import calendar
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Union
+
+# Timestamp decoding shared by the parsers. Each layout has a fixed-position
+# decoder for the common case and falls back to strptime/fromisoformat for
+# anything else, so results match the library functions. Decoded values are
+# memoized on the raw string: access logs repeat the same second many times.
+
+# "iso" (datetime.isoformat() strings) or "epoch" (integer seconds)
+OUTPUT_FORMATS = ("iso", "epoch")
+OUTPUT = os.getenv("UNILOG_TIMESTAMP_OUTPUT", "iso")
+# Entries per memo; a full memo is cleared rather than evicted entry by entry
+MEMO_SIZE = int(os.getenv("UNILOG_TIMESTAMP_MEMO_SIZE", 4096))
+
+CLF_FORMAT = "%d/%b/%Y:%H:%M:%S %z"
+RFC3164_FORMAT = "%b %d %Y %H:%M:%S"
+
+_MONTHS = {name: number for number, name in enumerate(calendar.month_abbr) if name}
+_OFFSETS: Dict[str, timezone] = {}
+_MISSING = object()
+_memos: List[dict] = []
+
+Timestamp = Union[str, int]
+
+
+def set_output(output: str):
+    """
+    Switch between ISO strings and epoch seconds for every decoder.
+    """
+    global OUTPUT
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown timestamp output {output!r}, expected one of {OUTPUT_FORMATS}")
+    OUTPUT = output
+    clear_memos()
+
+
+def clear_memos():
+    for memo in _memos:
+        memo.clear()
+
+
+def _emit(dt: datetime) -> Timestamp:
+    if OUTPUT == "epoch":
+        # Naive timestamps (RFC 3164) are taken to be UTC
+        if dt.tzinfo is None:
+            return calendar.timegm(dt.timetuple())
+        return int(dt.timestamp())
+    return dt.isoformat()
+
+
+def _memoized(decode: Callable[[Any], Optional[Timestamp]]) -> Callable[[Any], Optional[Timestamp]]:
+    memo = {}
+    _memos.append(memo)
+
+    def cached(text):
+        value = memo.get(text, _MISSING)
+        if value is _MISSING:
+            value = decode(text)
+            if len(memo) >= MEMO_SIZE:
+                memo.clear()
+            memo[text] = value
+        return value
+
+    cached.__doc__ = decode.__doc__
+    cached.memo = memo
+    return cached
+
+
+def _offset(text: str) -> Optional[timezone]:
+    # "+HHMM"/"-HHMM" only; anything else goes through strptime
+    tz = _OFFSETS.get(text)
+    if tz is None:
+        if len(text) != 5 or text[0] not in "+-" or not (text[1:].isascii() and text[1:].isdigit()):
+            return None
+        hours, minutes = int(text[1:3]), int(text[3:5])
+        if hours > 23 or minutes > 59:
+            return None
+        delta = timedelta(hours=hours, minutes=minutes)
+        tz = _OFFSETS[text] = timezone(-delta if text[0] == "-" else delta)
+    return tz
+
+
+def _decode_clf(text: str) -> Optional[Timestamp]:
+    """
+    Decode a Common Log Format time such as "10/Oct/2000:13:55:36 -0700".
+    """
+    if (len(text) == 26 and text[2] == "/" and text[6] == "/" and text[11] == ":"
+            and text[14] == ":" and text[17] == ":" and text[20] == " "):
+        digits = text[0:2] + text[7:11] + text[12:14] + text[15:17] + text[18:20]
+        month = _MONTHS.get(text[3:6])
+        tz = _offset(text[21:26])
+        if month and tz is not None and digits.isascii() and digits.isdigit():
+            try:
+                dt = datetime(int(text[7:11]), month, int(text[0:2]), int(text[12:14]),
+                              int(text[15:17]), int(text[18:20]), tzinfo=tz)
+            except ValueError:
+                return None
+            return _emit(dt)
+    try:
+        return _emit(datetime.strptime(text, CLF_FORMAT))
+    except (TypeError, ValueError):
+        return None
+
+
+parse_clf = _memoized(_decode_clf)
+
+
+# Year for RFC 3164 timestamps, which don't carry one: (valid until, year)
+_year: tuple = (float("-inf"), 0)
+
+
+def current_year() -> int:
+    """
+    The current UTC year, looked up at most once a minute.
+    """
+    global _year
+    now = time.time()
+    if now >= _year[0]:
+        year = datetime.utcfromtimestamp(now).year
+        if year != _year[1]:
+            _parse_rfc3164.memo.clear()
+        _year = (now + 60, year)
+    return _year[1]
+
+
+def _decode_rfc3164(text: str) -> Optional[Timestamp]:
+    """
+    Decode an RFC 3164 "Mmm dd hh:mm:ss" time in the current year.
+    """
+    year = current_year()
+    month_name, _, rest = text.partition(" ")
+    day, _, clock = rest.partition(" ")
+    month = _MONTHS.get(month_name)
+    digits = day + clock[0:2] + clock[3:5] + clock[6:8]
+    if (month and len(clock) == 8 and clock[2] == ":" and clock[5] == ":" and 1 <= len(day) <= 2
+            and digits.isascii() and digits.isdigit()):
+        try:
+            dt = datetime(year, month, int(day), int(clock[0:2]), int(clock[3:5]), int(clock[6:8]))
+        except ValueError:
+            return None
+        return _emit(dt)
+    try:
+        return _emit(datetime.strptime(f"{month_name} {day} {year} {clock}", RFC3164_FORMAT))
+    except ValueError:
+        return None
+
+
+_parse_rfc3164 = _memoized(_decode_rfc3164)
+
+
+def parse_rfc3164(month: str, day: str, clock: str) -> Optional[Timestamp]:
+    """
+    Decode the month, day and time fields of an RFC 3164 syslog header.
+    """
+    # Refresh the year (and drop memoized values from the previous one) first
+    current_year()
+    return _parse_rfc3164(f"{month} {day} {clock}")
+
+
+def _decode_rfc3339(text: str) -> Optional[Timestamp]:
+    """
+    Decode an RFC 3339 / ISO 8601 time such as "2025-09-14T22:14:15.003Z".
+    """
+    # datetime.fromisoformat is already a C fixed-layout decoder; it only
+    # needs "Z" spelled as an offset on Python < 3.11
+    if text[-1:] in ("Z", "z"):
+        text = text[:-1] + "+00:00"
+    try:
+        return _emit(datetime.fromisoformat(text))
+    except (TypeError, ValueError):
+        return None
+
+
+parse_rfc3339 = _memoized(_decode_rfc3339)
+
+
+def _decode_epoch(value) -> Optional[Timestamp]:
+    """
+    Decode Unix time in seconds, milliseconds, microseconds or nanoseconds
+    (told apart by magnitude), as a number or a numeric string.
+    """
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    magnitude = abs(seconds)
+    if magnitude >= 1e17:
+        seconds /= 1e9
+    elif magnitude >= 1e14:
+        seconds /= 1e6
+    elif magnitude >= 1e11:
+        seconds /= 1e3
+    try:
+        dt = datetime.fromtimestamp(seconds, timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        return None
+    return _emit(dt)
+
+
+parse_epoch = _memoized(_decode_epoch)
+
+
+def normalize(value: Any) -> Any:
+    """
+    Decode a timestamp of unknown layout (RFC 3339 string or epoch number),
+    returning ``value`` unchanged if it is neither.
+    """
+    if isinstance(value, str):
+        decoded = parse_rfc3339(value)
+        if decoded is None and value.replace(".", "", 1).isdigit():
+            decoded = parse_epoch(value)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        decoded = parse_epoch(value)
+    else:
+        return value
+    return value if decoded is None else decoded
@@ -4,6 +4,8 @@ from fastapi.staticfiles import StaticFiles
 import asyncio
 from typing import List, Dict
 from core.stream_manager import StreamManager
+from core import parse_failures
+from core.record import compact, materialize
 
 app = FastAPI(title="Unilog Dashboard")
 
@@ -80,6 +82,12 @@ async def get_dashboard():
     return HTMLResponse(content=html_content)
 
 
+@app.get("/stats/parsers")
+async def get_parser_stats():
+    """Per-parser, per-source match counts and sample bad lines."""
+    return {"match_rate": parse_failures.match_rate(), "parsers": parse_failures.get_stats()}
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
@@ -89,9 +97,9 @@ async def websocket_endpoint(websocket: WebSocket):
             continue
         while logs:
             log_entry = logs.pop(0)
-            await websocket.send_json(log_entry)
+            await websocket.send_json(materialize(log_entry))
         await asyncio.sleep(0.1)
 
 
 def push_log(log_entry: Dict):
-    logs.append(log_entry)
+    logs.append(compact(log_entry))
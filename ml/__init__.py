@@ -0,0 +1,7 @@
+from core.registry import LazyRegistry
+
+# scikit-learn is only imported when a model is first requested
+ML_MODELS = LazyRegistry({
+    "anomaly": "ml.anomaly_detection:AnomalyDetector",
+    "clustering": "ml.clustering:LogClustering",
+})
@@ -57,3 +57,10 @@ class CSVOutput:
                     **data
                 })
         return logs
+
+
+def write(records: List[Dict], path: str):
+    """
+    Append records to the CSV file at ``path``. Entry point used by core.output_manager.
+    """
+    CSVOutput(os.path.dirname(path) or ".", os.path.basename(path)).write_logs(records)
@@ -15,9 +15,9 @@ class ElasticOutput:
             self.client.indices.create(index=self.index_name)
             log(f"Elasticsearch index created: {self.index_name}")
 
-    def write_logs(self, logs: List[Dict]):
+    def write_logs(self, logs: List[Dict]) -> bool:
         if not logs:
-            return
+            return True
 
         actions = []
         for log_entry in logs:
@@ -35,8 +35,10 @@ class ElasticOutput:
         try:
             helpers.bulk(self.client, actions)
             log(f"Bulk indexed {len(logs)} logs to Elasticsearch index {self.index_name}")
+            return True
         except Exception as e:
             log(f"Error writing logs to Elasticsearch: {e}", level="ERROR")
+            return False
 
     def stream_log(self, log_entry: Dict):
         self.write_logs([log_entry])
@@ -50,3 +52,11 @@ class ElasticOutput:
         except Exception as e:
             log(f"Error searching logs in Elasticsearch: {e}", level="ERROR")
             return []
+
+
+def write(records: List[Dict]):
+    """
+    Bulk index records into today's index. Entry point used by core.output_manager.
+    """
+    if not ElasticOutput().write_logs(records):
+        raise IOError("Elasticsearch bulk indexing failed")
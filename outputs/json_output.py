@@ -3,6 +3,7 @@ import os
 from typing import List, Dict
 from datetime import datetime
 from core.logger import log
+from core.record import materialize
 
 class JSONOutput:
     def __init__(self, output_dir: str = "logs/json", filename: str = None):
@@ -22,13 +23,41 @@ class JSONOutput:
         if not logs:
             return
 
-        existing_logs = self.read_logs()
-        existing_logs.extend(logs)
-
-        with open(self.filepath, 'w', encoding='utf-8') as f:
-            json.dump(existing_logs, f, indent=4)
+        # Splice the new entries in before the closing "]" instead of loading
+        # and rewriting the whole array; the result is what json.dump would write
+        entries = json.dumps(list(map(materialize, logs)), indent=4)[2:-2]
+        with open(self.filepath, 'rb+') as f:
+            end = self._array_end(f)
+            if end is None:
+                log(f"JSON file at {self.filepath} is not a JSON array, rewriting it", level="ERROR")
+                f.seek(0)
+                f.truncate()
+                f.write(f"[\n{entries}\n]".encode("utf-8"))
+            else:
+                close, empty = end
+                f.seek(close)
+                f.truncate()
+                f.write(f"{'' if empty else ','}\n{entries}\n]".encode("utf-8"))
         log(f"Wrote {len(logs)} logs to JSON at {self.filepath}")
 
+    @staticmethod
+    def _array_end(f, window: int = 4096):
+        """
+        (offset of the last element's end, whether the array is empty) for a
+        file holding a JSON array, or None if it doesn't end like one.
+        """
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - window))
+        tail = f.read()
+        stripped = tail.rstrip()
+        if not stripped.endswith(b"]"):
+            return None
+        body = stripped[:-1].rstrip()
+        if not body:
+            return None
+        # No element ends with "[", so that can only be the array's own
+        return size - len(tail) + len(body), body.endswith(b"[")
+
     def read_logs(self) -> List[Dict]:
         if not os.path.exists(self.filepath):
             log(f"JSON file not found at {self.filepath}", level="WARN")
@@ -42,8 +71,11 @@ class JSONOutput:
             return []
 
     def stream_log(self, log_entry: Dict):
-        logs = self.read_logs()
-        logs.append(log_entry)
-        with open(self.filepath, 'w', encoding='utf-8') as f:
-            json.dump(logs, f, indent=4)
-        log(f"Streamed 1 log to JSON at {self.filepath}")
+        self.write_logs([log_entry])
+
+
+def write(records: List[Dict], path: str):
+    """
+    Append records to the JSON file at ``path``. Entry point used by core.output_manager.
+    """
+    JSONOutput(os.path.dirname(path) or ".", os.path.basename(path)).write_logs(records)
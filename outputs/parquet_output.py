@@ -1,8 +1,57 @@
+import atexit
+import json
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from core.logger import log
+from core.record import materialize
+
+# Rows are appended to a long-lived ParquetWriter per file, one row group per
+# write, so a write costs the size of its records rather than of the whole
+# file. A Parquet file is only readable once its footer is written, so the
+# writer fills a temporary file next to the output (starting with the rows
+# the output already holds), and close() moves it into place at the end of a
+# run (core.output_manager.close) or at exit. Until then the output keeps
+# its previous contents, also if the process is killed.
+# Fields other than timestamp, level and message are stored as one JSON
+# object per row, so every row group has the same schema.
+
+COLUMNS = ["timestamp", "level", "message", "data"]
+SCHEMA = pa.schema([(name, pa.string()) for name in COLUMNS])
+
+# Open writers per output path, with the temporary file each one writes
+_writers: Dict[str, Tuple[pq.ParquetWriter, str]] = {}
+
+
+def _row(record: Dict) -> Dict:
+    record = materialize(record)
+    timestamp = record.get("timestamp", datetime.utcnow().isoformat())
+    return {
+        "timestamp": None if timestamp is None else str(timestamp),
+        "level": str(record.get("level", "INFO")),
+        "message": str(record.get("message", "")),
+        "data": json.dumps({k: v for k, v in record.items() if k not in ["timestamp", "level", "message"]},
+                           default=str),
+    }
+
+
+def close(path: Optional[str] = None):
+    """
+    Finish the Parquet file being written for ``path`` (or all of them) and
+    move it into place.
+    """
+    for key in [path] if path else list(_writers):
+        entry = _writers.pop(key, None)
+        if entry is not None:
+            writer, temp = entry
+            writer.close()
+            os.replace(temp, key)
+
+
+atexit.register(close)
 
 class ParquetOutput:
     def __init__(self, output_dir: str = "logs/parquet", filename: str = None):
@@ -14,57 +63,76 @@ class ParquetOutput:
 
     def _ensure_file(self):
         if not os.path.exists(self.filepath):
-            df = pd.DataFrame(columns=["timestamp", "level", "message", "data"])
-            df.to_parquet(self.filepath, engine="pyarrow", index=False)
+            pq.write_table(SCHEMA.empty_table(), self.filepath)
             log(f"Parquet file created at {self.filepath}")
 
-    def write_logs(self, logs: List[Dict]):
+    def _open_writer(self) -> Tuple[pq.ParquetWriter, str]:
+        # A finished file can't be appended to: its rows are carried over
+        # into the new one, once per process
+        try:
+            existing = [_row(entry) for entry in self._read()]
+        except Exception as e:
+            # Not overwritten: kept aside for whatever can be recovered from it
+            damaged = f"{self.filepath}.damaged"
+            os.replace(self.filepath, damaged)
+            log(f"Cannot read Parquet file {self.filepath} ({e}), moved it to {damaged}", level="WARNING")
+            existing = []
+        temp = f"{self.filepath}.{os.getpid()}.tmp"
+        writer = pq.ParquetWriter(temp, SCHEMA)
+        if existing:
+            writer.write_table(pa.Table.from_pylist(existing, schema=SCHEMA))
+        return writer, temp
+
+    def write_logs(self, logs: List[Dict]) -> bool:
         if not logs:
-            return
+            return True
 
         try:
-            if os.path.exists(self.filepath):
-                existing_df = pd.read_parquet(self.filepath, engine="pyarrow")
-                new_df = pd.DataFrame([{
-                    "timestamp": log.get("timestamp", datetime.utcnow().isoformat()),
-                    "level": log.get("level", "INFO"),
-                    "message": log.get("message", ""),
-                    "data": {k: v for k, v in log.items() if k not in ["timestamp", "level", "message"]}
-                } for log in logs])
-                combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-            else:
-                combined_df = pd.DataFrame([{
-                    "timestamp": log.get("timestamp", datetime.utcnow().isoformat()),
-                    "level": log.get("level", "INFO"),
-                    "message": log.get("message", ""),
-                    "data": {k: v for k, v in log.items() if k not in ["timestamp", "level", "message"]}
-                } for log in logs])
-
-            combined_df.to_parquet(self.filepath, engine="pyarrow", index=False)
+            if self.filepath not in _writers:
+                _writers[self.filepath] = self._open_writer()
+            writer = _writers[self.filepath][0]
+            writer.write_table(pa.Table.from_pylist([_row(entry) for entry in logs], schema=SCHEMA))
             log(f"Wrote {len(logs)} logs to Parquet at {self.filepath}")
+            return True
         except Exception as e:
             log(f"Error writing logs to Parquet: {e}", level="ERROR")
+            return False
 
     def read_logs(self) -> List[Dict]:
         if not os.path.exists(self.filepath):
             log(f"Parquet file not found at {self.filepath}", level="WARN")
             return []
 
+        # Finish the file if this process is still writing it
+        close(self.filepath)
         try:
-            df = pd.read_parquet(self.filepath, engine="pyarrow")
-            logs = []
-            for _, row in df.iterrows():
-                log_entry = {
-                    "timestamp": row.get("timestamp"),
-                    "level": row.get("level"),
-                    "message": row.get("message"),
-                }
-                log_entry.update(row.get("data", {}))
-                logs.append(log_entry)
-            return logs
+            return self._read()
         except Exception as e:
             log(f"Error reading logs from Parquet: {e}", level="ERROR")
             return []
 
+    def _read(self) -> List[Dict]:
+        df = pd.read_parquet(self.filepath, engine="pyarrow")
+        logs = []
+        for _, row in df.iterrows():
+            log_entry = {
+                "timestamp": row.get("timestamp"),
+                "level": row.get("level"),
+                "message": row.get("message"),
+            }
+            data = row.get("data")
+            # Files written before the data column held JSON have a struct instead
+            log_entry.update(json.loads(data) if isinstance(data, str) else data or {})
+            logs.append(log_entry)
+        return logs
+
     def stream_log(self, log_entry: Dict):
         self.write_logs([log_entry])
+
+
+def write(records: List[Dict], path: str):
+    """
+    Append records to the Parquet file at ``path``. Entry point used by core.output_manager.
+    """
+    if not ParquetOutput(os.path.dirname(path) or ".", os.path.basename(path)).write_logs(records):
+        raise IOError(f"Parquet write to {path} failed")
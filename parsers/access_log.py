@@ -0,0 +1,168 @@
+import re
+from typing import Dict, Optional
+from core.record import decode, text_field
+from core.timestamps import parse_clf
+
+# Single-pass scanner for Common/Combined Log Format lines, shared by the
+# Apache and Nginx parsers. It follows the parsers' regexes delimiter by
+# delimiter, always taking the first occurrence (what the regexes' lazy
+# groups try first), and returns None as soon as the line could need regex
+# backtracking or contains anything but printable ASCII, so callers fall
+# back to the regex and get exactly the same result either way.
+
+
+def scan_access_line(line: str, allow_clf: bool = True) -> Optional[Dict]:
+    """
+    Parse a Combined (or, with ``allow_clf``, Common) Log Format line into
+    the parsers' record layout, or None if the regex path has to decide.
+    """
+    body = line[:-1] if line.endswith("\n") else line
+    # Only " " separates fields below; tabs, control and non-ASCII characters
+    # (which \S treats differently) go to the regex
+    if not (body.isascii() and body.isprintable()):
+        return None
+
+    fields = body.split(" ", 3)
+    if len(fields) != 4:
+        return None
+    ip, ident, user, rest = fields
+    if not (ip and ident and user and rest.startswith("[")):
+        return None
+    time, found, rest = rest[1:].partition('] "')
+    if not found:
+        return None
+    request, found, rest = rest.partition('" ')
+    if not found:
+        return None
+    status = rest[:3]
+    if len(status) != 3 or not status.isdigit() or rest[3:4] != " ":
+        return None
+    size, space, rest = rest[4:].partition(" ")
+    if not size:
+        return None
+    parts = request.split()
+    method, path, protocol = parts if len(parts) == 3 else (None, None, None)
+
+    if space and rest.startswith('"'):
+        referer, found, rest = rest[1:].partition('" "')
+        if found:
+            user_agent, found, _ = rest.partition('"')
+            if found:
+                return {
+                    "ip": ip,
+                    "ident": ident,
+                    "user": user,
+                    "status": int(status),
+                    "size": int(size) if size.isdigit() else None,
+                    "referer": referer,
+                    "user_agent": user_agent,
+                    "timestamp": parse_clf(time),
+                    "method": method,
+                    "path": path,
+                    "protocol": protocol,
+                }
+
+    # Combined didn't match on the first-choice split. It can't match on any
+    # other split unless another quote follows the request.
+    if not allow_clf or '"' in size or '"' in rest:
+        return None
+    return {
+        "ip": ip,
+        "ident": ident,
+        "user": user,
+        "status": int(status),
+        "size": int(size) if size.isdigit() else None,
+        "timestamp": parse_clf(time),
+        "method": method,
+        "path": path,
+        "protocol": protocol,
+    }
+
+
+# Bytes lines: the same scan over raw bytes, returning the regexes' groups
+# undecoded. Bytes regexes treat only ASCII whitespace as whitespace, so
+# non-ASCII bytes need no special care.
+_NON_SPACE = re.compile(rb"\S+").fullmatch
+
+
+def scan_access_bytes(line, allow_clf: bool = True) -> Optional[Dict]:
+    """
+    Like scan_access_line, for a bytes line: the raw groups of the parsers'
+    bytes regexes (``status`` to ``user_agent``, still bytes), or None.
+    """
+    body = bytes(line[:-1] if line[-1:] == b"\n" else line)
+    # "." in the regexes stops at a newline
+    if b"\n" in body:
+        return None
+
+    fields = body.split(b" ", 3)
+    if len(fields) != 4:
+        return None
+    ip, ident, user, rest = fields
+    if not (ip and ident and user and rest.startswith(b"[")):
+        return None
+    time, found, rest = rest[1:].partition(b'] "')
+    if not found:
+        return None
+    request, found, rest = rest.partition(b'" ')
+    if not found:
+        return None
+    status = rest[:3]
+    if len(status) != 3 or not status.isdigit() or rest[3:4] != b" ":
+        return None
+    size, space, rest = rest[4:].partition(b" ")
+    # The \S+ groups, split on " " here, must not hold other whitespace
+    if not size or not _NON_SPACE(ip + ident + user + size):
+        return None
+
+    if space and rest.startswith(b'"'):
+        referer, found, rest = rest[1:].partition(b'" "')
+        if found:
+            user_agent, found, _ = rest.partition(b'"')
+            if found:
+                return {"ip": ip, "ident": ident, "user": user, "time": time, "request": request,
+                        "status": status, "size": size, "referer": referer, "user_agent": user_agent}
+
+    if not allow_clf or b'"' in size or b'"' in rest:
+        return None
+    return {"ip": ip, "ident": ident, "user": user, "time": time, "request": request,
+            "status": status, "size": size}
+
+
+# Lazy records over those groups (from the scanner or the bytes regexes);
+# same fields, order and conversions as the str path.
+
+def _request_part(index: int):
+    def part(raw):
+        parts = raw.get("request_parts")
+        if parts is None:
+            parts = decode(raw["request"]).split()
+            parts = raw["request_parts"] = parts if len(parts) == 3 else (None, None, None)
+        return parts[index]
+    return part
+
+
+def _size(raw):
+    size = raw["size"]
+    if not size.isascii():
+        # Non-ASCII digits count too on the str path
+        size = decode(size)
+    return int(size) if size.isdigit() else None
+
+
+_HEAD_SCHEMA = {
+    "ip": text_field("ip"),
+    "ident": text_field("ident"),
+    "user": text_field("user"),
+    "status": lambda raw: int(raw["status"]),
+    "size": _size,
+}
+_TAIL_SCHEMA = {
+    "timestamp": lambda raw: parse_clf(decode(raw["time"])),
+    "method": _request_part(0),
+    "path": _request_part(1),
+    "protocol": _request_part(2),
+}
+CLF_SCHEMA = {**_HEAD_SCHEMA, **_TAIL_SCHEMA}
+COMBINED_SCHEMA = {**_HEAD_SCHEMA, "referer": text_field("referer"), "user_agent": text_field("user_agent"),
+                   **_TAIL_SCHEMA}
@@ -1,9 +1,15 @@
 import re
-from typing import Dict, Optional
-from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Union
+from core.timestamps import parse_clf
+from core.record import LazyRecord
+from parsers.access_log import CLF_SCHEMA, COMBINED_SCHEMA, scan_access_bytes, scan_access_line
 from core.logger import log
+from core.parse_failures import record_failure, record_match
 
 class ApacheParser:
+    # Fields whose values are copied unchanged from the raw line (see core.prefilter)
+    VERBATIM_FIELDS = ("ip", "ident", "user", "method", "path", "protocol")
+
     # Common Log Format: 127.0.0.1 - frank [10/Oct/2000:13:55:36 -0700] "GET /apache.gif HTTP/1.0" 200 2326
     CLF_REGEX = re.compile(
         r'(?P<ip>\S+) '           # IP address
@@ -28,43 +34,98 @@ class ApacheParser:
         r'"(?P<user_agent>.*?)"'
     )
 
+    # The same patterns for bytes lines, which are decoded field by field
+    CLF_BYTES_REGEX = re.compile(CLF_REGEX.pattern.encode())
+    COMBINED_BYTES_REGEX = re.compile(COMBINED_REGEX.pattern.encode())
+
     @staticmethod
-    def parse_line(line: str) -> Optional[Dict]:
+    def parse_line(line: Union[str, bytes]) -> Optional[Dict]:
         """
         Parse a single Apache log line.
         Returns a dictionary of log fields or None if it doesn't match.
         """
+        if isinstance(line, str):
+            data = scan_access_line(line)
+            if data is None:
+                data = ApacheParser._parse_regex(line)
+        else:
+            data = ApacheParser._parse_bytes(line)
+        if data is None:
+            record_failure("apache", line)
+            return None
+        record_match("apache")
+        return data
+
+    @staticmethod
+    def _parse_regex(line: str) -> Optional[Dict]:
+        # Reference path, used for lines the scanner leaves to the regexes
         match = ApacheParser.COMBINED_REGEX.match(line)
         if not match:
             match = ApacheParser.CLF_REGEX.match(line)
-        if not match:
-            log(f"Failed to parse line: {line}", level="WARN")
-            return None
+        return ApacheParser._build(match.groupdict()) if match else None
+
+    @staticmethod
+    def _parse_bytes(line) -> Optional[Dict]:
+        line = bytes(line)
+        if line.isascii():
+            # Decoding ASCII is a plain copy, and the str scanner is the fastest path
+            text = line.decode("ascii")
+            return scan_access_line(text) or ApacheParser._parse_regex(text)
+        raw = scan_access_bytes(line)
+        if raw is None:
+            match = ApacheParser.COMBINED_BYTES_REGEX.match(line) or ApacheParser.CLF_BYTES_REGEX.match(line)
+            if not match:
+                return None
+            raw = match.groupdict()
+        return LazyRecord(raw, COMBINED_SCHEMA if "referer" in raw else CLF_SCHEMA)
 
-        data = match.groupdict()
+    @staticmethod
+    def _build(data: Dict) -> Dict:
         # Convert size to int, or None if '-'
         data['size'] = int(data['size']) if data['size'].isdigit() else None
         # Convert status to int
         data['status'] = int(data['status'])
-        # Convert timestamp to ISO format
-        try:
-            data['timestamp'] = datetime.strptime(data['time'], "%d/%b/%Y:%H:%M:%S %z").isoformat()
-        except Exception:
-            data['timestamp'] = None
+        # Convert timestamp to ISO format (or epoch seconds, see core.timestamps)
+        data['timestamp'] = parse_clf(data['time'])
         # Split request into method, path, protocol
-        try:
-            method, path, protocol = data['request'].split()
-            data['method'] = method
-            data['path'] = path
-            data['protocol'] = protocol
-        except Exception:
+        parts = data['request'].split()
+        if len(parts) == 3:
+            data['method'], data['path'], data['protocol'] = parts
+        else:
             data['method'] = data['path'] = data['protocol'] = None
 
         # Remove original time and request fields
-        data.pop('time', None)
-        data.pop('request', None)
+        del data['time']
+        del data['request']
         return data
 
+    @staticmethod
+    def parse_batch(lines: Iterable[str], rejects: Optional[list] = None) -> List[Dict]:
+        """
+        Parse many lines at once. Lines that don't match are counted in
+        core.parse_failures and, if given, appended to ``rejects``.
+        """
+        scan = scan_access_line
+        parse_regex = ApacheParser._parse_regex
+        parse_bytes = ApacheParser._parse_bytes
+        parsed = []
+        append = parsed.append
+        for line in lines:
+            if line.__class__ is str:
+                data = scan(line)
+                if data is None:
+                    data = parse_regex(line)
+            else:
+                data = parse_bytes(line)
+            if data is None:
+                record_failure("apache", line)
+                if rejects is not None:
+                    rejects.append(line)
+                continue
+            append(data)
+        record_match("apache", len(parsed))
+        return parsed
+
     @staticmethod
     def parse_lines(lines: list) -> list:
         """
@@ -1,17 +1,34 @@
 import re
-from typing import Dict, List, Optional
-from datetime import datetime
+from typing import Dict, List, Optional, Union
+from core.record import decode
+from parsers.grok import compile_grok, is_grok
+from core.timestamps import normalize as normalize_timestamp
 from core.logger import log
+from core.parse_failures import record_failure, record_match
 
 class GenericParser:
-    def __init__(self, pattern: str = None, field_map: Dict[str, str] = None):
-        self.pattern = re.compile(pattern) if pattern else None
+    def __init__(self, pattern: str = None, field_map: Dict[str, str] = None, patterns: Dict[str, str] = None):
+        """
+        ``pattern`` is a regex with named groups or a grok pattern such as
+        "%{IP:client} %{NUMBER:bytes:int}" (see parsers.grok; ``patterns``
+        adds or overrides grok definitions).
+        """
+        self.grok = None
+        if pattern and (patterns or is_grok(pattern)):
+            self.grok = compile_grok(pattern, patterns)
+            self.pattern = self.grok.regex
+        else:
+            self.pattern = re.compile(pattern) if pattern else None
         self.field_map = field_map or {}
 
-    def parse_line(self, line: str) -> Optional[Dict]:
+    def parse_line(self, line: Union[str, bytes]) -> Optional[Dict]:
+        if not isinstance(line, str):
+            line = decode(line)
         data = {}
 
-        if self.pattern:
+        if self.grok:
+            data = self.grok.match(line) or {}
+        elif self.pattern:
             match = self.pattern.match(line)
             if match:
                 data = match.groupdict()
@@ -23,12 +40,13 @@ class GenericParser:
                         key, value = part.split("=", 1)
                         data[key] = value
             except Exception:
-                log(f"Failed fallback parsing for line: {line}", level="WARN")
+                record_failure("generic", line)
                 return None
 
         if not data:
-            log(f"Line did not match any parsing strategy: {line}", level="WARN")
+            record_failure("generic", line)
             return None
+        record_match("generic")
 
         # Apply field map renaming
         for key, new_key in self.field_map.items():
@@ -37,11 +55,7 @@ class GenericParser:
 
         # Attempt to parse timestamps if present
         if "timestamp" in data:
-            try:
-                dt = datetime.fromisoformat(data["timestamp"])
-                data["timestamp"] = dt.isoformat()
-            except Exception:
-                pass
+            data["timestamp"] = normalize_timestamp(data["timestamp"])
 
         return data
 
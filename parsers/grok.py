@@ -0,0 +1,198 @@
+import os
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+# Grok-style patterns: "%{NAME}" expands to a library pattern, "%{NAME:field}"
+# captures it as ``field`` and "%{NAME:field:type}" also converts it (see
+# CONVERTERS). A whole pattern expands into one anchored regex; compiled
+# patterns are cached process-wide on their text, so every parser built
+# from the same pattern shares one regex.
+
+PATTERNS: Dict[str, str] = {
+    # Basics
+    "USERNAME": r"[a-zA-Z0-9._-]+",
+    "USER": r"%{USERNAME}",
+    "INT": r"[+-]?\d+",
+    "BASE10NUM": r"[+-]?(?:\d+(?:\.\d*)?|\.\d+)",
+    "NUMBER": r"%{BASE10NUM}",
+    "BASE16NUM": r"[+-]?(?:0x)?[0-9A-Fa-f]+",
+    "POSINT": r"\b[1-9][0-9]*\b",
+    "NONNEGINT": r"\b[0-9]+\b",
+    "WORD": r"\b\w+\b",
+    "NOTSPACE": r"\S+",
+    "SPACE": r"\s*",
+    "DATA": r".*?",
+    "GREEDYDATA": r".*",
+    "QUOTEDSTRING": r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'',
+    "QS": r"%{QUOTEDSTRING}",
+    "UUID": r"[A-Fa-f0-9]{8}-(?:[A-Fa-f0-9]{4}-){3}[A-Fa-f0-9]{12}",
+    "LOGLEVEL": r"(?i:trace|debug|info|notice|warn(?:ing)?|err(?:or)?|crit(?:ical)?|fatal|severe|alert|emerg(?:ency)?)",
+    # Networking
+    "IPV4": r"(?<![0-9])(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)(?![0-9])",
+    "IPV6": r"(?:[0-9A-Fa-f]{0,4}:){2,7}(?:[0-9A-Fa-f]{1,4}|%{IPV4})?",
+    "IP": r"%{IPV6}|%{IPV4}",
+    "HOSTNAME": r"\b[0-9A-Za-z](?:[0-9A-Za-z-]{0,62})(?:\.[0-9A-Za-z](?:[0-9A-Za-z-]{0,62}))*\.?\b",
+    "IPORHOST": r"%{IP}|%{HOSTNAME}",
+    "HOSTPORT": r"%{IPORHOST}:%{POSINT}",
+    "MAC": r"(?:[A-Fa-f0-9]{2}[:-]){5}[A-Fa-f0-9]{2}",
+    # Paths and URIs
+    "UNIXPATH": r"(?:/[\w_%!$@:.,+~-]*)+",
+    "WINPATH": r"(?:[A-Za-z]+:|\\)(?:\\[^\\?*]*)+",
+    "PATH": r"%{UNIXPATH}|%{WINPATH}",
+    "URIPROTO": r"[A-Za-z][A-Za-z0-9+\-.]*",
+    "URIHOST": r"%{IPORHOST}(?::%{POSINT})?",
+    "URIPATH": r"(?:/[A-Za-z0-9$.+!*'(){},~:;=@#%&_\-]*)+",
+    "URIPARAM": r"\?[A-Za-z0-9$.+!*'|(){},~@#%&/=:;_?\-\[\]<>]*",
+    "URIPATHPARAM": r"%{URIPATH}(?:%{URIPARAM})?",
+    "URI": r"%{URIPROTO}://(?:%{USER}(?::[^@]*)?@)?(?:%{URIHOST})?(?:%{URIPATHPARAM})?",
+    # Dates and times
+    "MONTH": r"\b(?:[Jj]an(?:uary)?|[Ff]eb(?:ruary)?|[Mm]ar(?:ch)?|[Aa]pr(?:il)?|[Mm]ay|[Jj]une?|[Jj]uly?"
+             r"|[Aa]ug(?:ust)?|[Ss]ep(?:tember)?|[Oo]ct(?:ober)?|[Nn]ov(?:ember)?|[Dd]ec(?:ember)?)\b",
+    "MONTHNUM": r"0?[1-9]|1[0-2]",
+    "MONTHDAY": r"(?:0[1-9]|[12]\d|3[01]|[1-9])",
+    "DAY": r"(?:Mon(?:day)?|Tue(?:sday)?|Wed(?:nesday)?|Thu(?:rsday)?|Fri(?:day)?|Sat(?:urday)?|Sun(?:day)?)",
+    "YEAR": r"\d\d(?:\d\d)?",
+    "HOUR": r"2[0123]|[01]?\d",
+    "MINUTE": r"[0-5]\d",
+    "SECOND": r"(?:[0-5]?\d|60)(?:[:.,]\d+)?",
+    "TIME": r"%{HOUR}:%{MINUTE}(?::%{SECOND})?",
+    "ISO8601_TIMEZONE": r"Z|[+-]%{HOUR}(?::?%{MINUTE})",
+    "TIMESTAMP_ISO8601": r"%{YEAR}-%{MONTHNUM}-%{MONTHDAY}[T ]%{HOUR}:?%{MINUTE}(?::?%{SECOND})?%{ISO8601_TIMEZONE}?",
+    "HTTPDATE": r"%{MONTHDAY}/%{MONTH}/%{YEAR}:%{TIME} %{INT}",
+    "SYSLOGTIMESTAMP": r"%{MONTH} +%{MONTHDAY} %{TIME}",
+    "PROG": r"[\x21-\x5a\x5c\x5e-\x7e]+",
+    # Whole lines
+    "COMMONAPACHELOG": r'%{IPORHOST:ip} %{USER:ident} %{USER:user} \[%{HTTPDATE:time}\] '
+                       r'"(?:%{WORD:method} %{NOTSPACE:path}(?: HTTP/%{NUMBER:http_version})?|%{DATA:request})" '
+                       r'%{NUMBER:status:int} (?:%{NUMBER:size:int}|-)',
+    "COMBINEDAPACHELOG": r'%{COMMONAPACHELOG} %{QS:referer} %{QS:user_agent}',
+    "SYSLOGLINE": r'%{SYSLOGTIMESTAMP:time} %{IPORHOST:host} %{PROG:app}(?:\[%{POSINT:pid:int}\])?: '
+                  r'%{GREEDYDATA:message}',
+}
+
+# Types usable as the third part of %{NAME:field:type}
+CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    "int": int,
+    "float": float,
+    "str": str,
+}
+
+# Distinct patterns kept compiled
+GROK_CACHE_SIZE = int(os.getenv("UNILOG_GROK_CACHE_SIZE", 256))
+
+_REFERENCE = re.compile(r"%\{(\w+)(?::([\w.@\[\]-]+))?(?::(\w+))?\}")
+
+
+class GrokPattern:
+    """
+    A compiled grok pattern: ``match(line)`` returns {field: value} with
+    types converted, or None.
+    """
+    __slots__ = ("pattern", "regex", "captures")
+
+    def __init__(self, pattern: str, regex: "re.Pattern", captures: List[Tuple[int, str, Optional[Callable]]]):
+        self.pattern = pattern
+        self.regex = regex
+        # (group number, field, converter or None) in pattern order
+        self.captures = captures
+
+    @property
+    def fields(self) -> List[str]:
+        return list(dict.fromkeys(field for _, field, _ in self.captures))
+
+    def match(self, line: str) -> Optional[Dict[str, Any]]:
+        match = self.regex.match(line)
+        if match is None:
+            return None
+        # One pass over the groups: skip captures that didn't take part
+        # (optional parts) and convert the rest
+        groups = match.groups()
+        data = {}
+        for index, field, convert in self.captures:
+            value = groups[index]
+            if value is None:
+                continue
+            if convert is not None:
+                try:
+                    value = convert(value)
+                except ValueError:
+                    pass
+            data[field] = value
+        return data
+
+    def __repr__(self):
+        return f"GrokPattern({self.pattern!r})"
+
+
+def _expand(pattern: str, library: Mapping[str, str], captures: List[Tuple[str, Optional[str]]],
+            stack: Tuple[str, ...] = ()) -> str:
+    def replace(reference: "re.Match") -> str:
+        name, field, type_name = reference.groups()
+        if name not in library:
+            raise ValueError(f"Unknown grok pattern %{{{name}}} in {pattern!r}")
+        if name in stack:
+            raise ValueError(f"Recursive grok pattern %{{{name}}} ({' -> '.join(stack + (name,))})")
+        if type_name is not None and type_name not in CONVERTERS:
+            raise ValueError(f"Unknown grok type {type_name!r} in %{{{reference.group(0)[2:-1]}}}, "
+                             f"expected one of {list(CONVERTERS)}")
+        if field is None:
+            return f"(?:{_expand(library[name], library, captures, stack + (name,))})"
+        # Groups are numbered in order of their opening parenthesis, so
+        # reserve this one before expanding the captures nested in it
+        slot = len(captures)
+        captures.append((field, type_name))
+        body = _expand(library[name], library, captures, stack + (name,))
+        return f"(?P<_g{slot}>{body})"
+
+    return _REFERENCE.sub(replace, pattern)
+
+
+@lru_cache(maxsize=GROK_CACHE_SIZE)
+def _compile(pattern: str, custom: Tuple[Tuple[str, str], ...]) -> GrokPattern:
+    library = {**PATTERNS, **dict(custom)} if custom else PATTERNS
+    captures: List[Tuple[str, Optional[str]]] = []
+    expanded = _expand(pattern, library, captures)
+    # Anchored at both ends; a trailing newline is allowed
+    regex = re.compile(rf"(?:{expanded})\r?\n?\Z")
+    indexes = {name: number - 1 for name, number in regex.groupindex.items()}
+    ordered = []
+    for slot, (field, type_name) in enumerate(captures):
+        ordered.append((indexes[f"_g{slot}"], field, CONVERTERS[type_name] if type_name else None))
+    # Named groups written directly in the pattern are fields too
+    for name, index in indexes.items():
+        if not name.startswith("_g"):
+            ordered.append((index, name, None))
+    ordered.sort()
+    return GrokPattern(pattern, regex, ordered)
+
+
+def compile_grok(pattern: str, patterns: Optional[Mapping[str, str]] = None) -> GrokPattern:
+    """
+    Compile ``pattern`` (cached on its text and any extra ``patterns``
+    definitions). Raises ValueError for unknown or recursive references.
+    """
+    custom = tuple(sorted(patterns.items())) if patterns else ()
+    try:
+        return _compile(pattern, custom)
+    except re.error as e:
+        raise ValueError(f"Invalid grok pattern {pattern!r}: {e}") from e
+
+
+def load_patterns(path: str) -> Dict[str, str]:
+    """
+    Read a grok pattern file: one "NAME regex" definition per line, "#" comments.
+    """
+    patterns = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            name, _, definition = line.partition(" ")
+            patterns[name] = definition.strip()
+    return patterns
+
+
+def is_grok(pattern: str) -> bool:
+    return _REFERENCE.search(pattern) is not None
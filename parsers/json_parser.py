@@ -1,24 +1,181 @@
 import json
-from typing import Dict, List, Optional
+import os
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 from core.logger import log
-from datetime import datetime
+from core.parse_failures import record_failure, record_match
+from core.registry import LazyRegistry
+from core.timestamps import normalize as normalize_timestamp
+
+# Decoders for NDJSON buffers, fastest first. Each takes one line as bytes and
+# raises ValueError (JSONDecodeError, UnicodeDecodeError...) on bad input.
+JSON_DECODERS = LazyRegistry({
+    "orjson": "orjson:loads",
+    "json": "json:loads",
+})
+# "auto" picks the first decoder that can be imported
+JSON_DECODER = os.getenv("UNILOG_JSON_DECODER", "auto")
+# Bytes read at a time by JSONParser.parse_stream
+READ_CHUNK_SIZE = int(os.getenv("UNILOG_JSON_READ_CHUNK", 1 << 20))
+
+_decoder: Optional[Tuple[str, Callable[[bytes], object]]] = None
+
+
+def get_decoder() -> Tuple[str, Callable[[bytes], object]]:
+    """
+    (name, loads) of the decoder selected by JSON_DECODER.
+    """
+    global _decoder
+    if _decoder is None or (JSON_DECODER != "auto" and _decoder[0] != JSON_DECODER):
+        names = list(JSON_DECODERS) if JSON_DECODER == "auto" else [JSON_DECODER]
+        for name in names:
+            try:
+                _decoder = (name, JSON_DECODERS[name])
+                break
+            except ImportError:
+                continue
+        else:
+            raise ValueError(f"No usable JSON decoder among {names}")
+    return _decoder
+
+
+def _loads(line: Union[str, bytes, bytearray, memoryview]):
+    # json.loads takes str or UTF-8 bytes; invalid UTF-8 only spoils the
+    # strings it appears in (as U+FFFD), not the whole line
+    if type(line) is memoryview:
+        line = bytes(line)
+    try:
+        return json.loads(line)
+    except UnicodeDecodeError:
+        return json.loads(str(line, "utf-8", "replace"))
+
+
+def _loads_replacing(loads: Callable[[bytes], object], line: bytes):
+    # The fallback of _loads for a decoder that rejected ``line``: retried
+    # with invalid UTF-8 replaced, None if it was valid UTF-8 already
+    try:
+        line.decode("utf-8")
+    except UnicodeDecodeError:
+        try:
+            return loads(str(line, "utf-8", "replace"))
+        except ValueError:
+            return None
+    return None
+
 
 class JSONParser:
     @staticmethod
-    def parse_line(line: str) -> Optional[Dict]:
+    def parse_line(line: Union[str, bytes]) -> Optional[Dict]:
         try:
-            data = json.loads(line)
-            # Normalize timestamp if exists
-            if "timestamp" in data:
-                try:
-                    dt = datetime.fromisoformat(data["timestamp"])
-                    data["timestamp"] = dt.isoformat()
-                except Exception:
-                    pass
-            return data
-        except json.JSONDecodeError:
-            log(f"Failed to parse JSON line: {line}", level="WARN")
+            data = _loads(line)
+        except ValueError:
+            data = None
+        # Valid JSON that isn't an object (a list, a number...) isn't a record either
+        if not isinstance(data, dict):
+            record_failure("json", line)
             return None
+        # Normalize timestamp if exists
+        if "timestamp" in data:
+            data["timestamp"] = normalize_timestamp(data["timestamp"])
+        record_match("json")
+        return data
+
+    @staticmethod
+    def parse_batch(lines: Iterable[str], rejects: Optional[list] = None) -> List[Dict]:
+        """
+        Parse many lines at once. Lines that aren't a JSON object are counted in
+        core.parse_failures and, if given, appended to ``rejects``.
+        """
+        loads = _loads
+        parsed = []
+        append = parsed.append
+        for line in lines:
+            try:
+                data = loads(line)
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                record_failure("json", line)
+                if rejects is not None:
+                    rejects.append(line)
+                continue
+            if "timestamp" in data:
+                data["timestamp"] = normalize_timestamp(data["timestamp"])
+            append(data)
+        record_match("json", len(parsed))
+        return parsed
+
+    @staticmethod
+    def parse_buffer(buffer: Union[bytes, bytearray, memoryview, str], fields: Optional[Sequence[str]] = None,
+                     rejects: Optional[list] = None, offset: int = 0) -> List[Dict]:
+        """
+        Decode a buffer of newline-delimited JSON in one go.
+
+        ``fields`` keeps only those top-level keys in each record. Blank lines
+        are skipped; lines that aren't a JSON object are counted in
+        core.parse_failures and, if given, appended to ``rejects`` as
+        ``(byte_offset, raw_line)`` with offsets counted from ``offset``.
+        Timestamps are normalized once per distinct value in the batch.
+        """
+        if isinstance(buffer, str):
+            buffer = buffer.encode("utf-8")
+        _, loads = get_decoder()
+        parsed = []
+        append = parsed.append
+        position = offset
+        for line in bytes(buffer).split(b"\n"):
+            start = position
+            position += len(line) + 1
+            if not line.strip():
+                continue
+            try:
+                data = loads(line)
+            except ValueError:
+                data = _loads_replacing(loads, line)
+            if type(data) is not dict:
+                record_failure("json", line)
+                if rejects is not None:
+                    rejects.append((start, line))
+                continue
+            if fields is not None:
+                data = {key: data[key] for key in fields if key in data}
+            append(data)
+        record_match("json", len(parsed))
+
+        # Many records share a timestamp; decode each distinct string once
+        stamps = {}
+        for data in parsed:
+            if "timestamp" in data:
+                value = data["timestamp"]
+                if type(value) is str:
+                    normalized = stamps.get(value)
+                    if normalized is None:
+                        normalized = stamps[value] = normalize_timestamp(value)
+                    data["timestamp"] = normalized
+                else:
+                    data["timestamp"] = normalize_timestamp(value)
+        return parsed
+
+    @staticmethod
+    def parse_stream(stream: BinaryIO, fields: Optional[Sequence[str]] = None, rejects: Optional[list] = None,
+                     chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Dict]:
+        """
+        parse_buffer over a binary file, ``chunk_size`` bytes at a time. Lines
+        split across reads are carried over, so offsets are file offsets.
+        """
+        offset = 0
+        carry = b""
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            buffer = carry + chunk
+            end = buffer.rfind(b"\n") + 1
+            if end:
+                yield from JSONParser.parse_buffer(buffer[:end], fields, rejects, offset)
+                offset += end
+            carry = buffer[end:]
+        if carry:
+            yield from JSONParser.parse_buffer(carry, fields, rejects, offset)
 
     @staticmethod
     def parse_lines(lines: List[str]) -> List[Dict]:
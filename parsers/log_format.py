@@ -0,0 +1,361 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from core.logger import log
+from core.parse_failures import record_failure, record_match
+from core.record import decode
+from core.timestamps import normalize, parse_clf, parse_epoch, parse_rfc3339
+
+# Compiles an nginx ``log_format`` or Apache ``LogFormat`` string into a
+# parser for exactly that layout: one anchored regex plus a conversion per
+# field. The compiled form (regex source and field list) is a small JSON spec,
+# cached in memory under a hash of the format. It can also be cached on disk
+# (UNILOG_FORMAT_CACHE_DIR), but that is off by default: compiling a spec
+# takes some tens of microseconds, hardly more than loading a cached one.
+
+NGINX = "nginx"
+APACHE = "apache"
+STYLES = (NGINX, APACHE)
+
+# Bump when the generated specs change so old cache entries are ignored
+COMPILER_VERSION = 1
+# "" for no disk cache
+FORMAT_CACHE_DIR = os.getenv("UNILOG_FORMAT_CACHE_DIR", "")
+
+_NUMBER = r"-|[+-]?\d+(?:\.\d+)?"
+_INTEGER = r"-|\d+"
+
+
+def _number(convert: Callable[[str], Any]) -> Callable[[str], Any]:
+    def converted(value: str):
+        if value == "-":
+            return None
+        try:
+            return convert(value)
+        except ValueError:
+            # e.g. several upstreams: "0.012, 0.004"
+            return value
+    return converted
+
+
+def _request(value: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    parts = value.split()
+    return tuple(parts) if len(parts) == 3 else (None, None, None)
+
+
+# Conversions a spec can name. "request" is special: it fills method, path
+# and protocol, like the built-in access-log parsers.
+CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    "int": _number(int),
+    "float": _number(float),
+    "clf": parse_clf,
+    "iso8601": parse_rfc3339,
+    "epoch": _number(parse_epoch),
+    "timestamp": normalize,
+    "request": _request,
+}
+REQUEST_FIELDS = ("method", "path", "protocol")
+
+# nginx variables: name -> (field, converter, regex). A None regex means the
+# capture is bounded by the literal that follows it.
+NGINX_VARIABLES: Dict[str, Tuple[str, Optional[str], Optional[str]]] = {
+    "remote_addr": ("ip", None, r"\S+"),
+    "remote_user": ("user", None, None),
+    "time_local": ("timestamp", "clf", None),
+    "time_iso8601": ("timestamp", "iso8601", None),
+    "msec": ("msec", "float", _NUMBER),
+    "request": ("request", "request", None),
+    "status": ("status", "int", r"\d{3}"),
+    "body_bytes_sent": ("size", "int", _INTEGER),
+    "bytes_sent": ("bytes_sent", "int", _INTEGER),
+    "request_length": ("request_length", "int", _INTEGER),
+    "connection": ("connection", "int", _INTEGER),
+    "connection_requests": ("connection_requests", "int", _INTEGER),
+    "pid": ("pid", "int", _INTEGER),
+    "request_time": ("request_time", "float", _NUMBER),
+    "upstream_response_time": ("upstream_response_time", "float", None),
+    "upstream_connect_time": ("upstream_connect_time", "float", None),
+    "upstream_header_time": ("upstream_header_time", "float", None),
+    "upstream_status": ("upstream_status", "int", None),
+    "http_referer": ("referer", None, None),
+    "http_user_agent": ("user_agent", None, None),
+}
+
+# Apache directives: letter -> (field, converter, regex)
+APACHE_DIRECTIVES: Dict[str, Tuple[str, Optional[str], Optional[str]]] = {
+    "a": ("ip", None, r"\S+"),
+    "A": ("local_ip", None, r"\S+"),
+    "b": ("size", "int", _INTEGER),
+    "B": ("size", "int", _INTEGER),
+    "D": ("duration_us", "int", _INTEGER),
+    "T": ("duration_s", "int", _INTEGER),
+    "f": ("filename", None, None),
+    "h": ("ip", None, r"\S+"),
+    "H": ("protocol", None, r"\S+"),
+    "k": ("keepalive_requests", "int", _INTEGER),
+    "l": ("ident", None, r"\S+"),
+    "L": ("log_id", None, r"\S+"),
+    "m": ("method", None, r"\S+"),
+    "p": ("port", "int", _INTEGER),
+    "P": ("pid", "int", _INTEGER),
+    "q": ("query", None, None),
+    "r": ("request", "request", None),
+    "R": ("handler", None, None),
+    "s": ("status", "int", r"\d{3}"),
+    "t": ("timestamp", "clf", r"\[[^\]]*\]"),
+    "u": ("user", None, None),
+    "U": ("path", None, r"\S+"),
+    "v": ("server_name", None, r"\S+"),
+    "V": ("server_name", None, r"\S+"),
+    "X": ("connection_status", None, r"\S"),
+    "I": ("bytes_in", "int", _INTEGER),
+    "O": ("bytes_out", "int", _INTEGER),
+    "S": ("bytes_total", "int", _INTEGER),
+}
+
+_NGINX_TOKEN = re.compile(r"\$(?:\{(\w+)\}|(\w+))")
+# %[conditions or < >][{argument}]letter, or %% for a literal percent
+_APACHE_TOKEN = re.compile(r"%(?:(%)|[<>]?(?:!?\d+(?:,\d+)*)?(?:\{([^}]*)\})?([a-zA-Z]))")
+_DIRECTIVE = re.compile(r"^\s*(log_format|LogFormat)\s+(.*?);?\s*$", re.DOTALL)
+_QUOTED = re.compile(r"'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\"")
+
+Token = Union[str, Tuple[str, Optional[str], Optional[str]]]
+
+
+def parse_directive(text: str) -> Tuple[str, Optional[str], str]:
+    """
+    (style, name, format) from a config line such as
+    ``log_format main '$remote_addr ...' '...';`` or ``LogFormat "%h %l ..." combined``.
+    Plain format strings are returned as they are, with the style guessed.
+    """
+    directive = _DIRECTIVE.match(text)
+    if directive is None:
+        style = NGINX if _NGINX_TOKEN.search(text) else APACHE
+        return style, None, text
+    keyword, rest = directive.groups()
+    strings = [single + double for single, double in _QUOTED.findall(rest)]
+    # Backslash escapes of the config syntax (\" in Apache, \' in nginx)
+    strings = [re.sub(r"\\(.)", r"\1", string) for string in strings]
+    words = _QUOTED.sub(" ", rest).split()
+    if keyword == "log_format":
+        # log_format name [escape=default|json|none] 'string' ...
+        return NGINX, (words[0] if words else None), "".join(strings)
+    # LogFormat "format" [nickname]
+    return APACHE, (words[0] if words else None), "".join(strings)
+
+
+def _tokens(style: str, fmt: str) -> List[Token]:
+    tokens: List[Token] = []
+    literal = []
+    position = 0
+    if style == NGINX:
+        for match in _NGINX_TOKEN.finditer(fmt):
+            literal.append(fmt[position:match.start()])
+            position = match.end()
+            name = match.group(1) or match.group(2)
+            field, convert, pattern = NGINX_VARIABLES.get(name, (None, None, None))
+            if field is None:
+                field = name[5:] if name.startswith("http_") else name
+            tokens.append("".join(literal))
+            tokens.append((field, convert, pattern))
+            literal = []
+    else:
+        for match in _APACHE_TOKEN.finditer(fmt):
+            literal.append(fmt[position:match.start()])
+            position = match.end()
+            percent, argument, letter = match.groups()
+            if percent:
+                literal.append("%")
+                continue
+            tokens.append("".join(literal))
+            tokens.append(_apache_field(argument, letter))
+            literal = []
+    literal.append(fmt[position:])
+    tokens.append("".join(literal))
+    return tokens
+
+
+def _apache_field(argument: Optional[str], letter: str) -> Tuple[str, Optional[str], Optional[str]]:
+    if argument is not None and letter in "ioCen":
+        name = argument.lower().replace("-", "_")
+        if letter == "i" and name in ("referer", "user_agent"):
+            return name, None, None
+        return {"o": f"resp_{name}", "C": f"cookie_{name}"}.get(letter, name), None, None
+    if argument is not None and letter == "t":
+        # Custom strftime layouts are only recognised if they look like ISO 8601 or epoch
+        return "timestamp", "timestamp", None
+    if letter not in APACHE_DIRECTIVES:
+        raise ValueError(f"Unsupported LogFormat directive %{letter}")
+    return APACHE_DIRECTIVES[letter]
+
+
+def compile_spec(fmt: str, style: str = NGINX) -> Dict[str, Any]:
+    """
+    The JSON-serialisable spec for ``fmt``: the regex source and, per
+    capture group, its field and converter name.
+    """
+    if style not in STYLES:
+        raise ValueError(f"Unknown log format style {style!r}, expected one of {STYLES}")
+    tokens = _tokens(style, fmt)
+    parts = []
+    fields: List[List[Optional[str]]] = []
+    for index in range(1, len(tokens), 2):
+        field, convert, pattern = tokens[index]
+        following = tokens[index + 1]
+        if pattern is None:
+            if following[:1] in ('"', "]", "'", "|", ",", ";", "\t"):
+                # Bounded by a delimiter that can't occur inside the value
+                pattern = f"[^{re.escape(following[0])}]*"
+            elif index == len(tokens) - 2 and not following:
+                pattern = ".*"
+            else:
+                pattern = ".*?"
+        if pattern.startswith(r"\[") and convert == "clf":
+            # %t carries its own brackets
+            parts.append(re.escape(tokens[index - 1]) + r"\[(" + pattern[2:-2] + r")\]")
+        else:
+            parts.append(re.escape(tokens[index - 1]) + f"({pattern})")
+        fields.append([field, convert])
+    if not fields:
+        raise ValueError(f"Log format {fmt!r} has no variables")
+    parts.append(re.escape(tokens[-1]))
+    regex = "".join(parts) + r"\r?\n?\Z"
+    re.compile(regex)  # fail early on anything the escaping missed
+    return {"version": COMPILER_VERSION, "style": style, "format": fmt, "regex": regex, "fields": fields}
+
+
+class LogFormatParser:
+    """
+    Parser generated from one log format spec (see compile_log_format).
+    """
+
+    def __init__(self, spec: Dict[str, Any], name: Optional[str] = None):
+        self.spec = spec
+        self.name = name or f"{spec['style']}_format"
+        self.regex = re.compile(spec["regex"])
+        self.bytes_regex = None
+        self.captures = [(field, CONVERTERS[convert] if convert else None, convert == "request")
+                         for field, convert in spec["fields"]]
+        verbatim = []
+        for field, convert in spec["fields"]:
+            if convert is None:
+                verbatim.append(field)
+            elif convert == "request":
+                verbatim.extend(REQUEST_FIELDS)
+        # Fields whose values are copied unchanged from the raw line (see core.prefilter)
+        self.VERBATIM_FIELDS = tuple(verbatim)
+
+    @property
+    def fields(self) -> List[str]:
+        names = []
+        for field, _, request in self.captures:
+            names.extend(REQUEST_FIELDS if request else (field,))
+        return list(dict.fromkeys(names))
+
+    def _build(self, groups: tuple) -> Dict[str, Any]:
+        data = {}
+        for (field, convert, request), value in zip(self.captures, groups):
+            if request:
+                data["method"], data["path"], data["protocol"] = _request(value)
+            elif convert is None:
+                data[field] = value
+            else:
+                data[field] = convert(value)
+        return data
+
+    def parse_line(self, line: Union[str, bytes]) -> Optional[Dict]:
+        if not isinstance(line, str):
+            line = decode(line)
+        match = self.regex.match(line)
+        if match is None:
+            record_failure(self.name, line)
+            return None
+        record_match(self.name)
+        return self._build(match.groups())
+
+    def parse_batch(self, lines: Iterable[str], rejects: Optional[list] = None) -> List[Dict]:
+        """
+        Parse many lines at once. Lines that don't match are counted in
+        core.parse_failures and, if given, appended to ``rejects``.
+        """
+        match_line = self.regex.match
+        build = self._build
+        parsed = []
+        append = parsed.append
+        for line in lines:
+            text = line if line.__class__ is str else decode(line)
+            match = match_line(text)
+            if match is None:
+                record_failure(self.name, line)
+                if rejects is not None:
+                    rejects.append(line)
+                continue
+            append(build(match.groups()))
+        record_match(self.name, len(parsed))
+        return parsed
+
+    def __repr__(self):
+        return f"LogFormatParser({self.spec['style']}, {self.spec['format']!r})"
+
+
+_specs: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def format_key(fmt: str, style: str) -> str:
+    return hashlib.sha256(f"{COMPILER_VERSION}\0{style}\0{fmt}".encode("utf-8")).hexdigest()
+
+
+def _load_cached(path: str, fmt: str, style: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if spec.get("version") != COMPILER_VERSION or spec.get("format") != fmt or spec.get("style") != style:
+        return None
+    return spec
+
+
+def _store(path: str, spec: Dict[str, Any]):
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(spec, f)
+        os.replace(temp, path)
+    except OSError as e:
+        log(f"Could not cache compiled log format in {path}: {e}", level="WARNING")
+
+
+def get_spec(fmt: str, style: str = NGINX, cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    The spec for ``fmt``, from memory, then the disk cache in ``cache_dir``
+    (default FORMAT_CACHE_DIR, if set), then compile_spec.
+    """
+    key = format_key(fmt, style)
+    spec = _specs.get(key)
+    if spec is not None:
+        return spec
+    cache_dir = FORMAT_CACHE_DIR if cache_dir is None else cache_dir
+    path = os.path.join(cache_dir, f"{key}.json") if cache_dir else None
+    spec = _load_cached(path, fmt, style) if path else None
+    if spec is None:
+        spec = compile_spec(fmt, style)
+        if path:
+            _store(path, spec)
+    with _lock:
+        return _specs.setdefault(key, spec)
+
+
+def compile_log_format(fmt: str, style: Optional[str] = None, name: Optional[str] = None,
+                       cache_dir: Optional[str] = None) -> LogFormatParser:
+    """
+    A parser for ``fmt``: a bare format string or a whole ``log_format`` /
+    ``LogFormat`` config line (which also supplies the name and style).
+    """
+    detected_style, directive_name, fmt = parse_directive(fmt)
+    return LogFormatParser(get_spec(fmt, style or detected_style, cache_dir), name or directive_name)
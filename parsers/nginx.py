@@ -1,9 +1,15 @@
 import re
-from typing import Dict, List, Optional
-from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Union
+from core.timestamps import parse_clf
+from core.record import LazyRecord
+from parsers.access_log import COMBINED_SCHEMA, scan_access_bytes, scan_access_line
 from core.logger import log
+from core.parse_failures import record_failure, record_match
 
 class NginxParser:
+    # Fields whose values are copied unchanged from the raw line (see core.prefilter)
+    VERBATIM_FIELDS = ("ip", "ident", "user", "method", "path", "protocol", "referer", "user_agent")
+
     # Default combined log format regex
     COMBINED_REGEX = re.compile(
         r'(?P<ip>\S+) '                 # IP address
@@ -16,40 +22,92 @@ class NginxParser:
         r'"(?P<referer>.*?)" '
         r'"(?P<user_agent>.*?)"'
     )
+    # The same pattern for bytes lines, which are decoded field by field
+    COMBINED_BYTES_REGEX = re.compile(COMBINED_REGEX.pattern.encode())
 
     @staticmethod
-    def parse_line(line: str) -> Optional[Dict]:
-        match = NginxParser.COMBINED_REGEX.match(line)
-        if not match:
-            from core.logger import LogLevel
-            log(f"Failed to parse Nginx line: {line}", level=LogLevel.WARNING)
+    def parse_line(line: Union[str, bytes]) -> Optional[Dict]:
+        if isinstance(line, str):
+            data = scan_access_line(line, allow_clf=False)
+            if data is None:
+                data = NginxParser._parse_regex(line)
+        else:
+            data = NginxParser._parse_bytes(line)
+        if data is None:
+            record_failure("nginx", line)
             return None
+        record_match("nginx")
+        return data
+
+    @staticmethod
+    def _parse_regex(line: str) -> Optional[Dict]:
+        # Reference path, used for lines the scanner leaves to the regex
+        match = NginxParser.COMBINED_REGEX.match(line)
+        return NginxParser._build(match.groupdict()) if match else None
+
+    @staticmethod
+    def _parse_bytes(line) -> Optional[Dict]:
+        line = bytes(line)
+        if line.isascii():
+            # Decoding ASCII is a plain copy, and the str scanner is the fastest path
+            text = line.decode("ascii")
+            return scan_access_line(text, allow_clf=False) or NginxParser._parse_regex(text)
+        raw = scan_access_bytes(line, allow_clf=False)
+        if raw is None:
+            match = NginxParser.COMBINED_BYTES_REGEX.match(line)
+            if not match:
+                return None
+            raw = match.groupdict()
+        return LazyRecord(raw, COMBINED_SCHEMA)
 
-        data = match.groupdict()
+    @staticmethod
+    def _build(data: Dict) -> Dict:
         # Convert numeric fields
         data['status'] = int(data['status'])
         data['size'] = int(data['size']) if data['size'].isdigit() else None
 
         # Convert timestamp
-        try:
-            data['timestamp'] = datetime.strptime(data['time'], "%d/%b/%Y:%H:%M:%S %z").isoformat()
-        except Exception:
-            data['timestamp'] = None
+        data['timestamp'] = parse_clf(data['time'])
 
         # Split request
-        try:
-            method, path, protocol = data['request'].split()
-            data['method'] = method
-            data['path'] = path
-            data['protocol'] = protocol
-        except Exception:
+        parts = data['request'].split()
+        if len(parts) == 3:
+            data['method'], data['path'], data['protocol'] = parts
+        else:
             data['method'] = data['path'] = data['protocol'] = None
 
         # Remove original fields
-        data.pop('time', None)
-        data.pop('request', None)
+        del data['time']
+        del data['request']
         return data
 
+    @staticmethod
+    def parse_batch(lines: Iterable[str], rejects: Optional[list] = None) -> List[Dict]:
+        """
+        Parse many lines at once. Lines that don't match are counted in
+        core.parse_failures and, if given, appended to ``rejects``.
+        """
+        scan = scan_access_line
+        parse_regex = NginxParser._parse_regex
+        parse_bytes = NginxParser._parse_bytes
+        parsed = []
+        append = parsed.append
+        for line in lines:
+            if line.__class__ is str:
+                data = scan(line, False)
+                if data is None:
+                    data = parse_regex(line)
+            else:
+                data = parse_bytes(line)
+            if data is None:
+                record_failure("nginx", line)
+                if rejects is not None:
+                    rejects.append(line)
+                continue
+            append(data)
+        record_match("nginx", len(parsed))
+        return parsed
+
     @staticmethod
     def parse_lines(lines: List[str]) -> List[Dict]:
         parsed = []
@@ -0,0 +1,130 @@
+import re
+from typing import Dict, Optional, Tuple
+from core.timestamps import parse_rfc3339
+
+# Single-pass scanner for RFC 5424 syslog lines, used by SyslogParser:
+#
+#   <PRI>VERSION SP TIMESTAMP SP HOSTNAME SP APP-NAME SP PROCID SP MSGID SP STRUCTURED-DATA [SP MSG]
+#
+# PRI is decoded through a precomputed table, "-" (NILVALUE) becomes None and
+# STRUCTURED-DATA becomes {sd_id: {param: value}} with \" \\ and \] escapes
+# resolved. A parameter repeated within one element (allowed by the RFC)
+# collects its values in a list.
+
+FACILITIES = ("kern", "user", "mail", "daemon", "auth", "syslog", "lpr", "news", "uucp", "cron", "authpriv",
+              "ftp", "ntp", "audit", "alert", "clock", "local0", "local1", "local2", "local3", "local4",
+              "local5", "local6", "local7")
+SEVERITIES = ("emerg", "alert", "crit", "err", "warning", "notice", "info", "debug")
+
+# "<PRI>" digits -> (priority, facility, severity); only the canonical
+# spelling (no leading zeros) of 0..191 is valid
+_PRI = {str(priority): (priority, FACILITIES[priority >> 3], SEVERITIES[priority & 7]) for priority in range(192)}
+
+NILVALUE = "-"
+BOM = "\ufeff"
+
+# Tokens of STRUCTURED-DATA. SD-NAME is 1 to 32 printable US-ASCII characters
+# except '=', SP, ']' and '"'; PARAM-VALUE runs to the first '"' that isn't
+# escaped. Only \" \\ and \] are escapes, any other backslash is kept as is.
+_SD_NAME = r'[!#-<>-\\^-~]{1,32}'
+_SD_VALUE = r'[^"\\]*(?:\\.[^"\\]*)*'
+# One SD-ELEMENT: (SD-ID, all its params), matched in one go
+_SD_ELEMENT = re.compile(rf'\[({_SD_NAME})((?: {_SD_NAME}="{_SD_VALUE}")*)\]', re.DOTALL).match
+_sd_params = re.compile(rf' ({_SD_NAME})="({_SD_VALUE})"', re.DOTALL).findall
+_unescape = re.compile(r'\\(["\\\]])').sub
+
+
+def scan_structured_data(text: str, start: int = 0) -> Optional[Tuple[Dict[str, Dict], int]]:
+    """
+    Parse the SD-ELEMENTs at ``text[start:]``: ({sd_id: {param: value}}, end)
+    with ``end`` just past the last "]", or None if there are none.
+    """
+    elements: Dict[str, Dict] = {}
+    pos = start
+    while True:
+        match = _SD_ELEMENT(text, pos)
+        if match is None:
+            break
+        sd_id, raw_params = match.groups()
+        if "\\" in raw_params:
+            pairs = [(name, _unescape(r"\1", value)) for name, value in _sd_params(raw_params)]
+        elif raw_params:
+            # No escapes means no '"' inside values: split on the quotes
+            pairs = [param.split('="', 1) for param in raw_params[1:-1].split('" ')]
+        else:
+            pairs = []
+        params = dict(pairs)
+        if len(params) < len(pairs):
+            # Repeated param names (allowed by the RFC) keep every value
+            params = {}
+            for name, value in pairs:
+                previous = params.get(name)
+                if previous is None:
+                    params[name] = value
+                elif isinstance(previous, list):
+                    previous.append(value)
+                else:
+                    params[name] = [previous, value]
+        # Repeated SD-IDs (not allowed, but seen in the wild) are merged
+        if sd_id in elements:
+            elements[sd_id].update(params)
+        else:
+            elements[sd_id] = params
+        pos = match.end()
+    if pos == start:
+        return None
+    return elements, pos
+
+
+def scan_rfc5424(line: str) -> Optional[Dict]:
+    """
+    Parse an RFC 5424 line into SyslogParser's record layout, or None if
+    it isn't one.
+    """
+    if line[:1] == BOM:
+        line = line[1:]
+    line = line.rstrip("\r\n")
+    if line[:1] != "<":
+        return None
+    close = line.find(">", 1, 5)
+    pri = _PRI.get(line[1:close]) if close > 0 else None
+    if pri is None:
+        return None
+    fields = line[close + 1:].split(" ", 6)
+    if len(fields) != 7:
+        return None
+    version, timestamp, host, app, pid, msgid, rest = fields
+    if version != "1" and not (version.isascii() and version.isdigit() and version[0] != "0" and len(version) <= 3):
+        return None
+    if not (timestamp and host and app and pid and msgid):
+        return None
+
+    if rest[:1] == NILVALUE:
+        structured_data, end = None, 1
+    else:
+        scanned = scan_structured_data(rest)
+        if scanned is None:
+            return None
+        structured_data, end = scanned
+    if end == len(rest):
+        message = None
+    elif rest[end] == " ":
+        message = rest[end + 1:]
+        if message.startswith(BOM):
+            message = message[1:]
+    else:
+        return None
+
+    return {
+        "priority": pri[0],
+        "facility": pri[1],
+        "severity": pri[2],
+        "version": 1 if version == "1" else int(version),
+        "timestamp": None if timestamp == NILVALUE else parse_rfc3339(timestamp),
+        "host": None if host == NILVALUE else host,
+        "app": None if app == NILVALUE else app,
+        "pid": None if pid == NILVALUE else pid,
+        "msgid": None if msgid == NILVALUE else msgid,
+        "structured_data": structured_data,
+        "message": message,
+    }
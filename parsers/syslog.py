@@ -1,9 +1,20 @@
 import re
-from typing import Dict, List, Optional
-from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Union
+from core.timestamps import parse_rfc3164
+from core.record import LazyRecord, decode, text_field
+from parsers.rfc5424 import scan_rfc5424
 from core.logger import log
+from core.parse_failures import record_failure, record_match
+
+# Lazy records for RFC 3164 bytes lines; same fields, order and conversions as the str path
+RFC3164_SCHEMA = {name: text_field(name) for name in ("month", "day", "time", "host", "app", "pid", "message")}
+RFC3164_SCHEMA["timestamp"] = lambda raw: parse_rfc3164(decode(raw["month"]), decode(raw["day"]), decode(raw["time"]))
+
 
 class SyslogParser:
+    # Fields whose values are copied unchanged from the raw line (see core.prefilter)
+    VERBATIM_FIELDS = ("host", "app", "pid", "message")
+
     # RFC 3164 example: "Oct 11 22:14:15 hostname appname[123]: message"
     RFC3164_REGEX = re.compile(
         r'(?P<month>\w{3})\s+(?P<day>\d{1,2})\s+'
@@ -13,48 +24,74 @@ class SyslogParser:
         r'(?P<message>.+)'
     )
 
-    # RFC 5424 example: "<34>1 2025-09-14T22:14:15Z hostname appname 123 ID47 - message"
-    RFC5424_REGEX = re.compile(
-        r'<(?P<priority>\d+)>(?P<version>\d+) '
-        r'(?P<timestamp>[\d\-T:.Z]+) '
-        r'(?P<host>\S+) '
-        r'(?P<app>\S+) '
-        r'(?P<pid>\S+) '
-        r'(?P<msgid>\S+) '
-        r'(?P<structured_data>-|\[.*?\]) '
-        r'(?P<message>.+)'
-    )
+    # RFC 5424 example: "<34>1 2025-09-14T22:14:15Z hostname appname 123 ID47 [id@1 a="b"] message"
+    # is handled by parsers.rfc5424.scan_rfc5424, which also decodes PRI and
+    # the structured data.
+
+    # The same pattern for bytes lines, which are decoded field by field
+    RFC3164_BYTES_REGEX = re.compile(RFC3164_REGEX.pattern.encode())
 
     @staticmethod
-    def parse_line(line: str) -> Optional[Dict]:
-        match = SyslogParser.RFC5424_REGEX.match(line)
-        if not match:
-            match = SyslogParser.RFC3164_REGEX.match(line)
-        if not match:
-            log(f"Failed to parse syslog line: {line}", level="WARN")
+    def parse_line(line: Union[str, bytes]) -> Optional[Dict]:
+        if isinstance(line, str):
+            data = scan_rfc5424(line)
+            if data is None:
+                match = SyslogParser.RFC3164_REGEX.match(line)
+                data = SyslogParser._build(match.groupdict()) if match else None
+        else:
+            data = SyslogParser._parse_bytes(line)
+        if data is None:
+            record_failure("syslog", line)
             return None
+        record_match("syslog")
+        return data
 
-        data = match.groupdict()
-
-        # Convert timestamp if possible
-        if 'timestamp' in data and data['timestamp']:
-            try:
-                dt = datetime.fromisoformat(data['timestamp'].replace('Z', '+00:00'))
-                data['timestamp'] = dt.isoformat()
-            except Exception:
-                data['timestamp'] = None
-        else:
-            # RFC 3164: construct timestamp with current year
-            try:
-                current_year = datetime.utcnow().year
-                dt_str = f"{data['month']} {data['day']} {current_year} {data['time']}"
-                dt = datetime.strptime(dt_str, "%b %d %Y %H:%M:%S")
-                data['timestamp'] = dt.isoformat()
-            except Exception:
-                data['timestamp'] = None
+    @staticmethod
+    def _parse_bytes(line) -> Optional[Dict]:
+        if line[:1] == b"<":
+            # Structured data is unescaped anyway; decoding the whole line
+            # escapes invalid UTF-8 exactly as decoding each field would
+            data = scan_rfc5424(decode(line))
+            if data is not None:
+                return data
+        match = SyslogParser.RFC3164_BYTES_REGEX.match(line)
+        return LazyRecord(match.groupdict(), RFC3164_SCHEMA) if match else None
 
+    @staticmethod
+    def _build(data: Dict) -> Dict:
+        # RFC 3164: construct timestamp with current year
+        data['timestamp'] = parse_rfc3164(data['month'], data['day'], data['time'])
         return data
 
+    @staticmethod
+    def parse_batch(lines: Iterable[str], rejects: Optional[list] = None) -> List[Dict]:
+        """
+        Parse many lines at once. Lines that don't match are counted in
+        core.parse_failures and, if given, appended to ``rejects``.
+        """
+        rfc5424 = scan_rfc5424
+        rfc3164 = SyslogParser.RFC3164_REGEX.match
+        build = SyslogParser._build
+        parse_bytes = SyslogParser._parse_bytes
+        parsed = []
+        append = parsed.append
+        for line in lines:
+            if line.__class__ is str:
+                data = rfc5424(line)
+                if data is None:
+                    match = rfc3164(line)
+                    data = build(match.groupdict()) if match else None
+            else:
+                data = parse_bytes(line)
+            if data is None:
+                record_failure("syslog", line)
+                if rejects is not None:
+                    rejects.append(line)
+                continue
+            append(data)
+        record_match("syslog", len(parsed))
+        return parsed
+
     @staticmethod
     def parse_lines(lines: List[str]) -> List[Dict]:
         parsed = []
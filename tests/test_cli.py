@@ -1,7 +1,11 @@
+import subprocess
+import sys
 import unittest
 from cli import utils
 from cli import tail
 
+HEAVY_MODULES = ["pandas", "sklearn", "elasticsearch", "boto3", "google.cloud.storage", "azure.storage.blob"]
+
 class TestCLI(unittest.TestCase):
     def test_read_file(self):
         lines = utils.read_file("tests/sample.log")
@@ -16,3 +20,377 @@ class TestCLI(unittest.TestCase):
             self.assertIsInstance(result, list)
         else:
             self.skipTest("Tail class not implemented")
+
+    def test_tail_startup_skips_heavy_dependencies(self):
+        code = (
+            "import sys, cli.index, cli.tail, core.output_manager, core.parser_manager\n"
+            f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], "[]")
+
+    def test_parse_memory_does_not_grow_with_input(self):
+        import json
+        import os
+        import random
+        import tempfile
+        import tracemalloc
+        from core import mapped, output_manager, pipeline
+        from cli.parse import LogParser
+        from benchmarks.bench_prefilter import make_lines
+
+        def peak_memory(lines: int, mmap_min_bytes: int, output_type: str = "json") -> int:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "access.log")
+                with open(path, "w") as f:
+                    f.writelines(make_lines(lines, 0.1, random.Random(42)))
+                output_dir, chunk_bytes = output_manager.OUTPUT_DIR, pipeline.READ_CHUNK_BYTES
+                output_manager.OUTPUT_DIR, pipeline.READ_CHUNK_BYTES = tmp, 16_384
+                mapped.MMAP_MIN_BYTES = mmap_min_bytes
+                tracemalloc.start()
+                try:
+                    LogParser("nginx", output_type, flush_size=200).run([path])
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+                    output_manager.OUTPUT_DIR, pipeline.READ_CHUNK_BYTES = output_dir, chunk_bytes
+                    mapped.MMAP_MIN_BYTES = mmap_min_bytes_default
+                # Every record still reaches the output
+                if output_type == "parquet":
+                    import pandas as pd
+                    self.assertEqual(len(pd.read_parquet(os.path.join(tmp, "unilog_export.parquet"))), lines)
+                else:
+                    with open(os.path.join(tmp, "unilog_export.json")) as f:
+                        self.assertEqual(len(json.load(f)), lines)
+                return peak
+
+        mmap_min_bytes_default = mapped.MMAP_MIN_BYTES
+        # Streamed reads (the default) and memory-mapped ones
+        for mmap_min_bytes in (0, 1):
+            small, large = peak_memory(1_000, mmap_min_bytes), peak_memory(8_000, mmap_min_bytes)
+            self.assertLess(large, small * 1.5)
+
+        # Parquet output appends row groups instead of rewriting the file per flush
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return
+        small, large = peak_memory(1_000, 0, "parquet"), peak_memory(8_000, 0, "parquet")
+        self.assertLess(large, small * 1.5)
+
+    def test_mapped_file(self):
+        import os
+        import random
+        import tempfile
+        from concurrent.futures import ThreadPoolExecutor
+        from core.mapped import INDEX_SUFFIX, MappedFile
+
+        rng = random.Random(7)
+        lines = [b"x" * rng.randrange(300) + b"\n" for _ in range(5_000)] + [b"no newline"]
+        starts = [0]
+        for line in lines:
+            starts.append(starts[-1] + len(line))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "access.log")
+            with open(path, "wb") as f:
+                f.writelines(lines)
+            with MappedFile(path) as mapped:
+                self.assertEqual([line for chunk in mapped.chunks(chunk_bytes=1000) for line in chunk], lines)
+                self.assertEqual(mapped.line_at(starts[42] + 5), lines[42])
+                # Parallel readers over one mapping
+                with ThreadPoolExecutor(4) as pool:
+                    parts = pool.map(lambda span: list(mapped.lines(*span)), mapped.ranges(4))
+                self.assertEqual([line for part in parts for line in part], lines)
+                for stride in (1, 7, 1024):
+                    mapped.load_index(stride, sidecar=False)
+                    for number in (0, 6, 7, 1024, 4_999, 5_000):
+                        self.assertEqual(mapped.line_offset(number), starts[number])
+                mapped.load_index(64)
+            self.assertTrue(os.path.exists(path + INDEX_SUFFIX))
+
+            # Appended lines extend the saved index
+            with open(path, "ab") as f:
+                f.write(b" ends here\nmore\n")
+            with MappedFile(path) as mapped:
+                self.assertEqual(mapped._read_index().lines, 5_000)
+                self.assertEqual(mapped.load_index(64).lines, 5_002)
+                self.assertEqual(mapped.line_at(mapped.line_offset(5_001)), b"more\n")
+            # A rewritten file gets a fresh one
+            with open(path, "wb") as f:
+                f.write(b"new\n")
+            with MappedFile(path) as mapped:
+                self.assertIsNone(mapped._read_index())
+                self.assertEqual(mapped.load_index(64).lines, 1)
+
+    def test_tail_engine(self):
+        import os
+        import tempfile
+        import time
+        from core.tail_engine import TailEngine
+
+        def lines_of(batches):
+            return [line for _, lines in batches for line in lines]
+
+        for use_inotify in (True, False):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "access.log")
+                state = os.path.join(tmp, "tail.json")
+                with open(path, "wb") as f:
+                    f.write(b"one\ntwo\nthr")
+                with TailEngine([path], state, poll_interval=0.05, use_inotify=use_inotify) as engine:
+                    # A half-written line waits for its newline
+                    self.assertEqual(lines_of(engine.poll(0)), [b"one\n", b"two\n"])
+                    with open(path, "ab") as f:
+                        f.write(b"ee\n")
+                    start = time.monotonic()
+                    self.assertEqual(lines_of(engine.poll(2)), [b"three\n"])
+                    if engine.inotify is not None:
+                        self.assertLess(time.monotonic() - start, 0.1)
+                    engine.commit(force=True)
+
+                # A restart resumes from the checkpoint
+                with TailEngine([path], state, poll_interval=0.05, use_inotify=use_inotify) as engine:
+                    self.assertEqual(lines_of(engine.poll(0)), [])
+                    # Rename + create rotation; the writer still finishes its line in the old file
+                    writer = open(path, "ab")
+                    writer.write(b"fo")
+                    writer.flush()
+                    os.rename(path, path + ".1")
+                    with open(path, "wb") as f:
+                        f.write(b"five\n")
+                    self.assertEqual(lines_of(engine.poll(2)), [b"five\n"])
+                    writer.write(b"ur\n")
+                    writer.close()
+                    self.assertEqual(lines_of(engine.poll(2)), [b"four\n"])
+
+                    # copytruncate
+                    with open(path, "wb") as f:
+                        f.write(b"six\n")
+                    self.assertEqual(lines_of(engine.poll(2)), [b"six\n"])
+                    engine.commit(force=True)
+
+                with TailEngine([path], state, use_inotify=use_inotify) as engine:
+                    with open(path, "ab") as f:
+                        f.write(b"seven\n")
+                    self.assertEqual(lines_of(engine.poll(0)), [b"seven\n"])
+                    # Lines that failed to be output aren't checkpointed
+                    engine.discard()
+                    engine.commit(force=True)
+
+                with TailEngine([path], state, use_inotify=use_inotify) as engine:
+                    self.assertEqual(lines_of(engine.poll(0)), [b"seven\n"])
+                    # Confirmed for an output that delivers later: saved by the next commit only
+                    engine.commit(save=False)
+
+                with TailEngine([path], state, use_inotify=use_inotify) as engine:
+                    self.assertEqual(lines_of(engine.poll(0)), [b"seven\n"])
+                    engine.commit(save=False)
+                    engine.commit(force=True)
+
+                with TailEngine([path], state, use_inotify=use_inotify) as engine:
+                    self.assertEqual(lines_of(engine.poll(0)), [])
+
+    def test_ingest_checkpoints(self):
+        import gzip
+        import json
+        import os
+        import random
+        import tempfile
+        from core import output_manager
+        from cli.ingest import LogIngestor
+        from benchmarks.bench_prefilter import make_lines
+
+        rng = random.Random(7)
+        with tempfile.TemporaryDirectory() as tmp:
+            logs, state = os.path.join(tmp, "logs"), os.path.join(tmp, "state", "checkpoints.json")
+            os.makedirs(logs)
+            path = os.path.join(logs, "access.log")
+            export = os.path.join(tmp, "unilog_export.json")
+
+            def ingest(output_type="json", jobs=1) -> int:
+                before = 0
+                if os.path.exists(export):
+                    with open(export) as f:
+                        before = len(json.load(f))
+                output_dir = output_manager.OUTPUT_DIR
+                output_manager.OUTPUT_DIR = tmp
+                try:
+                    LogIngestor([logs], "nginx", output_type, jobs=jobs, checkpoint_file=state, flush_size=50).run()
+                finally:
+                    output_manager.OUTPUT_DIR = output_dir
+                with open(export) as f:
+                    return len(json.load(f)) - before
+
+            lines = make_lines(300, 0.1, rng)
+            with open(path, "w") as f:
+                f.writelines(lines)
+                # A line still being written is left for the next run
+                f.write(lines[0][:40])
+            self.assertEqual(ingest(), 300)
+            self.assertEqual(ingest(), 0)
+
+            with open(path, "a") as f:
+                f.write(lines[0][40:])
+                f.writelines(lines[:9])
+            self.assertEqual(ingest(), 10)
+
+            # A failed output isn't checkpointed, so the data is read again
+            with open(path, "a") as f:
+                f.writelines(lines[:5])
+            self.assertEqual(ingest("unsupported"), 0)
+            self.assertEqual(ingest(), 5)
+
+            # Truncated in place (copytruncate) and rotated (new inode): both start over
+            with open(path, "w") as f:
+                f.writelines(lines[:20])
+            self.assertEqual(ingest(), 20)
+            os.rename(path, path + ".1")
+            with open(path, "w") as f:
+                f.writelines(lines[:30])
+            self.assertEqual(ingest(), 30)
+            self.assertEqual(ingest(), 0)
+
+            # The rotated file is compressed later (delaycompress): a new inode, but already ingested
+            def compress(source, archive):
+                with open(source, "rb") as f, gzip.open(archive, "wb") as out:
+                    out.write(f.read())
+                os.remove(source)
+
+            compress(path + ".1", path + ".2.gz")
+            self.assertEqual(ingest(), 0)
+            # Rotated and compressed at once, with lines added after the last run
+            with open(path, "a") as f:
+                f.writelines(lines[:7])
+            os.rename(path, path + ".1")
+            compress(path + ".1", path + ".1.gz")
+            with open(path, "w") as f:
+                f.writelines(lines[:4])
+            self.assertEqual(ingest(jobs=2), 11)
+            self.assertEqual(ingest(jobs=2), 0)
+
+    def test_ingest_checkpoints_wait_for_deferred_outputs(self):
+        import json
+        import os
+        import random
+        import tempfile
+        from core import output_manager
+        from cli.ingest import LogIngestor
+        from benchmarks.bench_prefilter import make_lines
+
+        def failing_upload(path):
+            raise OSError("no credentials")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            logs, state = os.path.join(tmp, "logs"), os.path.join(tmp, "checkpoints.json")
+            os.makedirs(logs)
+            with open(os.path.join(logs, "access.log"), "w") as f:
+                f.writelines(make_lines(120, 0.1, random.Random(3)))
+            uploads = []
+            output_dir, providers = output_manager.OUTPUT_DIR, output_manager.CLOUD_PROVIDERS.copy()
+            output_manager.OUTPUT_DIR = tmp
+            try:
+                # The records are written locally on every flush, but only shipped by close()
+                output_manager.CLOUD_PROVIDERS["s3"] = failing_upload
+                LogIngestor([logs], "nginx", "s3", checkpoint_file=state, flush_size=50).run()
+                self.assertFalse(os.path.exists(state))
+
+                output_manager.CLOUD_PROVIDERS["s3"] = uploads.append
+                LogIngestor([logs], "nginx", "s3", checkpoint_file=state, flush_size=50).run()
+                self.assertEqual(len(uploads), 1)
+                LogIngestor([logs], "nginx", "s3", checkpoint_file=state, flush_size=50).run()
+            finally:
+                output_manager.OUTPUT_DIR, output_manager.CLOUD_PROVIDERS = output_dir, providers
+            # The first run's records are in the local file twice, the last run read nothing
+            with open(os.path.join(tmp, "unilog_export.json")) as f:
+                self.assertEqual(len(json.load(f)), 240)
+
+    def test_ingest_does_not_checkpoint_failed_shards(self):
+        import json
+        import os
+        import random
+        import tempfile
+        from unittest import mock
+        from core import output_manager, shard_parser
+        from cli.ingest import LogIngestor
+        from benchmarks.bench_prefilter import make_lines
+
+        rng = random.Random(11)
+        read_range = shard_parser.read_range
+
+        def failing_read_range(path, start, end):
+            if os.path.basename(path) == "bad.log":
+                raise OSError("disk error")
+            return read_range(path, start, end)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            logs, state = os.path.join(tmp, "logs"), os.path.join(tmp, "checkpoints.json")
+            os.makedirs(logs)
+            paths = [os.path.join(logs, name) for name in ("bad.log", "good.log")]
+            for path in paths:
+                with open(path, "w") as f:
+                    f.writelines(make_lines(100, 0.1, rng))
+
+            with mock.patch.object(shard_parser, "read_range", failing_read_range):
+                # Worker processes and the in-process branch flag the failed range
+                for jobs, shard_bytes in ((2, 4_096), (1, shard_parser.SHARD_BYTES)):
+                    shards = shard_parser.plan_shards(paths, "nginx", shard_bytes)
+                    for shard, records, ok in shard_parser.parse_shards(shards, jobs):
+                        self.assertEqual(ok, [entry[0] == paths[1] for entry in shard])
+
+                output_dir = output_manager.OUTPUT_DIR
+                output_manager.OUTPUT_DIR = tmp
+                try:
+                    LogIngestor([logs], "nginx", "json", jobs=2, checkpoint_file=state).run()
+                finally:
+                    output_manager.OUTPUT_DIR = output_dir
+            with open(os.path.join(tmp, "unilog_export.json")) as f:
+                self.assertEqual(len(json.load(f)), 100)
+
+            # The failed file wasn't checkpointed, so the next run reads it
+            output_manager.OUTPUT_DIR = tmp
+            try:
+                LogIngestor([logs], "nginx", "json", jobs=2, checkpoint_file=state).run()
+            finally:
+                output_manager.OUTPUT_DIR = output_dir
+            with open(os.path.join(tmp, "unilog_export.json")) as f:
+                self.assertEqual(len(json.load(f)), 200)
+
+    def test_ingest_reads_rotated_archives(self):
+        import bz2
+        import json
+        import lzma
+        import os
+        import random
+        import tempfile
+        from core import output_manager
+        from core.compressed import bgzf_compress
+        from cli.ingest import LogIngestor
+        from benchmarks.bench_prefilter import make_lines
+
+        rng = random.Random(3)
+        with tempfile.TemporaryDirectory() as tmp:
+            logs = os.path.join(tmp, "logs")
+            os.makedirs(logs)
+            files = {"access.log.3.xz": lzma.compress, "access.log.2.bz2": bz2.compress,
+                     "access.log.1.gz": bgzf_compress, "access.log": bytes}
+            expected = []
+            for name, compress in files.items():
+                lines = make_lines(100, 0.1, rng)
+                expected.extend(line.split(" HTTP/")[0].split()[-1] for line in lines)
+                with open(os.path.join(logs, name), "wb") as f:
+                    f.write(compress("".join(lines).encode()))
+
+            output_dir = output_manager.OUTPUT_DIR
+            output_manager.OUTPUT_DIR = tmp
+            try:
+                for jobs in (1, 2):
+                    state = os.path.join(tmp, f"checkpoints{jobs}.json")
+                    LogIngestor([logs], "nginx", "json", jobs=jobs, checkpoint_file=state).run()
+                    # Unchanged archives are skipped on the next run
+                    LogIngestor([logs], "nginx", "json", jobs=jobs, checkpoint_file=state).run()
+            finally:
+                output_manager.OUTPUT_DIR = output_dir
+            with open(os.path.join(tmp, "unilog_export.json")) as f:
+                paths = [record["path"] for record in json.load(f)]
+            # Oldest archive first, each run reading everything once
+            self.assertEqual(paths, expected * 2)
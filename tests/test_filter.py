@@ -0,0 +1,215 @@
+import importlib.util
+import math
+import random
+import unittest
+from core.filter import apply_filter, compile_rules
+from core.filter_expr import compile_expression, parse_expression
+from core.prefilter import build_prefilter, regex_literals
+
+HAS_PANDAS = importlib.util.find_spec("pandas") is not None
+
+
+class TestCompiledFilter(unittest.TestCase):
+    RULES = [
+        {"field": "status", "gt": 199},
+        {"field": "status", "lt": "600"},
+        {"field": "level", "in": ["ERROR", "WARN"]},
+        {"field": "method", "equals": "GET"},
+        {"field": "message", "regex": "timeout|failed"},
+        {"field": "host", "in": "web-1 web-2"},
+        {"field": "size", "gt": "not-a-number"},
+        {"field": "path"},
+    ]
+
+    def random_record(self, rng):
+        record = {}
+        choices = {
+            "status": [200, 404, 500, "500", "abc", 99, float("nan"), 700],
+            "level": ["ERROR", "WARN", "INFO", 3],
+            "method": ["GET", "POST"],
+            "message": ["request timeout", "ok", "failed twice", 42],
+            "host": ["web-1", "web-3", "web"],
+            "size": [10, "x"],
+            "path": ["/"],
+        }
+        for field, values in choices.items():
+            if rng.random() < 0.8:
+                record[field] = rng.choice(values)
+        return record
+
+    def test_matches_apply_filter(self):
+        rng = random.Random(7)
+        for _ in range(2000):
+            rules = rng.sample(self.RULES, rng.randint(0, len(self.RULES)))
+            record = self.random_record(rng)
+            compiled = compile_rules(rules)
+            self.assertIs(compiled(record), apply_filter(record, rules), (record, rules))
+
+    def test_filter_batch(self):
+        rules = [{"field": "status", "equals": 500}, {"field": "message", "regex": "time"}]
+        records = [
+            {"status": 500, "message": "timeout"},
+            {"status": 200, "message": "timeout"},
+            None,
+            {"message": "no status, timeout"},
+            {"status": 500, "message": "ok"},
+        ]
+        self.assertEqual(compile_rules(rules).filter_batch(records), [records[0], records[3]])
+
+    def test_unhashable_values_fall_back_to_list_membership(self):
+        compiled = compile_rules([{"field": "tags", "in": [["a"], ["b"]]}])
+        self.assertIsNotNone(compiled({"tags": ["a"]}))
+        compiled = compile_rules([{"field": "tags", "in": ["a", "b"]}])
+        self.assertIsNone(compiled({"tags": ["a"]}))
+
+    def test_nan_is_kept_like_apply_filter(self):
+        rules = [{"field": "latency", "gt": 1.5}]
+        record = {"latency": math.nan}
+        self.assertIs(compile_rules(rules)(record), apply_filter(record, rules))
+
+
+class TestFilterExpressions(unittest.TestCase):
+    def test_boolean_logic(self):
+        expr = compile_rules('status >= 500 and (message ~ "timeout|failed" or not level in [DEBUG, "INFO"])')
+        self.assertIsNotNone(expr({"status": 503, "message": "upstream timeout", "level": "INFO"}))
+        self.assertIsNotNone(expr({"status": 500, "message": "ok", "level": "ERROR"}))
+        self.assertIsNone(expr({"status": 500, "message": "ok", "level": "INFO"}))
+        self.assertIsNone(expr({"status": 200, "message": "timeout"}))
+        # Missing fields pass their comparisons, as with rule lists
+        self.assertIsNotNone(expr({"level": "ERROR"}))
+
+    def test_rule_list_equivalence(self):
+        rng = random.Random(3)
+        generator = TestCompiledFilter()
+        for _ in range(500):
+            rules = rng.sample(TestCompiledFilter.RULES, rng.randint(0, len(TestCompiledFilter.RULES)))
+            compiled = compile_expression(rules, sample_every=3, reorder_every=2)
+            for _ in range(10):
+                record = generator.random_record(rng)
+                self.assertIs(compiled(record), apply_filter(record, rules), (record, rules))
+
+    def test_reorders_selective_clause_first(self):
+        expr = compile_expression('message ~ "(a|b|c)+x" and status == 500', sample_every=1, reorder_every=50)
+        records = [{"message": "abc" * 50, "status": 200 if i % 20 else 500} for i in range(200)]
+        expr.filter_batch(records)
+        self.assertEqual(expr.root.children[0].text, "status == 500")
+        stats = expr.stats()
+        self.assertEqual(stats[0]["evaluations"], 200)
+        self.assertAlmostEqual(next(s for s in stats if s["clause"] == "status == 500")["pass_rate"], 0.05)
+
+    def test_measuring_skips_errors_of_short_circuited_clauses(self):
+        record = {"status": 200, "size": None}
+        rules = [{"field": "status", "equals": 500}, {"field": "size", "gt": 10}]
+        for expr in ("status == 500 and size > 10", "status == 200 or size > 10", rules):
+            compiled = compile_expression(expr, sample_every=1, reorder_every=10_000)
+            expected = compiled.root.evaluate(record)
+            # Every call is a measuring one
+            for _ in range(20):
+                self.assertIs(compiled(record) is not None, expected, expr)
+        self.assertIsNone(apply_filter(record, rules))
+
+    def test_countdown_overshoot_still_samples(self):
+        expr = compile_expression("status == 500", sample_every=4)
+        # Where threads racing on the countdown can leave it
+        expr._countdown = -3
+        expr({"status": 500})
+        self.assertEqual(expr._samples, 1)
+        self.assertEqual(expr._countdown, 4)
+
+    def test_syntax_errors(self):
+        for text in ["status ==", "(status == 1", "status = 1", "and", "status in 5"]:
+            with self.assertRaises(ValueError, msg=text):
+                parse_expression(text)
+
+
+class TestPrefilter(unittest.TestCase):
+    FILTERS = [
+        [{"field": "path", "regex": "timeout|failed"}],
+        [{"field": "method", "equals": "POST"}, {"field": "status", "gt": 399}],
+        [{"field": "user_agent", "regex": r"^curl/\d"}, {"field": "ip", "in": ["10.0.0.1", "10.0.0.2"]}],
+        [{"field": "referer", "in": [None, "-"]}, {"field": "protocol", "equals": "HTTP/1.1"}],
+        'path ~ "/api/(v1|v2)/" and (method == "GET" or user_agent ~ "bot")',
+        'not path ~ "health" and ip in ["10.0.0.1"]',
+    ]
+
+    def random_line(self, rng):
+        ip = rng.choice(["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        user = rng.choice(["-", "None", "frank"])
+        method = rng.choice(["GET", "POST", "PUT"])
+        path = rng.choice(["/api/v1/items", "/api/v3/items", "/health", "/jobs/failed", "/admin", "/q?timeout=1"])
+        request = rng.choice([f"{method} {path} HTTP/1.1", f"{method} {path}", "-"])
+        agent = rng.choice(["curl/8.0", "Mozilla/5.0 (curl/8.0)", "Googlebot", "-"])
+        status = rng.choice([200, 404, 500])
+        return (f'{ip} - {user} [10/Oct/2000:13:55:36 -0700] "{request}" {status} '
+                f'{rng.randrange(1000)} "{rng.choice(["-", "http://x/failed"])}" "{agent}"')
+
+    def test_regex_literals(self):
+        self.assertEqual(regex_literals("timeout|failed"), ("timeout", "failed"))
+        self.assertEqual(regex_literals("^GET /api/(v1|v2)/x"), ("GET /api/",))
+        self.assertEqual(regex_literals(r"\d+ ms"), (" ms",))
+        self.assertIsNone(regex_literals("(?i)timeout"))
+        self.assertIsNone(regex_literals("a|b*"))
+
+    def test_never_drops_a_kept_line(self):
+        from core import parse_failures
+        from parsers.nginx import NginxParser
+
+        rng = random.Random(5)
+        lines = [self.random_line(rng) for _ in range(500)]
+        records = [NginxParser.parse_line(line) for line in lines]
+        for rules in self.FILTERS:
+            record_filter = compile_rules(rules)
+            prefilter = build_prefilter(record_filter, NginxParser.VERBATIM_FIELDS)
+            self.assertIsNotNone(prefilter, rules)
+            buffer_lines = set(prefilter.filter_buffer("\n".join(lines).encode("utf-8")))
+            dropped = 0
+            for line, record in zip(lines, records):
+                if record and record_filter(record) is not None:
+                    self.assertTrue(prefilter(line), (rules, line))
+                    self.assertTrue(prefilter(line.encode("utf-8")), (rules, line))
+                    self.assertTrue({line.encode("utf-8"), line.encode("utf-8") + b"\n"} & buffer_lines)
+                dropped += not prefilter(line)
+            self.assertGreater(dropped, 0, rules)
+
+            # Dropped lines are counted apart from parse results
+            with parse_failures.source("prefilter-test"):
+                kept = prefilter.filter_lines(lines, "nginx")
+            stats = parse_failures.get_stats(parser="nginx", source="prefilter-test")[0]
+            self.assertEqual((stats["prefiltered"], stats["total"]), (len(lines) - len(kept), 0))
+            self.assertEqual(len(kept), len(lines) - dropped)
+            parse_failures.reset()
+
+    def test_nothing_to_prefilter(self):
+        self.assertIsNone(build_prefilter(compile_rules([{"field": "status", "equals": 500}]), ("ip", "path")))
+        self.assertIsNone(build_prefilter(compile_rules([{"field": "message", "regex": "x"}]), ()))
+        # A None field is compared as "None"; case-insensitive regexes have no literal
+        rules = [{"field": "user", "regex": "No"}, {"field": "path", "regex": "(?i)ADMIN"}]
+        self.assertIsNone(build_prefilter(compile_rules(rules), ("user", "path")))
+        self.assertIsNone(build_prefilter(compile_rules('status >= 500 or path ~ "failed"'), ("path",)))
+
+
+@unittest.skipUnless(HAS_PANDAS, "columnar filtering needs numpy and pandas")
+class TestColumnarFilter(unittest.TestCase):
+    def test_matches_apply_filter(self):
+        from core.columnar_filter import ColumnBatch, filter_columns
+
+        rng = random.Random(11)
+        generator = TestCompiledFilter()
+        for _ in range(200):
+            rules = rng.sample(TestCompiledFilter.RULES, rng.randint(0, len(TestCompiledFilter.RULES)))
+            records = [generator.random_record(rng) for _ in range(50)]
+            expected = [r for r in records if apply_filter(r, rules)]
+            kept = filter_columns(ColumnBatch.from_records(records), rules).to_records()
+            self.assertEqual([id(r) for r in kept], [id(r) for r in expected], rules)
+
+    def test_dataframe_and_typed_columns(self):
+        import numpy as np
+        import pandas as pd
+        from core.columnar_filter import filter_columns
+
+        frame = pd.DataFrame({"status": [200, 500, 503], "message": ["ok", "timeout", "failed"]})
+        rules = [{"field": "status", "gt": 499}, {"field": "message", "regex": "^t"}]
+        self.assertEqual(filter_columns(frame, rules)["status"].tolist(), [500])
+
+        columns = filter_columns({"status": np.array([200, 500, 503])}, [{"field": "status", "in": [500, 503]}])
+        self.assertEqual(columns["status"].tolist(), [500, 503])
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from core import logger
+from core.logger import BufferedFileHandler, LogLevel
+
+
+class TestLogger(unittest.TestCase):
+    def test_log_to_file_after_flush(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sub", "unilog.log")
+            logger.log("first", file=path, console=False)
+            logger.log("second", level="WARN", file=path, console=False)
+            logger.flush()
+            with open(path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+            logger._handlers.pop(path).close()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].endswith("[INFO] first"))
+        self.assertTrue(lines[1].endswith("[WARNING] second"))
+
+    def test_daily_rollover(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            handler = BufferedFileHandler(directory=tmp)
+            handler.emit("a", "2026-01-01")
+            handler.emit("b", "2026-01-01")
+            handler.emit("c", "2026-01-02")
+            handler.close()
+            self.assertEqual(sorted(os.listdir(tmp)), ["2026-01-01.log", "2026-01-02.log"])
+            with open(os.path.join(tmp, "2026-01-02.log"), encoding="utf-8") as f:
+                self.assertEqual(f.read(), "c\n")
+
+    def test_string_levels(self):
+        self.assertEqual(logger._resolve_level("WARN"), LogLevel.WARNING)
+        self.assertEqual(logger._resolve_level("error"), LogLevel.ERROR)
+        self.assertEqual(logger._resolve_level(LogLevel.DEBUG), LogLevel.DEBUG)
+
+    def test_log_from_forked_child(self):
+        import multiprocessing
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "unilog.log")
+            # The parent's writer thread is running when the child is forked
+            logger.log("parent", file=path, console=False)
+            with multiprocessing.get_context("fork").Pool(1) as pool:
+                pool.apply(_log_in_child, (path,))
+            logger.flush()
+            with open(path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+            logger._handlers.pop(path).close()
+        self.assertEqual(sorted(line.split("] ", 1)[1] for line in lines), ["child", "parent"])
+
+
+def _log_in_child(path: str):
+    logger.log("child", file=path, console=False)
+    logger.flush()
@@ -1,3 +1,4 @@
+import importlib.util
 import unittest
 from outputs.csv_output import CSVOutput
 from outputs.json_output import JSONOutput
@@ -21,3 +22,181 @@ class TestOutputs(unittest.TestCase):
             self.assertTrue(os.path.exists(json_out.filepath))
         else:
             self.skipTest("write_logs not implemented in JSONOutput")
+
+    def test_cloud_output_uploads_once(self):
+        import tempfile
+        from core import output_manager
+
+        uploads = []
+        with tempfile.TemporaryDirectory() as tmp:
+            output_dir = output_manager.OUTPUT_DIR
+            output_manager.OUTPUT_DIR = tmp
+            providers = output_manager.CLOUD_PROVIDERS.copy()
+            output_manager.CLOUD_PROVIDERS["s3"] = uploads.append
+            try:
+                for _ in range(5):
+                    self.assertTrue(output_manager.send_to_output([{"message": "ok"}], "s3"))
+                self.assertEqual(uploads, [])
+                self.assertTrue(output_manager.close())
+            finally:
+                output_manager.OUTPUT_DIR = output_dir
+                output_manager.CLOUD_PROVIDERS = providers
+        # The whole file, once, after every write
+        self.assertEqual(uploads, [os.path.join(tmp, "unilog_export.json")])
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "Parquet output needs pyarrow")
+    def test_parquet_output_keeps_earlier_rows(self):
+        import tempfile
+        import pandas as pd
+        from outputs import parquet_output
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "logs.parquet")
+            parquet_output.write([{"message": "first", "status": 200}], path)
+            parquet_output.close()
+            # While a run is writing, the file still holds what earlier runs wrote
+            parquet_output.write([{"message": "second"}], path)
+            self.assertEqual(list(pd.read_parquet(path)["message"]), ["first"])
+            parquet_output.close()
+            self.assertEqual([entry["message"] for entry in parquet_output.ParquetOutput(tmp, "logs.parquet").read_logs()],
+                             ["first", "second"])
+
+            # A file without a footer (e.g. from a killed process) is moved aside, not wiped
+            with open(path, "wb") as f:
+                f.write(b"PAR1 no footer")
+            parquet_output.write([{"message": "third"}], path)
+            parquet_output.close()
+            with open(path + ".damaged", "rb") as f:
+                self.assertEqual(f.read(), b"PAR1 no footer")
+            self.assertEqual(list(pd.read_parquet(path)["message"]), ["third"])
+
+    def test_stream_micro_batches(self):
+        import random
+        import re
+        from core.stream_manager import StreamManager
+        from benchmarks.bench_prefilter import make_lines
+
+        class CollectingOutput:
+            def __init__(self):
+                self.writes = []
+
+            def write(self, records):
+                self.writes.append(len(records))
+                return True
+
+        lines = make_lines(1_000, 0.1, random.Random(5))
+        for limits, reason in (({"batch_records": 100}, "records"),
+                               ({"batch_bytes": 4_096}, "bytes"),
+                               ({"batch_records": 10**6, "linger": 0.05}, "linger")):
+            output = CollectingOutput()
+            manager = StreamManager(output_manager=output, num_worker_threads=1, **limits)
+            for line in lines:
+                manager.enqueue("nginx", line)
+            manager.start()
+            manager.wait_for_completion()
+            manager.stop()
+            stats = manager.get_stats()
+            # One output call per batch, not per line
+            self.assertEqual(sum(output.writes), len(lines))
+            self.assertEqual(len(output.writes), stats["batches"])
+            self.assertEqual(stats["lines"], len(lines))
+            self.assertEqual(max(stats["closed_by"], key=stats["closed_by"].get), reason)
+            if reason == "records":
+                self.assertEqual(stats["max_lines"], 100)
+            self.assertIsNotNone(stats["latency_p99_ms"])
+
+        # A record the filter raises on (no size to compare) only loses itself
+        bad = re.sub(r'" (\d{3}) \d+ "', r'" \1 - "', lines[0])
+        output = CollectingOutput()
+        manager = StreamManager(output_manager=output, filters=[{"field": "size", "gt": 10}],
+                                num_worker_threads=1, batch_records=10**6, linger=0.05)
+        for line in lines[1:] + [bad]:
+            manager.enqueue("nginx", line)
+        manager.start()
+        manager.wait_for_completion()
+        manager.stop()
+        self.assertEqual(sum(output.writes), len(lines) - 1)
+
+    def test_bounded_queue_policies(self):
+        import queue
+        from core.bounded_queue import BoundedQueue
+
+        expected = {
+            "drop_newest": ([True] * 3 + [False] * 3, ["0", "1", "2"]),
+            "drop_oldest": ([True] * 6, ["3", "4", "5"]),
+            # Every 2nd item arriving while full replaces the oldest one
+            "sample": ([True, True, True, False, True, False], ["1", "2", "4"]),
+            "timeout": ([True] * 3 + [False] * 3, ["0", "1", "2"]),
+        }
+        for policy, (accepted, kept) in expected.items():
+            q = BoundedQueue(3, policy=policy, timeout=0.01, sample_every=2)
+            self.assertEqual([q.offer(str(i)) for i in range(6)], accepted)
+            self.assertEqual(list(q.queue), kept)
+            stats = q.get_stats()
+            self.assertEqual(stats["dropped"], 3)
+            self.assertEqual(stats["high_water_items"], 3)
+            if policy == "timeout":
+                self.assertGreater(stats["blocked_seconds"], 0)
+            # Evicted items don't hold up join()
+            for _ in kept:
+                q.get()
+                q.task_done()
+            q.join()
+
+        q = BoundedQueue(max_bytes=10, policy="drop_oldest")
+        for item in (b"abcd", b"efgh", b"ijkl"):
+            q.offer(item)
+        self.assertEqual((list(q.queue), q.bytes), ([b"efgh", b"ijkl"], 8))
+        with self.assertRaises(queue.Full):
+            q.put(b"mnop", block=False)
+        with self.assertRaises(ValueError):
+            BoundedQueue(policy="spill")
+
+    def test_stream_soak_memory_stays_flat(self):
+        import random
+        import time
+        import tracemalloc
+        from core.stream_manager import StreamManager
+        from benchmarks.bench_prefilter import make_lines
+
+        class SlowOutput:
+            # A sink that takes 10 ms per write
+            def write(self, records):
+                time.sleep(0.01)
+                return True
+
+        lines = make_lines(1_000, 0.1, random.Random(6))
+
+        def soak(queue_records: int, seconds: float = 1.0):
+            # Feed about ten times what the sink drains (batches of 10 every 10 ms)
+            manager = StreamManager(output_manager=SlowOutput(), num_worker_threads=1, batch_records=10,
+                                    queue_records=queue_records, queue_policy="drop_oldest")
+            manager.start()
+            tracemalloc.start()
+            samples = []
+            start = time.monotonic()
+            sent = 0
+            try:
+                while time.monotonic() - start < seconds:
+                    for _ in range(100):
+                        # A fresh string per line, as from a socket
+                        manager.enqueue("nginx", lines[sent % len(lines)] + " ")
+                        sent += 1
+                    samples.append(tracemalloc.get_traced_memory()[0])
+                    time.sleep(max(0.0, start + sent / 10_000 - time.monotonic()))
+            finally:
+                tracemalloc.stop()
+                manager.stop()
+            return samples, manager.get_stats()["queue"]
+
+        samples, stats = soak(500)
+        self.assertLessEqual(stats["high_water_items"], 500)
+        # The sink keeps up with about a tenth of the lines
+        self.assertGreater(stats["dropped"], stats["accepted"] // 2)
+        # After the queue fills up, memory doesn't grow with the backlog
+        steady = samples[len(samples) // 4:]
+        self.assertLess(max(steady) - min(steady), 256 * 1024)
+
+        # Unbounded, the same load keeps growing
+        samples, _ = soak(0)
+        self.assertGreater(samples[-1] - samples[len(samples) // 4], 512 * 1024)
@@ -1,4 +1,6 @@
+import random
 import unittest
+from core import parse_failures
 from parsers.apache import ApacheParser
 from parsers.json_parser import JSONParser
 from parsers.nginx import NginxParser
@@ -42,3 +44,513 @@ class TestParsers(unittest.TestCase):
             self.assertIn("message", parsed)
         else:
             self.skipTest("parse_line not implemented in SyslogParser")
+
+
+class TestParseFailures(unittest.TestCase):
+    def setUp(self):
+        parse_failures.reset()
+
+    def test_counters_and_samples(self):
+        with parse_failures.source("access.log"):
+            ApacheParser.parse_line('127.0.0.1 - - [14/Sep/2025:12:00:00 +0000] "GET / HTTP/1.1" 200 1234')
+            for i in range(parse_failures.SAMPLE_SIZE + 10):
+                self.assertIsNone(ApacheParser.parse_line(f"garbage {i}"))
+        stats = parse_failures.get_stats(parser="apache", source="access.log")
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0]["matched"], 1)
+        self.assertEqual(stats[0]["failed"], parse_failures.SAMPLE_SIZE + 10)
+        self.assertEqual(len(stats[0]["samples"]), parse_failures.SAMPLE_SIZE)
+        self.assertAlmostEqual(parse_failures.match_rate("apache"), 1 / (parse_failures.SAMPLE_SIZE + 11))
+
+
+class TestBatchParse(unittest.TestCase):
+    LINES = [
+        '127.0.0.1 - - [14/Sep/2025:12:02:00 +0000] "GET /index.html HTTP/1.1" 200 5678 "-" "Mozilla/5.0"\n',
+        "not an access line\n",
+        '10.0.0.2 - bob [14/Sep/2025:12:02:01 +0000] "POST /login" 302 - "-" "curl/8.0"\n',
+        "",
+    ]
+
+    def setUp(self):
+        parse_failures.reset()
+
+    def test_batch_matches_parse_line(self):
+        from core.parser_manager import ParserManager
+
+        manager = ParserManager()
+        # Valid JSON that isn't an object
+        lines = self.LINES + ['[1, 2]', '5', '"text"']
+        for log_type in ("nginx", "apache", "syslog", "json", "generic"):
+            parser = manager.get(log_type)
+            expected = [r for r in map(parser.parse_line, lines) if r]
+            rejects = []
+            self.assertEqual(manager.parse_batch(log_type, lines, rejects), expected, log_type)
+            self.assertEqual(len(rejects) + len(expected), len(lines), log_type)
+
+    def test_rejects_and_stats(self):
+        from core.parser_manager import ParserManager
+
+        rejects = []
+        with parse_failures.source("batch.log"):
+            records = ParserManager().parse_batch("nginx", self.LINES, rejects)
+        self.assertEqual([r["path"] for r in records], ["/index.html", None])
+        self.assertEqual(rejects, self.LINES[1:2] + self.LINES[3:])
+        stats = parse_failures.get_stats(parser="nginx", source="batch.log")[0]
+        self.assertEqual((stats["matched"], stats["failed"]), (2, 2))
+
+    def test_parse_iter_and_unknown_type(self):
+        from core.parser_manager import ParserManager
+
+        manager = ParserManager()
+        lines = self.LINES * 5
+        streamed = list(manager.parse_iter("nginx", iter(lines), batch_size=3))
+        self.assertEqual(streamed, manager.parse_batch("nginx", lines))
+        self.assertIs(manager.get("no-such-type"), manager.get("no-such-type"))
+        self.assertEqual(manager.parse_batch("no-such-type", ["a=1 b=2", "junk"]), [{"a": "1", "b": "2"}])
+
+
+class TestFormatDetection(unittest.TestCase):
+    SAMPLES = {
+        "nginx": TestBatchParse.LINES[0],
+        "apache": '127.0.0.1 - - [14/Sep/2025:12:00:00 +0000] "GET / HTTP/1.1" 200 1234\n',
+        "syslog": "<34>1 2025-09-14T12:04:00Z host app 42 ID47 - test message\n",
+        "json": '{"event": "login", "user": "alice"}\n',
+        "generic": "level=INFO user=alice action=login\n",
+    }
+
+    def setUp(self):
+        parse_failures.reset()
+
+    def test_detects_each_format(self):
+        from core.parser_manager import ParserManager
+
+        detector = ParserManager().detector
+        for log_type, line in self.SAMPLES.items():
+            lines = [line] * 9 + ["garbage\n"]
+            self.assertEqual(detector.detect(lines), log_type)
+        # Detection doesn't count as parse failures
+        self.assertEqual(parse_failures.get_stats(), [])
+
+    def test_sticky_verdict_and_redetection(self):
+        import os
+        import tempfile
+        from core.parser_manager import AUTO, ParserManager, get_parser
+
+        manager = ParserManager()
+        manager.detector.sample_lines = 10
+        with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as f:
+            f.write(self.SAMPLES["json"] * 20)
+        try:
+            self.assertEqual(get_parser(AUTO, source=f.name)(self.SAMPLES["json"])["user"], "alice")
+            with parse_failures.source(f.name):
+                self.assertEqual(len(manager.parse_batch(AUTO, [self.SAMPLES["json"]] * 4)), 4)
+                # Sticky: other lines go to the detected parser until its match rate drops
+                self.assertEqual(manager.parse_batch(AUTO, [self.SAMPLES["syslog"]] * 3), [])
+                self.assertIn(f.name, [key[0] for key in manager.detector.verdicts])
+                self.assertEqual(manager.parse_batch(AUTO, [self.SAMPLES["syslog"]] * 3), [])
+                self.assertNotIn(f.name, [key[0] for key in manager.detector.verdicts])
+                records = manager.parse_batch(AUTO, [self.SAMPLES["syslog"]] * 5)
+            self.assertEqual([r["app"] for r in records], ["app"] * 5)
+            stats = {s["parser"]: s for s in parse_failures.get_stats(source=f.name)}
+            self.assertEqual((stats["json"]["matched"], stats["syslog"]["matched"]), (4, 5))
+        finally:
+            os.unlink(f.name)
+
+
+class TestAccessLogScanner(unittest.TestCase):
+    FRAGMENTS = [" ", "  ", "\t", "-", "[", "]", "] \"", "\"", "\" ", "\" \"", "200", "2x0", " 200 ", "5", "ü",
+                 "GET / HTTP/1.1", "10.0.0.1", "14/Sep/2025:12:02:01 +0000", "\n", "\r"]
+
+    def corpus(self):
+        import os
+        path = os.path.join(os.path.dirname(__file__), "access_corpus.log")
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+        # Each corpus line with and without its newline and with extra text spliced in
+        rng = random.Random(13)
+        for line in list(lines):
+            lines.append(line.rstrip("\n"))
+            for _ in range(30):
+                at = rng.randrange(len(line) + 1)
+                lines.append(line[:at] + rng.choice(self.FRAGMENTS) + line[at:])
+        return lines
+
+    def test_matches_regex_path(self):
+        with parse_failures.muted():
+            for parser in (ApacheParser, NginxParser):
+                for line in self.corpus():
+                    expected = parser._parse_regex(line)
+                    parsed = parser.parse_line(line)
+                    self.assertEqual(parsed and list(parsed.items()), expected and list(expected.items()),
+                                     (parser.__name__, line))
+
+
+class TestBytesParse(unittest.TestCase):
+    SYSLOG = ['<34>1 2025-09-14T12:04:00Z host app 42 ID47 [id@1 a="b"] test message\n',
+              'Sep 14 12:04:00 host app[42]: test message\n',
+              'Sep 14 12:04:00 host app: ünïcode message']
+
+    def setUp(self):
+        parse_failures.reset()
+
+    def assertSameRecord(self, parser, line):
+        from core.record import materialize
+
+        expected = parser.parse_line(line)
+        for raw in (line.encode(), memoryview(line.encode())):
+            parsed = materialize(parser.parse_line(raw))
+            self.assertEqual(parsed and list(parsed.items()), expected and list(expected.items()),
+                             (parser.__name__, line))
+
+    def test_matches_str_path(self):
+        with parse_failures.muted():
+            for parser in (ApacheParser, NginxParser, SyslogParser):
+                for line in TestAccessLogScanner().corpus() + self.SYSLOG:
+                    self.assertSameRecord(parser, line)
+        self.assertEqual(JSONParser.parse_line(b'{"user": "al\xc3\xafce"}'), {"user": "al\u00efce"})
+
+    def test_fields_decoded_on_use(self):
+        from core.record import LazyRecord
+
+        line = b'10.0.0.1 - - [14/Sep/2025:12:02:00 +0000] "GET / HTTP/1.1" 500 12 "-" "agent \xff"'
+        parsed = ApacheParser.parse_line(line)
+        self.assertIsInstance(parsed, LazyRecord)
+        self.assertEqual(parsed["status"], 500)
+        self.assertEqual(list(parsed.values), ["status"])
+        # Invalid UTF-8 is escaped within its own field only
+        self.assertEqual(parsed["user_agent"], "agent \\xff")
+        self.assertEqual(parsed["path"], "/")
+        parsed["tag"] = "x"
+        del parsed["ident"]
+        self.assertEqual(list(parsed)[-1], "tag")
+        self.assertNotIn("ident", parsed.to_dict())
+        self.assertIn("ident", ApacheParser.parse_line(line))
+        self.assertEqual(JSONParser.parse_line(b'{"a": "\xff", "b": 1}'), {"a": "\ufffd", "b": 1})
+
+
+class TestRFC5424(unittest.TestCase):
+    # Examples from RFC 5424 section 6.5, plus escapes and repeated params
+    LINE = ('<165>1 2003-10-11T22:14:15.003Z mymachine.example.com evntslog - ID47 '
+            '[exampleSDID@32473 iut="3" eventSource="Application" eventID="1011"]'
+            '[examplePriority@32473 class="high" path="C:\\tmp\\x \\] \\"q\\"" ip="1" ip="2"] '
+            '\ufeffAn application event log entry...\n')
+
+    def test_fields(self):
+        parsed = SyslogParser.parse_line(self.LINE)
+        self.assertEqual(list(parsed), ["priority", "facility", "severity", "version", "timestamp", "host", "app",
+                                        "pid", "msgid", "structured_data", "message"])
+        self.assertEqual((parsed["priority"], parsed["facility"], parsed["severity"]), (165, "local4", "notice"))
+        self.assertEqual(parsed["timestamp"], "2003-10-11T22:14:15.003000+00:00")
+        self.assertIsNone(parsed["pid"])
+        self.assertEqual(parsed["structured_data"], {
+            "exampleSDID@32473": {"iut": "3", "eventSource": "Application", "eventID": "1011"},
+            "examplePriority@32473": {"class": "high", "path": 'C:\\tmp\\x ] "q"', "ip": ["1", "2"]},
+        })
+        self.assertEqual(parsed["message"], "An application event log entry...")
+        self.assertEqual(SyslogParser.parse_line(self.LINE.encode()), parsed)
+
+        parsed = SyslogParser.parse_line("\ufeff<0>1 - - - - - -")
+        self.assertEqual((parsed["facility"], parsed["severity"]), ("kern", "emerg"))
+        self.assertTrue(all(parsed[key] is None for key in ("timestamp", "host", "structured_data", "message")))
+        self.assertEqual(SyslogParser.parse_line("<191>1 - h a p m [x@1] ")["message"], "")
+
+    def test_rejects_malformed(self):
+        lines = ["<192>1 - h a p m - msg", "<034>1 - h a p m - msg", "<34>0 - h a p m - msg",
+                 "<34>1 - h a p - msg", "<34>1 - h  a p m - msg", '<34>1 - h a p m [x@1 a="b] msg',
+                 '<34>1 - h a p m [x@1 a=b] msg', "<34>1 - h a p m [x@1]msg", "<34>1 - h a p m [] msg",
+                 "<34>1 - h a p m -msg", '<34>1 - h a p m [x@1 a="b"']
+        with parse_failures.muted():
+            for line in lines:
+                self.assertIsNone(SyslogParser.parse_line(line), line)
+
+
+class TestGrok(unittest.TestCase):
+    def test_typed_captures(self):
+        from parsers.grok import compile_grok
+
+        grok = compile_grok("%{COMBINEDAPACHELOG}")
+        parsed = grok.match('127.0.0.1 - frank [10/Oct/2000:13:55:36 -0700] "GET /a.gif HTTP/1.0" 200 - "-" "UA"\n')
+        self.assertEqual(parsed, {"ip": "127.0.0.1", "ident": "-", "user": "frank",
+                                  "time": "10/Oct/2000:13:55:36 -0700", "method": "GET", "path": "/a.gif",
+                                  "http_version": "1.0", "status": 200, "referer": '"-"', "user_agent": '"UA"'})
+        # Anchored at both ends
+        self.assertIsNone(compile_grok("%{INT:n}").match("12 trailing"))
+
+        grok = compile_grok("%{WORD:kind} %{SIZE:size:int}(?: %{NUMBER:ratio:float})?",
+                            patterns={"SIZE": r"\d+|-"})
+        self.assertEqual(grok.fields, ["kind", "size", "ratio"])
+        self.assertEqual(grok.match("disk 12 0.5"), {"kind": "disk", "size": 12, "ratio": 0.5})
+        # Values that don't convert are kept as text; optional parts that didn't match are left out
+        self.assertEqual(grok.match("disk -"), {"kind": "disk", "size": "-"})
+
+        grok = compile_grok("%{SYSLOGLINE}")
+        self.assertEqual(grok.match("Oct 11 22:14:15 host app[12]: hello"),
+                         {"time": "Oct 11 22:14:15", "host": "host", "app": "app", "pid": 12, "message": "hello"})
+        self.assertEqual(grok.match("Oct  1 22:14:15 host cron: job done"),
+                         {"time": "Oct  1 22:14:15", "host": "host", "app": "cron", "message": "job done"})
+
+    def test_generic_parser_and_cache(self):
+        from core.parser_manager import ParserManager
+        from parsers.generic import GenericParser
+        from parsers.grok import compile_grok
+
+        pattern = "%{TIMESTAMP_ISO8601:timestamp} %{LOGLEVEL:level} took=%{NUMBER:took:float}ms %{GREEDYDATA:message}"
+        parser = GenericParser(pattern, field_map={"took": "duration"})
+        self.assertEqual(parser.parse_line("2025-09-14T12:00:00Z WARN took=12.5ms slow query\n"),
+                         {"timestamp": "2025-09-14T12:00:00+00:00", "level": "WARN", "message": "slow query",
+                          "duration": 12.5})
+        self.assertIs(GenericParser(pattern).pattern, parser.pattern)
+        self.assertIs(compile_grok(pattern), parser.grok)
+
+        manager = ParserManager()
+        manager.register_parser("app", pattern)
+        self.assertIs(manager.get("app").grok, parser.grok)
+        self.assertEqual(manager.parse("app", "2025-09-14T12:00:00Z INFO took=1ms ok")["took"], 1.0)
+
+    def test_errors(self):
+        from parsers.grok import compile_grok
+
+        for pattern, patterns in (("%{NOPE:x}", None), ("%{INT:x:date}", None), ("%{A}", {"A": "%{B}", "B": "%{A}"}),
+                                  ("%{INT:x}(", None)):
+            with self.assertRaises(ValueError):
+                compile_grok(pattern, patterns)
+
+
+class TestLogFormat(unittest.TestCase):
+    NGINX_DIRECTIVE = """log_format upstream '$remote_addr - $remote_user [$time_local] "$request" '
+                        '$status $body_bytes_sent "$http_referer" "$http_user_agent" '
+                        '$request_time $upstream_response_time "$http_x_request_id"';"""
+
+    def setUp(self):
+        import tempfile
+        from unittest import mock
+        from parsers import log_format
+
+        # Never touch the real cache, whatever UNILOG_FORMAT_CACHE_DIR says
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        patch = mock.patch.object(log_format, "FORMAT_CACHE_DIR", cache_dir.name)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_nginx_format(self):
+        from core.parser_manager import ParserManager
+
+        manager = ParserManager()
+        parser = manager.register_log_format(None, self.NGINX_DIRECTIVE)
+        self.assertEqual(parser.name, "upstream")
+        line = ('10.0.0.1 - bob [10/Oct/2000:13:55:36 -0700] "GET /a HTTP/1.1" 502 0 "-" "curl/8.0" '
+                '0.250 0.200, 0.050 "abc-1"\n')
+        parsed = manager.parse("upstream", line)
+        self.assertEqual(parsed["request_time"], 0.25)
+        # Several upstreams can't be one number and are kept as text
+        self.assertEqual(parsed["upstream_response_time"], "0.200, 0.050")
+        self.assertEqual(parsed["x_request_id"], "abc-1")
+        self.assertEqual((parsed["status"], parsed["size"], parsed["method"]), (502, 0, "GET"))
+        self.assertIn("user_agent", manager.verbatim_fields("upstream"))
+        rejects = []
+        self.assertEqual(len(manager.parse_batch("upstream", [line.encode(), "garbage"], rejects)), 1)
+        self.assertEqual(rejects, ["garbage"])
+
+    def test_matches_builtin_parsers(self):
+        from parsers.log_format import compile_log_format
+
+        combined = '127.0.0.1 - frank [10/Oct/2000:13:55:36 -0700] "GET /a.gif HTTP/1.0" 200 2326 "-" "UA [en]"'
+        apache = compile_log_format(r'LogFormat "%h %l %u %t \"%r\" %>s %b \"%{Referer}i\" \"%{User-agent}i\"" combined')
+        self.assertEqual(apache.parse_line(combined), ApacheParser.parse_line(combined))
+        nginx = compile_log_format('$remote_addr - $remote_user [$time_local] "$request" $status $body_bytes_sent '
+                                   '"$http_referer" "$http_user_agent"', style="nginx")
+        expected = NginxParser.parse_line(combined)
+        del expected["ident"]
+        self.assertEqual(nginx.parse_line(combined), expected)
+        with self.assertRaises(ValueError):
+            compile_log_format("%h %Z")
+
+    def test_disk_cache(self):
+        import json
+        import os
+        import tempfile
+        from parsers import log_format
+
+        fmt = "$remote_addr $status $request_time"
+        with tempfile.TemporaryDirectory() as cache_dir:
+            parser = log_format.compile_log_format(fmt, "nginx", cache_dir=cache_dir)
+            path = os.path.join(cache_dir, log_format.format_key(fmt, "nginx") + ".json")
+            with open(path) as f:
+                self.assertEqual(json.load(f)["regex"], parser.spec["regex"])
+
+            # A fresh process reads the spec back instead of compiling it
+            log_format._specs.clear()
+            compile_spec = log_format.compile_spec
+            log_format.compile_spec = None
+            try:
+                parser = log_format.compile_log_format(fmt, "nginx", cache_dir=cache_dir)
+            finally:
+                log_format.compile_spec = compile_spec
+            self.assertEqual(parser.parse_line("10.0.0.1 200 0.5"), {"ip": "10.0.0.1", "status": 200, "request_time": 0.5})
+
+            # A damaged entry is recompiled and rewritten
+            log_format._specs.clear()
+            with open(path, "w") as f:
+                f.write("{not json")
+            self.assertEqual(log_format.compile_log_format(fmt, "nginx", cache_dir=cache_dir).spec, parser.spec)
+            with open(path) as f:
+                self.assertEqual(json.load(f)["format"], fmt)
+
+
+class TestShardParser(unittest.TestCase):
+    def test_shards_match_sequential_parse(self):
+        import os
+        import tempfile
+        from core import shard_parser
+
+        lines = [f'10.0.0.{i % 250} - - [10/Oct/2000:13:55:36 -0700] "GET /item/{i} HTTP/1.1" '
+                 f'{500 if i % 7 == 0 else 200} {i} "-" "UA"\n' for i in range(2000)]
+        lines[100] = "not an access line\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for name, chunk in (("big.log", lines[:1500]), ("a.log", lines[1500:1700]), ("b.log", lines[1700:])):
+                paths.append(os.path.join(tmp, name))
+                with open(paths[-1], "w") as f:
+                    f.writelines(chunk)
+
+            shards = shard_parser.plan_shards(paths, "nginx", shard_bytes=20_000)
+            self.assertGreater(len(shards), 3)
+            # Ranges of a file are contiguous and end on line boundaries
+            for path in paths:
+                ranges = [(start, end) for shard in shards for p, start, end, _ in shard if p == path]
+                self.assertEqual(ranges[0][0], 0)
+                self.assertEqual(ranges[-1][1], os.path.getsize(path))
+                with open(path, "rb") as f:
+                    data = f.read()
+                for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                    self.assertEqual(end, start)
+                    self.assertEqual(data[end - 1:end], b"\n")
+
+            expected = [record for record in NginxParser.parse_batch(lines) if record["status"] == 500]
+            rules = [{"field": "status", "equals": 500}]
+            parse_failures.reset()
+            batches = shard_parser.parse_files(paths, "nginx", jobs=2, rules=rules, shard_bytes=20_000)
+            self.assertEqual([dict(record) for batch in batches for record in batch], expected)
+            self.assertEqual(parse_failures.get_stats(source=paths[0])[0]["failed"], 1)
+
+            unordered = shard_parser.parse_files(paths, "nginx", jobs=2, rules=rules, ordered=False,
+                                                 shard_bytes=20_000)
+            self.assertEqual(sorted(record["size"] for batch in unordered for record in batch),
+                             [record["size"] for record in expected])
+        parse_failures.reset()
+
+    def test_split_gzip(self):
+        import gzip
+        import os
+        import tempfile
+        from core import shard_parser
+        from core.compressed import bgzf_compress, gzip_shards
+
+        lines = [f'10.0.0.1 - - [10/Oct/2000:13:55:36 -0700] "GET /item/{i} HTTP/1.1" 200 {i} "-" "UA"\n'
+                 for i in range(20_000)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "access.log.1.gz")
+            with open(path, "wb") as f:
+                f.write(bgzf_compress("".join(lines).encode()))
+            self.assertEqual(len(gzip_shards(path, 10_000)), len(shard_parser.plan_shards([path], "nginx", 10_000)))
+            self.assertGreater(len(gzip_shards(path, 10_000)), 3)
+            records = [record for batch in shard_parser.parse_files([path], "nginx", jobs=2, shard_bytes=10_000)
+                       for record in batch]
+            self.assertEqual([record["size"] for record in records], list(range(20_000)))
+
+            # Plain gzip has no member sizes in its headers
+            with open(path, "wb") as f:
+                f.write(gzip.compress("".join(lines).encode()))
+            self.assertIsNone(gzip_shards(path, 10_000))
+
+
+class TestCompactRecord(unittest.TestCase):
+    RECORD = {"ip": "10.0.0.1", "status": 500, "size": None, "a b": 1}
+
+    def test_mapping_protocol(self):
+        import pickle
+        from core.filter import compile_rules
+        from core.record import CompactRecord, compact, materialize
+
+        record = compact(dict(self.RECORD))
+        self.assertIsInstance(record, CompactRecord)
+        self.assertIs(type(record), type(compact(dict(self.RECORD))))
+        self.assertEqual(record, self.RECORD)
+        self.assertEqual(list(record.items()), list(self.RECORD.items()))
+        self.assertIsNone(record.get("size", "unset"))
+        self.assertIs(compile_rules([{"field": "status", "gt": 499}])(record), record)
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+
+        record["anomaly"] = True
+        del record["size"]
+        self.assertNotIn("size", record)
+        self.assertEqual(record.get("size", "unset"), "unset")
+        self.assertEqual(list(record), ["ip", "status", "a b", "anomaly"])
+        self.assertEqual(materialize(record), {"ip": "10.0.0.1", "status": 500, "a b": 1, "anomaly": True})
+        self.assertEqual({**record}, materialize(record))
+        with self.assertRaises(KeyError):
+            del record["size"]
+
+    def test_layout_limit(self):
+        import core.record as record_module
+
+        saved = record_module.MAX_RECORD_TYPES
+        record_module.MAX_RECORD_TYPES = len(record_module._record_types)
+        try:
+            unseen = {"field never seen before": 1}
+            self.assertIs(record_module.compact(unseen), unseen)
+        finally:
+            record_module.MAX_RECORD_TYPES = saved
+
+
+class TestNDJSONBuffer(unittest.TestCase):
+    BUFFER = (b'{"a": 1, "timestamp": "2025-09-14T12:04:00Z"}\n'
+              b'\n'
+              b'not json\r\n'
+              b'[1, 2]\n'
+              b'{"a": 2, "b": {"c": 3}, "timestamp": "2025-09-14T12:04:00Z"}\n'
+              b'{"a": "\xff"}\n'
+              b'{"a": 3}')
+
+    def setUp(self):
+        parse_failures.reset()
+
+    def tearDown(self):
+        import parsers.json_parser as json_parser
+        json_parser.JSON_DECODER = "auto"
+
+    def reject_offsets(self):
+        return [self.BUFFER.index(b"not json"), self.BUFFER.index(b"[1, 2]")]
+
+    def test_decoders_agree(self):
+        import parsers.json_parser as json_parser
+
+        results = []
+        for name in json_parser.JSON_DECODERS:
+            json_parser.JSON_DECODER = name
+            try:
+                self.assertEqual(json_parser.get_decoder()[0], name)
+            except ValueError:
+                continue  # optional backend not installed
+            rejects = []
+            records = JSONParser.parse_buffer(self.BUFFER, rejects=rejects, offset=100)
+            # Invalid UTF-8 only spoils its string, as in parse_line
+            self.assertEqual([r["a"] for r in records], [1, 2, "\ufffd", 3], name)
+            self.assertEqual(records[1]["timestamp"], "2025-09-14T12:04:00+00:00")
+            self.assertEqual([offset for offset, _ in rejects], [100 + o for o in self.reject_offsets()], name)
+            for offset, line in rejects:
+                self.assertTrue(self.BUFFER[offset - 100:].startswith(line))
+            results.append(records)
+        self.assertTrue(all(r == results[0] for r in results))
+
+    def test_projection_and_stream(self):
+        import io
+
+        expected = JSONParser.parse_buffer(self.BUFFER, fields=["a", "timestamp"])
+        self.assertEqual(expected[1], {"a": 2, "timestamp": "2025-09-14T12:04:00+00:00"})
+        for chunk_size in (1, 7, 64, 1 << 20):
+            rejects = []
+            records = list(JSONParser.parse_stream(io.BytesIO(self.BUFFER), ["a", "timestamp"], rejects, chunk_size))
+            self.assertEqual(records, expected, chunk_size)
+            self.assertEqual([offset for offset, _ in rejects], self.reject_offsets(), chunk_size)
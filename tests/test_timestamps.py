@@ -0,0 +1,52 @@
+import random
+import unittest
+from datetime import datetime, timezone
+from core import timestamps
+
+
+class TestTimestamps(unittest.TestCase):
+    def tearDown(self):
+        timestamps.set_output("iso")
+
+    def random_clf(self, rng):
+        day = rng.choice(["01", "09", "10", "28", "29", "31", "32", "1", " 1", "00"])
+        month = rng.choice(["Jan", "Feb", "Oct", "oct", "Foo"])
+        year = rng.choice(["2000", "2024", "1999", "20x0"])
+        clock = rng.choice(["13:55:36", "00:00:00", "23:59:60", "24:00:00", "1:2:3"])
+        offset = rng.choice(["-0700", "+0000", "+0530", "+2400", "Z", "+05:30", "-07"])
+        return f"{day}/{month}/{year}:{clock} {offset}"
+
+    def test_clf_matches_strptime(self):
+        rng = random.Random(3)
+        for _ in range(3000):
+            text = self.random_clf(rng)
+            try:
+                expected = datetime.strptime(text, timestamps.CLF_FORMAT).isoformat()
+            except ValueError:
+                expected = None
+            self.assertEqual(timestamps.parse_clf(text), expected, text)
+
+    def test_rfc3164_uses_current_year(self):
+        year = datetime.now(timezone.utc).year
+        self.assertEqual(timestamps.parse_rfc3164("Oct", "11", "22:14:15"), f"{year}-10-11T22:14:15")
+        self.assertEqual(timestamps.parse_rfc3164("Oct", "1", "22:14:15"), f"{year}-10-01T22:14:15")
+        self.assertIsNone(timestamps.parse_rfc3164("Oct", "32", "22:14:15"))
+
+    def test_rfc3339_and_epoch(self):
+        self.assertEqual(timestamps.parse_rfc3339("2025-09-14T12:04:00.5Z"), "2025-09-14T12:04:00.500000+00:00")
+        self.assertIsNone(timestamps.parse_rfc3339("-"))
+        for value in (1757851440, 1757851440000, "1757851440", 1757851440.0):
+            self.assertEqual(timestamps.normalize(value), "2025-09-14T12:04:00+00:00", value)
+        self.assertEqual(timestamps.normalize("yesterday"), "yesterday")
+        self.assertIs(timestamps.normalize(True), True)
+
+    def test_epoch_output(self):
+        iso = timestamps.parse_clf("14/Sep/2025:12:04:00 +0200")
+        timestamps.set_output("epoch")
+        self.assertEqual(timestamps.parse_clf("14/Sep/2025:12:04:00 +0200"), 1757844240)
+        self.assertEqual(timestamps.parse_rfc3339("2025-09-14T12:04:00Z"), 1757851440)
+        self.assertEqual(timestamps.normalize("2025-09-14T12:04:00+00:00"), 1757851440)
+        timestamps.set_output("iso")
+        self.assertEqual(timestamps.parse_clf("14/Sep/2025:12:04:00 +0200"), iso)
+        with self.assertRaises(ValueError):
+            timestamps.set_output("unix")
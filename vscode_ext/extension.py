@@ -1,5 +1,5 @@
 from src.cli.ingest import Ingest
-from src.cli.parse import Parse
+from src.core.parser_manager import AUTO, ParserManager
 from src.cli.tail import Tail
 from src.vscode_ext.webview import Webview
 from src.vscode_ext.utils import VSUtils
@@ -8,6 +8,7 @@ class VSCodeExtension:
     def __init__(self):
         self.webview = Webview()
         self.active = False
+        self.parser_manager = ParserManager()
         self.commands = {
             "unilog.ingest": self.command_ingest,
             "unilog.parse": self.command_parse,
@@ -39,7 +40,8 @@ class VSCodeExtension:
         return lines
 
     def command_parse(self, lines):
-        parsed = [Parse.auto_detect(line) for line in lines]
+        # The format is detected once for the batch, not per line
+        parsed = self.parser_manager.parse_batch(AUTO, lines)
         VSUtils.log_event(f"Parsed {len(parsed)} lines")
         self.webview.send_message({"type": "parse", "count": len(parsed)})
         return parsed